@@ -3,6 +3,9 @@ ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with uvicorn, e.g.
+    uvicorn mysite.asgi:application --workers 4 --no-access-log
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +15,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# serve the hot read pages with polls/async_views.py
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,11 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import warnings
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Deployment settings come from the environment; a .env file next to
+# manage.py is read first (see .env.example). Real environment variables win.
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -23,9 +31,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-2pon5vq=owv2d1zrw+kj$(1_6(ae8gls=lagep-!d_!f+4sf_$'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG=0 in production (then DJANGO_ALLOWED_HOSTS is required)
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [h.strip() for h in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if h.strip()]
 
 
 # Application definition
@@ -37,11 +46,14 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',  # runserver serves static files through WhiteNoise too
     'django.contrib.staticfiles',
 ]
 
 MIDDLEWARE = [
+    'polls.metrics.MetricsMiddleware',  # first, so it times everything below
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # static files, before anything touches the session
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,20 +64,30 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Templates are compiled once per process and kept by the cached loader.
+# In development it notices edited files (the autoreloader resets it); in
+# production (DEBUG off) TEMPLATE_PRELOAD also compiles every polls
+# template at startup, so no first visitor pays for parsing.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the standard backend, timing renders for polls.metrics
+        'BACKEND': 'polls.metrics.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
+TEMPLATE_PRELOAD = os.environ.get('TEMPLATE_PRELOAD', '0' if DEBUG else '1') == '1'
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
@@ -73,11 +95,139 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default, single node) or postgres. DB_REPLICAS lists
+# read replicas (hosts for postgres, database files for sqlite); when set,
+# polls.routers.ReplicaRouter sends reads to them and writes to 'default'.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'makeup_community'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL', '0') == '1':
+        # psycopg_pool keeps the connections open; Django requires
+        # CONN_MAX_AGE=0 alongside it
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # WAL lets readers run alongside the writer; NORMAL sync is
+                # safe in WAL mode and skips an fsync per commit
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+                # seconds to wait on a locked database (busy_timeout)
+                'timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+                # take the write lock at BEGIN instead of failing to upgrade
+                # a read lock halfway through a transaction
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+if 'CONN_MAX_AGE' not in DATABASES['default']:
+    # persistent connections, checked before reuse after a request
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if DB_ENGINE == 'postgres' else 'NAME': replica.strip(),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # tests run everything against the default test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['polls.routers.ReplicaRouter']
+    # read-your-writes: after a write, the user reads from the primary for
+    # REPLICA_PIN_SECONDS (longer than the replicas' usual lag)
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+                      'polls.routers.ReplicaPinMiddleware')
+    REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# SITE_CACHE_BACKEND=locmem (per process, default) or file (shared by all
+# workers on one host, at SITE_CACHE_LOCATION)
+
+SITE_CACHE_BACKEND = os.environ.get('SITE_CACHE_BACKEND', 'locmem')
+
+if SITE_CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('SITE_CACHE_LOCATION', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'makeup-community',
+        }
     }
+
+# Rendered pages for anonymous visitors (polls/caching.py). Writes invalidate
+# them right away; the timeout only bounds how stale the KPI counters get.
+# Invalidation lives in the cache too, so with several worker processes use
+# a shared backend (SITE_CACHE_BACKEND=file): with locmem each worker only
+# sees its own writes and may serve the others' stale pages until timeout
+# (the scope versions expire with the pages).
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))
+
+# ETag/Last-Modified and 304 responses come from the same scope versions, and
+# a client can revalidate against any worker, so they need the shared cache.
+# Set PAGE_CONDITIONAL_GET=1 with locmem only when there is one process.
+PAGE_CONDITIONAL_GET = os.environ.get(
+    'PAGE_CONDITIONAL_GET', '0' if SITE_CACHE_BACKEND == 'locmem' else '1') == '1'
+
+# Review exports (polls/exports.py) stop this many seconds before "now", so
+# rows from transactions still committing land in the next incremental export.
+EXPORT_SETTLE_SECONDS = int(os.environ.get('EXPORT_SETTLE_SECONDS', 60))
+
+
+# Async versions of the hot read pages (polls/async_views.py). mysite/asgi.py
+# turns this on; under WSGI the sync views are faster.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+
+# Request metrics (polls/metrics.py): Prometheus text at /metrics/ for staff,
+# or for a scraper sending "Authorization: Bearer $METRICS_TOKEN".
+# Requests slower than SLOW_REQUEST_MS are logged by "polls.metrics".
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_WINDOW_SECONDS = int(os.environ.get('METRICS_WINDOW_SECONDS', 300))
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'polls': {'handlers': ['console'], 'level': os.environ.get('POLLS_LOG_LEVEL', 'INFO')},
+    },
 }
 
 
@@ -117,18 +267,29 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-# Additional locations of static files
-STATICFILES_DIRS = [
-    BASE_DIR / "polls" / "static",
+# polls/static is found by the app directories finder.
+# `manage.py collectstatic` gathers everything here for production, where
+# polls.staticfiles minifies the CSS, hashes every name and stores .br/.gz
+# copies, and WhiteNoiseMiddleware serves them (hashed names cached for good).
+STATIC_ROOT = Path(os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': ('django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'polls.staticfiles.MinifiedCompressedManifestStorage'),
+    },
+}
+# the product images also exist under canonical ASCII names (polls/assets.py)
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'polls.assets.AssetFinder',
 ]
-
-# Static files storage
+# names with a 12-hex content hash (the manifest's and the assets') never change
+WHITENOISE_IMMUTABLE_FILE_TEST = r'^.+\.[0-9a-f]{12}\.[^./]+$'
 if DEBUG:
-    # Development: use default storage
-    pass
-else:
-    # Production: use whitenoise
-    STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    # WhiteNoise finds the files in polls/static; STATIC_ROOT needn't exist yet
+    warnings.filterwarnings('ignore', message='No directory at')
 
 
 
@@ -147,3 +308,16 @@ LOGIN_URL = "login"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Resized AVIF/WebP product images (polls/images.py). Build them with
+# `manage.py generate_image_variants`; when lazy, the first request builds them.
+IMAGE_VARIANT_FORMATS = ("avif", "webp")
+IMAGE_VARIANTS_LAZY = os.environ.get('IMAGE_VARIANTS_LAZY', '1' if DEBUG else '0') == '1'
+
+# Review uploads: size limits checked in the form, processing done by
+# `manage.py run_jobs` (polls/jobs.py, polls/uploads.py)
+REVIEW_PHOTO_MAX_BYTES = 15 * 1024 * 1024
+REVIEW_VIDEO_MAX_BYTES = 200 * 1024 * 1024
+RECEIPT_MAX_BYTES = 10 * 1024 * 1024
+REVIEW_PHOTO_MAX_EDGE = 2048
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 15 * 60))  # seconds before a stuck job is re-queued
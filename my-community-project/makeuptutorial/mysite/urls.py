@@ -27,7 +27,6 @@ urlpatterns = [
     path("", include("polls.urls")),
 ]
 
-# Serve static files during development
+# Serve uploads during development (static files: WhiteNoiseMiddleware)
 if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,6 +1,12 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Product, Review
+from .models import Job, Product, Review
 admin.site.register(Product)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "finished_at")
+    list_filter = ("status", "name")
@@ -0,0 +1,256 @@
+"""
+Read-only JSON API, mounted at /api/v1/.
+
+    GET products/                  ?q= &category= &min= &max= &sort= (as on /products/)
+    GET products/<pk>/             one product, with its rating histogram
+    GET products/<pk>/reviews/     ?rating= &verified=true &skin_type= &sort= (as on the review list)
+    GET trends/                    ?days= &category=
+
+Every endpoint takes ?fields=a,b,c to return only some fields (and select
+only those columns); lists take ?limit= and page with keyset cursors
+(polls/pagination.py): {"results": [...], "next": <url of the next page or null>}.
+Rows come straight from values(), without building model instances.
+Product images are given as `image_src`, the URL they are served under
+(the canonical asset name, see polls/assets.py), never the raw image_url.
+
+Responses are gzipped for clients that accept it and go through the same
+page cache, ETag/304 and invalidation as the HTML pages (polls/caching.py).
+"""
+from django.db.models import Count, F, Q
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import generic
+from django.views.decorators.gzip import gzip_page
+
+from . import caching, search, trending
+from .caching import CachedPageMixin
+from .models import Product, Review, ReviewMedia, static_image_url
+from .pagination import InvalidCursor, keyset_page
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@method_decorator(gzip_page, name="dispatch")
+class ApiView(CachedPageMixin, generic.View):
+    """
+    `fields` maps each public field name to the model field (or expression)
+    it is read from, `converters` the ones whose value is post-processed;
+    `ordering` is looked up by the ?sort= value.
+    """
+    fields = {}
+    converters = {}
+    orderings = {}
+    default_sort = None
+    public_max_age = 60
+    conditional_get = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return JsonResponse(self.get_data())
+        except ApiError as exc:
+            return JsonResponse({"error": str(exc)}, status=exc.status)
+
+    def selected_fields(self):
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.fields)
+        names = list(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def values(self, qs, names, extra=()):
+        """qs.values() of the public fields `names` (read from their sources) and of `extra` as is"""
+        plain = [name for name in names if self.fields[name] == name] + list(extra)
+        renamed = {name: self.fields[name] for name in names if self.fields[name] != name}
+        renamed = {name: F(source) if isinstance(source, str) else source for name, source in renamed.items()}
+        return qs.values(*plain, **renamed)
+
+    def limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise ApiError("limit must be an integer")
+        return max(1, min(limit, MAX_LIMIT))
+
+    def get_ordering(self):
+        sort = self.request.GET.get("sort") or self.default_sort
+        if sort not in self.orderings:
+            raise ApiError(f"Unknown sort {sort!r}. Available: {', '.join(self.orderings)}")
+        return self.orderings[sort]
+
+    def paginate(self, qs, ordering):
+        """One keyset page of `qs` with the selected fields, as the response body"""
+        names = self.selected_fields()
+        # the cursor is made of the ordering values, so select them even if not requested
+        keys = [order.lstrip("-") for order in ordering]
+        hidden = [key for key in keys if key not in names]
+        rows = self.values(qs, names, extra=hidden)
+        try:
+            rows, cursor = keyset_page(rows, ordering, self.request.GET.get("cursor"), self.limit())
+        except InvalidCursor:
+            raise ApiError("Invalid cursor")
+        for row in rows:
+            for key in hidden:
+                del row[key]
+            self.convert(row)
+        return {"results": rows, "next": self.next_url(cursor)}
+
+    def convert(self, row):
+        for name, convert in self.converters.items():
+            if name in row:
+                row[name] = convert(row[name])
+        return row
+
+    def next_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params["cursor"] = cursor
+        return self.request.build_absolute_uri(f"{self.request.path}?{params.urlencode()}")
+
+
+PRODUCT_FIELDS = {
+    **{name: name for name in ["id", "brand", "name", "category", "price"]},
+    "image_src": "image_url",
+    **{name: name for name in ["rating_avg", "rating_count", "created_at"]},
+}
+PRODUCT_CONVERTERS = {"image_src": static_image_url}
+
+
+class ProductListApi(ApiView):
+    fields = PRODUCT_FIELDS
+    converters = PRODUCT_CONVERTERS
+    orderings = {
+        "rating": ["-rating_avg", "-id"],
+        "reviewed": ["-rating_count", "-id"],
+        "newest": ["-id"],
+        "price_asc": ["price", "-id"],
+        "price_desc": ["-price", "-id"],
+        "name": ["name", "-id"],
+        "relevance": ["search_rank"],
+    }
+    cache_params = ("q", "category", "min", "max", "sort", "fields", "limit", "cursor")
+
+    def get_cache_scopes(self):
+        return caching.listing_scopes(self.request.GET.get("category") or "")
+
+    def get_data(self):
+        params = self.request.GET
+        qs = Product.objects.filter(has_image=True)
+        if params.get("category"):
+            qs = qs.filter(category=params["category"])
+        try:
+            if params.get("min"):
+                qs = qs.filter(price__gte=float(params["min"]))
+            if params.get("max"):
+                qs = qs.filter(price__lte=float(params["max"]))
+        except ValueError:
+            raise ApiError("min and max must be numbers")
+
+        self.default_sort = "relevance" if params.get("q") else "rating"
+        ordering = self.get_ordering()
+        if params.get("q"):
+            matches = search.search_products(params["q"], within=qs)
+            qs = qs.filter(pk__in=matches).annotate(search_rank=search.relevance(matches))
+        elif ordering == self.orderings["relevance"]:
+            raise ApiError("sort=relevance needs a search query (q)")
+        if ordering[0].lstrip("-") == "price":
+            qs = qs.exclude(price=None)  # no position for unpriced products in a price-keyed cursor
+        return self.paginate(qs, ordering)
+
+
+class ProductDetailApi(ApiView):
+    fields = {**PRODUCT_FIELDS, "description": "description", "rating_histogram": "rating_histogram"}
+    converters = PRODUCT_CONVERTERS
+    cache_params = ("fields",)
+
+    def get_cache_scopes(self):
+        return [caching.product_scope(self.kwargs["pk"])]
+
+    def values(self, qs, names, extra=()):
+        # the histogram is assembled from the five stored per-star counts
+        extra = list(extra)
+        if "rating_histogram" in names:
+            extra += [f"rating_{star}_count" for star in range(1, 6)]
+        return super().values(qs, [name for name in names if name != "rating_histogram"], extra)
+
+    def get_data(self):
+        names = self.selected_fields()
+        product = self.values(Product.objects.filter(pk=self.kwargs["pk"]), names).first()
+        if product is None:
+            raise ApiError("Product not found", status=404)
+        if "rating_histogram" in names:
+            product["rating_histogram"] = {str(star): product.pop(f"rating_{star}_count") for star in range(1, 6)}
+        return self.convert(product)
+
+
+class ProductReviewsApi(ApiView):
+    fields = {
+        **{name: name for name in ["id", "product_id", "title", "body", "rating", "is_verified_purchase",
+                                   "helpful_votes", "not_helpful_votes", "skin_type", "skin_tone", "age_range",
+                                   "created_at", "updated_at"]},
+        "author": "user__username",
+        "media_count": Count("media", filter=Q(media__status=ReviewMedia.READY)),
+    }
+    orderings = {
+        "newest": ["-created_at", "-id"],
+        "oldest": ["created_at", "id"],
+        "highest_rating": ["-rating", "-created_at", "-id"],
+        "lowest_rating": ["rating", "-created_at", "-id"],
+        "most_helpful": ["-helpful_votes", "-id"],
+    }
+    default_sort = "newest"
+    cache_params = ("rating", "verified", "skin_type", "sort", "fields", "limit", "cursor")
+
+    def get_cache_scopes(self):
+        return [caching.product_scope(self.kwargs["pk"])]
+
+    def get_data(self):
+        if not Product.objects.filter(pk=self.kwargs["pk"]).exists():
+            raise ApiError("Product not found", status=404)
+        params = self.request.GET
+        qs = Review.objects.filter(product_id=self.kwargs["pk"])
+        if params.get("rating"):
+            if params["rating"] not in {"1", "2", "3", "4", "5"}:
+                raise ApiError("rating must be 1-5")
+            qs = qs.filter(rating=params["rating"])
+        if params.get("verified") == "true":
+            qs = qs.filter(is_verified_purchase=True)
+        if params.get("skin_type"):
+            qs = qs.filter(skin_type=params["skin_type"])
+        return self.paginate(qs, self.get_ordering())
+
+
+class TrendsApi(ApiView):
+    fields = {
+        **{name: name for name in ["id", "brand", "name", "category"]},
+        "image_src": "image_url",
+        **{name: name for name in ["rating_avg", "rating_count"]},
+        **{name: name for name in ["rank", "trending_score", "recent_reviews", "recent_avg"]},
+    }
+    converters = PRODUCT_CONVERTERS
+    orderings = {"rank": ["rank"]}
+    default_sort = "rank"
+    cache_params = ("days", "category", "fields", "limit", "cursor")
+
+    def get_cache_scopes(self):
+        return ["trending", *caching.listing_scopes(self.request.GET.get("category") or "")]
+
+    def get_data(self):
+        try:
+            days = trending.snap_window(int(self.request.GET.get("days", trending.DEFAULT_WINDOW)))
+        except ValueError:
+            raise ApiError("days must be an integer")
+        qs = trending.trending_products(days, self.request.GET.get("category") or "")
+        data = self.paginate(qs, self.get_ordering())
+        data["days"] = days
+        return data
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401 (connect their receivers)
+
+        if getattr(settings, 'TEMPLATE_PRELOAD', False):
+            from . import templating
+            templating.preload()
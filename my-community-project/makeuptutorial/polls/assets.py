@@ -0,0 +1,152 @@
+"""
+Registry of the product images shipped in polls/static/img/products.
+
+Their filenames are the product names ("Huda Beauty — Power Bullet Matte
+Lipstick “Interview”.jpg"), which make long percent-encoded URLs and
+break when a checkout stores them decomposed (NFD, as macOS does). Each
+file gets a canonical, ASCII name made of a slug and its content hash:
+
+    assets/products/huda-beauty-power-bullet-matte-lipstick-interview.3f2a9c1b7d0e.jpg
+
+The registry (built once per process from the files) maps both the
+original `/static/...` URL, in whatever Unicode normalization or
+percent-encoding it was written, and the canonical name to the file.
+AssetFinder publishes the canonical names as static files (WhiteNoise
+serves them, collectstatic copies them), and since they change with the
+content they are cached for good.
+
+Product.save looks image_url up here to set has_image and its
+ImageAsset row (the product -> asset mapping table);
+`manage.py sync_image_assets` does it for every product and, with
+--check, fails the deploy when an image_url doesn't resolve.
+"""
+import functools
+import hashlib
+import unicodedata
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+from django.utils.text import slugify
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+SOURCE_DIRS = ["img/products"]
+PREFIX = "assets/products/"
+
+
+class Asset(NamedTuple):
+    name: str  # canonical, relative to STATIC_URL
+    source: str  # the original file, relative to polls/static (NFC)
+    path: Path
+    sha256: str
+    size: int
+
+
+class Registry(NamedTuple):
+    by_source: dict
+    by_name: dict
+
+
+def _key(relative):
+    return unicodedata.normalize("NFC", unquote(relative))
+
+
+def canonical_name(source, digest):
+    path = Path(source)
+    return f"{PREFIX}{slugify(path.stem) or 'image'}.{digest[:12]}{path.suffix.lower()}"
+
+
+@functools.cache
+def registry():
+    """Every shipped image, hashed once per process (registry.cache_clear() to rescan)"""
+    by_source, by_name = {}, {}
+    for directory in SOURCE_DIRS:
+        for path in sorted((STATIC_DIR / directory).iterdir()):
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            data = path.read_bytes()
+            source = _key(path.relative_to(STATIC_DIR).as_posix())
+            digest = hashlib.sha256(data).hexdigest()
+            asset = Asset(canonical_name(source, digest), source, path, digest, len(data))
+            by_source[source] = by_name[asset.name] = asset
+    return Registry(by_source, by_name)
+
+
+def lookup(url):
+    """The Asset behind an image URL ('/static/...' original or canonical), or None"""
+    url = (url or "").strip()
+    if not url.startswith(settings.STATIC_URL):
+        return None
+    relative = _key(url[len(settings.STATIC_URL):])
+    found = registry()
+    return found.by_source.get(relative) or found.by_name.get(relative)
+
+
+def stored(asset):
+    """The ImageAsset row of an Asset (created on first use), or None"""
+    from .models import ImageAsset
+
+    if asset is None:
+        return None
+    row, _ = ImageAsset.objects.get_or_create(
+        name=asset.name, defaults={"source": asset.source, "sha256": asset.sha256, "size": asset.size},
+    )
+    return row
+
+
+def link_products():
+    """
+    Store every asset and point each product at the one behind its
+    image_url (has_image follows). Returns (products updated, unresolved
+    image_urls with their product count).
+    """
+    from .models import Product
+
+    updated, unresolved = 0, {}
+    rows = {asset.name: stored(asset) for asset in registry().by_name.values()}
+    for url in Product.objects.order_by().values_list("image_url", flat=True).distinct():
+        asset = lookup(url)
+        row = rows[asset.name] if asset else None
+        products = Product.objects.filter(image_url=url)
+        if row is None and url:
+            unresolved[url] = products.count()
+        updated += products.exclude(image_asset=row, has_image=row is not None).update(
+            image_asset=row, has_image=row is not None,
+        )
+    return updated, unresolved
+
+
+class AssetStorage(FileSystemStorage):
+    """Canonical names, read from the original files"""
+
+    def __init__(self):
+        super().__init__(location=STATIC_DIR)
+
+    def path(self, name):
+        asset = registry().by_name.get(name)
+        return str(asset.path) if asset else super().path(name)
+
+
+class AssetFinder(BaseFinder):
+    """Staticfiles finder serving the registry's canonical names"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = AssetStorage()
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, find_all=False, **kwargs):
+        asset = registry().by_name.get(path)
+        found = str(asset.path) if asset else None
+        if find_all or kwargs.get("all"):  # "all" before Django 6.1
+            return [found] if found else []
+        return found
+
+    def list(self, ignore_patterns):
+        for name in registry().by_name:
+            yield name, self.storage
@@ -0,0 +1,141 @@
+"""
+Async versions of the hot read pages, served instead of the sync ones
+when ASYNC_READ_VIEWS is on (mysite/asgi.py turns it on; run it with
+uvicorn, see `manage.py loadtest` to compare with gunicorn).
+
+Each one subclasses its sync view and keeps its template, cache scopes
+and context. `get` loads what the page needs with the async ORM, starting
+the independent parts together with asyncio.gather - the page's rows and
+the row count and the site counters, or the product's review page and
+the viewer's own review - and the sync get_context_data then runs on the
+preloaded data through the get_kpis / paginate_queryset /
+get_review_page / get_user_review hooks.
+
+Session, user, flash messages, page cache and ETag checks happen in a
+single hop to the sync side (AsyncCachedPageMixin), so a cache hit or a
+304 costs one thread switch and no database work in the event loop.
+
+Django's async ORM still runs each query on the request's sync thread,
+one after the other: gather() saves the round trips between the event
+loop and that thread, not database time.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+
+from . import views
+from .caching import CachedPageMixin
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def apaginate(view, queryset, page_size):
+    """MultipleObjectMixin.paginate_queryset, with the count and the page's rows fetched together"""
+    paginator = view.get_paginator(queryset, page_size, allow_empty_first_page=view.get_allow_empty())
+    page = view.kwargs.get(view.page_kwarg) or view.request.GET.get(view.page_kwarg) or 1
+    if page == "last":
+        paginator.count = await queryset.acount()
+        page = paginator.num_pages
+    try:
+        number = int(page)
+    except ValueError:
+        raise Http404("Page is not “last”, nor can it be converted to an int.")
+    bottom = max(number - 1, 0) * page_size
+    count, rows = await asyncio.gather(queryset.acount(), _alist(queryset[bottom:bottom + page_size]))
+    paginator.count = count
+    try:
+        page = paginator.page(number)
+    except InvalidPage as e:
+        raise Http404(f"Invalid page ({number}): {e}")
+    page.object_list = rows
+    return paginator, page, rows, page.has_other_pages()
+
+
+class AsyncCachedPageMixin(CachedPageMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        key, validators, response = await sync_to_async(self.sync_lookup)()
+        if response is not None:
+            return response
+        # View.dispatch, which awaits the async handler
+        response = await super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+        return self.cache_store(key, response, validators)
+
+    def sync_lookup(self):
+        # load the user (and with it the session) here, so the event loop never does
+        self.request.user.is_authenticated
+        return self.cache_lookup()
+
+
+class AsyncListMixin(AsyncCachedPageMixin):
+    kpis = None
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        page_size = self.get_paginate_by(self.object_list)
+        if page_size:
+            self.paginated, self.kpis = await asyncio.gather(
+                apaginate(self, self.object_list, page_size), self.aget_kpis(),
+            )
+        else:
+            self.kpis = await self.aget_kpis()
+        return self.render_to_response(self.get_context_data())
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def aget_kpis(self):
+        if not hasattr(super(), "get_kpis"):
+            return None
+        return await sync_to_async(super().get_kpis)()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.paginated
+
+    def get_kpis(self):
+        return self.kpis
+
+
+class ProductList(AsyncListMixin, views.ProductList):
+    pass
+
+
+class ProductBrowse(AsyncListMixin, views.ProductBrowse):
+    async def aget_queryset(self):
+        if self.request.GET.get("q"):
+            # the full-text lookup is raw SQL on the sync side
+            return await sync_to_async(self.get_queryset)()
+        return self.get_queryset()
+
+
+class TrendsView(AsyncListMixin, views.TrendsView):
+    async def aget_queryset(self):
+        # picking the stored or the live ranking queries the database
+        return await sync_to_async(self.get_queryset)()
+
+
+class ProductDetail(AsyncCachedPageMixin, views.ProductDetail):
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs["pk"])
+        self.review_page, self.user_review = await asyncio.gather(
+            # the keyset page and its prefetches in one trip to the sync side
+            sync_to_async(super().get_review_page)(),
+            self.aget_user_review(),
+        )
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_user_review(self):
+        user = self.request.user  # loaded by sync_lookup
+        if user.is_authenticated:
+            return await self.object.reviews.filter(user=user).only("pk").afirst()
+        return None
+
+    def get_review_page(self):
+        return self.review_page
+
+    def get_user_review(self):
+        return self.user_review
@@ -0,0 +1,273 @@
+"""
+Request benchmarks and query budgets for every URL in polls/urls.py.
+
+`scenarios()` builds one request per URL name against whatever is in the
+database (the most-reviewed product, its newest review and that review's
+author); `run_scenario` times it and counts its queries, and the
+`benchmark` command seeds one of DATASETS with BulkSeeder first, runs them
+all and writes a JSON report that `--compare` diffs against an earlier one.
+
+Each scenario is measured "cold" (page cache cleared before every request,
+so the queries are those of a real render) and "warm" (the second visitor).
+QUERY_BUDGETS caps the cold query count; QueryBudgetTests fails when a
+view goes over, and when a URL has no scenario or budget at all.
+"""
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.http.request import validate_host
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Product, Review, ReviewHelpfulness, ReviewMedia
+from .views import ProductDetail, review_feed_page
+
+# rows per table for `benchmark --size` (BulkSeeder grows the tables to these)
+DATASETS = {
+    "small": {"users": 200, "products": 300, "reviews": 5_000, "votes": 2_000},
+    "medium": {"users": 2_000, "products": 2_000, "reviews": 100_000, "votes": 50_000},
+    "large": {"users": 20_000, "products": 5_000, "reviews": 1_000_000, "votes": 500_000},
+}
+
+# most queries a cold request may run, whatever the dataset size. Logged-in
+# pages include the session and user lookups (2); the trends pages check
+# that compute_trending has stored their window (1).
+QUERY_BUDGETS = {
+    "product-list": 3,
+    "products": 4,
+    "product-create": 2,
+    "product-detail": 3,
+    "product-review-feed": 3,
+    "product-image": 1,
+    "product-update": 3,
+    "product-delete": 3,
+    "review-create": 3,
+    "review-list": 4,
+    "review-helpful": 10,
+    "review-update": 3,
+    "review-delete": 3,
+    "user-profile": 6,
+    "missions": 2,
+    "logout": 4,
+    "about": 3,
+    "trends": 3,
+    "review-export": 3,
+    "metrics": 2,
+    "api-products": 1,
+    "api-product": 1,
+    "api-product-reviews": 2,
+    "api-trends": 2,
+}
+
+
+class Scenario:
+    def __init__(self, name, path, method="GET", data=None, user=None):
+        self.name = name  # the URL name in polls/urls.py
+        self.path = path
+        self.method = method
+        self.data = data
+        self.user = user
+
+
+def scenarios():
+    """One request per URL in polls/urls.py, against the current data"""
+    product = Product.objects.filter(has_image=True).order_by("-rating_count", "id").first()
+    if product is None:
+        raise ValueError("No products to benchmark against; seed some data first")
+    review = product.reviews.select_related("user").order_by("-created_at", "-id").first()
+    if review is None:
+        raise ValueError(f"{product} has no reviews to benchmark against")
+    author = review.user
+    staff = get_user_model().objects.filter(is_staff=True).first()
+    _, after = review_feed_page(product, None, ProductDetail.review_page_size)
+    since = urlencode({"since": (timezone.now() - timedelta(days=1)).isoformat()})
+
+    found = [
+        Scenario("product-list", reverse("product-list")),
+        Scenario("products", reverse("products") + "?sort=rating&page=2"),
+        Scenario("product-create", reverse("product-create"), user=author),
+        Scenario("product-detail", reverse("product-detail", args=[product.pk])),
+        Scenario("product-review-feed", reverse("product-review-feed", args=[product.pk]) + f"?after={after or ''}"),
+        Scenario("product-image", reverse("product-image", args=[product.pk, "card", 320, "webp"])),
+        Scenario("product-update", reverse("product-update", args=[product.pk]), user=author),
+        Scenario("product-delete", reverse("product-delete", args=[product.pk]), user=author),
+        Scenario("review-create", reverse("review-create", args=[product.pk]), user=author),
+        Scenario("review-list", reverse("review-list", args=[product.pk]) + "?sort=most_helpful"),
+        Scenario("review-helpful", reverse("review-helpful", args=[review.pk]), method="POST",
+                 data={"is_helpful": "true"}, user=author),
+        Scenario("review-update", reverse("review-update", args=[review.pk]), user=author),
+        Scenario("review-delete", reverse("review-delete", args=[review.pk]), user=author),
+        Scenario("user-profile", reverse("user-profile"), user=author),
+        Scenario("missions", reverse("missions"), user=author),
+        Scenario("logout", reverse("logout"), method="POST", user=author),
+        Scenario("about", reverse("about")),
+        Scenario("trends", reverse("trends") + "?days=30"),
+        Scenario("api-products", reverse("api-products") + "?sort=reviewed"),
+        Scenario("api-product", reverse("api-product", args=[product.pk])),
+        Scenario("api-product-reviews", reverse("api-product-reviews", args=[product.pk])),
+        Scenario("api-trends", reverse("api-trends")),
+    ]
+    if staff is not None:
+        found += [
+            Scenario("review-export", reverse("review-export", args=["csv"]) + f"?{since}", user=staff),
+            Scenario("metrics", reverse("metrics"), user=staff),
+        ]
+    return found
+
+
+def _login(client, scenario):
+    if scenario.user is not None and "_auth_user_id" not in client.session:
+        client.force_login(scenario.user)  # again after "logout"
+
+
+def _request(client, scenario):
+    response = client.generic(scenario.method, scenario.path, data=urlencode(scenario.data or {}),
+                              content_type="application/x-www-form-urlencoded")
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response, size
+
+
+def _client():
+    # a Host the site accepts: "testserver" only exists under the test runner
+    allowed = settings.ALLOWED_HOSTS or ([".localhost", "127.0.0.1", "[::1]"] if settings.DEBUG else [])
+    for host in ("testserver", "localhost", *[h.lstrip(".*") for h in allowed]):
+        if validate_host(host, allowed):
+            return Client(HTTP_HOST=host)
+    return Client()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def _timed(client, scenario, iterations, cold):
+    timings, queries = [], []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        _login(client, scenario)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response, size = _request(client, scenario)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    return response, size, timings, queries
+
+
+def run_scenario(scenario, iterations=20, warmup=2):
+    """Latency percentiles (ms), query counts and peak Python memory of one scenario"""
+    client = _client()
+    for _ in range(warmup):
+        _login(client, scenario)
+        _request(client, scenario)
+    response, size, cold_ms, cold_queries = _timed(client, scenario, iterations, cold=True)
+    _, _, warm_ms, warm_queries = _timed(client, scenario, iterations, cold=False)
+
+    # memory on a separate request: tracemalloc would distort the timings
+    cache.clear()
+    _login(client, scenario)
+    tracemalloc.start()
+    try:
+        _request(client, scenario)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "name": scenario.name,
+        "method": scenario.method,
+        "path": scenario.path,
+        "logged_in": scenario.user is not None,
+        "status": response.status_code,
+        "bytes": size,
+        "queries": max(cold_queries),
+        "queries_warm": max(warm_queries),
+        "budget": QUERY_BUDGETS.get(scenario.name),
+        "p50_ms": round(statistics.median(cold_ms), 2),
+        "p95_ms": round(_percentile(cold_ms, 95), 2),
+        "p99_ms": round(_percentile(cold_ms, 99), 2),
+        "max_ms": round(max(cold_ms), 2),
+        "warm_p50_ms": round(statistics.median(warm_ms), 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def dataset_counts():
+    return {
+        "users": get_user_model().objects.count(),
+        "products": Product.objects.count(),
+        "reviews": Review.objects.count(),
+        "votes": ReviewHelpfulness.objects.count(),
+        "media": ReviewMedia.objects.count(),
+        "max_reviews_per_product": Review.objects.values("product").annotate(n=Count("id"))
+                                   .order_by("-n").values_list("n", flat=True).first() or 0,
+    }
+
+
+def run(names=None, iterations=20, warmup=2, out=None):
+    """Run every scenario (or those named) and return the report"""
+    results = []
+    for scenario in scenarios():
+        if names and scenario.name not in names:
+            continue
+        result = run_scenario(scenario, iterations=iterations, warmup=warmup)
+        if out:
+            out(f"  {result['name']:<22} {result['status']}  p50 {result['p50_ms']:7.2f} ms  "
+                f"p95 {result['p95_ms']:7.2f} ms  {result['queries']:>3} queries  {result['peak_kb']:8.1f} KB")
+        results.append(result)
+    return {
+        "commit": _git_commit(),
+        "created": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "iterations": iterations,
+        "dataset": dataset_counts(),
+        "results": results,
+    }
+
+
+def over_budget(report):
+    return [r for r in report["results"] if r["budget"] is not None and r["queries"] > r["budget"]]
+
+
+def compare(report, baseline):
+    """Per-scenario changes between two reports: (name, p50 ratio, p95 ratio, query delta)"""
+    before = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for result in report["results"]:
+        old = before.get(result["name"])
+        if old is None:
+            continue
+        rows.append((
+            result["name"],
+            result["p50_ms"] / old["p50_ms"] if old["p50_ms"] else None,
+            result["p95_ms"] / old["p95_ms"] if old["p95_ms"] else None,
+            result["queries"] - old["queries"],
+        ))
+    return rows
@@ -0,0 +1,215 @@
+"""
+Rendered-page and template-fragment caching.
+
+Nothing is ever deleted to invalidate: every cache key embeds the current
+version of the "scopes" its content depends on, and writes bump those
+versions so the old entries are simply never read again (and age out).
+
+Scopes:
+
+- "site": everything (bulk loads that bypass the model signals)
+- "catalog": any product added, edited or deleted
+- "product:<pk>": that product, its reviews, their media and votes
+- "category:<slug>" / "category:*": reviews on products in that category /
+  in any category (ratings and counts shown on the listing cards)
+- "trending": the precomputed trending lists
+
+Versions are bumped after commit from polls/signals.py (and from the few
+plain UPDATEs that bypass signals). Pages are cached for anonymous visitors
+only (CachedPageMixin); fragments ({% cache %} with the `cache_version`
+filter) are shared by everyone.
+
+Each version also records when it was bumped, so the same lookup gives
+pages an ETag and a Last-Modified date without touching the database.
+That is only safe when every worker sees the same versions, so 304s are
+off unless PAGE_CONDITIONAL_GET says the cache is shared. Versions expire
+with the pages (PAGE_CACHE_TIMEOUT), which bounds how long a per-process
+cache can miss another worker's bumps.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Product, Review
+
+VERSION_PREFIX = "cache-version:"
+PAGE_PREFIX = "page:"
+
+
+def page_timeout():
+    return getattr(settings, "PAGE_CACHE_TIMEOUT", 300)
+
+
+def conditional_get_enabled():
+    return getattr(settings, "PAGE_CONDITIONAL_GET", False)
+
+
+def _new_version():
+    # a random token rather than a counter: a version key that gets evicted
+    # can't come back as a value older pages were cached under
+    return uuid.uuid4().hex[:12], int(time.time())
+
+
+def scope_state(*scopes):
+    """
+    (version, changed) for scopes (plus "site"): one string of their version
+    tokens, and the Unix time the most recent of them was bumped
+    """
+    keys = [VERSION_PREFIX + scope for scope in ("site", *scopes)]
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, page_timeout())
+        found.update(missing)
+    return ".".join(found[key][0] for key in keys), max(found[key][1] for key in keys)
+
+
+def versions(*scopes):
+    """Current version token of each scope (plus "site"), as one string"""
+    return scope_state(*scopes)[0]
+
+
+def bump(*scopes):
+    cache.set_many({VERSION_PREFIX + scope: _new_version() for scope in scopes}, page_timeout())
+
+
+def product_scope(product_id):
+    return f"product:{product_id}"
+
+
+def category_scope(category):
+    return f"category:{category or '*'}"
+
+
+def listing_scopes(category=""):
+    """What a product listing (optionally filtered to one category) depends on"""
+    return ["catalog", category_scope(category)]
+
+
+def product_changed(product_id):
+    """The product row itself changed: its page and every listing showing it"""
+    bump(product_scope(product_id), "catalog")
+
+
+def reviews_changed(product_id, category=None):
+    """A review (or its media/votes) changed: the product's pages and its category's cards"""
+    if category is None:
+        category = Product.objects.filter(pk=product_id).values_list("category", flat=True).first()
+    bump(product_scope(product_id), category_scope(category), category_scope(""))
+
+
+def review_changed(review_id):
+    """Something shown only on the review itself (media, votes) changed"""
+    product_id = Review.objects.filter(pk=review_id).values_list("product_id", flat=True).first()
+    if product_id is not None:
+        bump(product_scope(product_id))
+
+
+def invalidate_all():
+    bump("site")
+
+
+def fragment_version(obj):
+    """Version for a fragment showing a product (or one of its reviews)"""
+    product_id = obj.pk if isinstance(obj, Product) else obj.product_id
+    return versions(product_scope(product_id))
+
+
+class CachedPageMixin:
+    """
+    Serve anonymous GETs from the cache. `cache_params` lists the query
+    parameters that change the page (others, e.g. utm_*, share one entry);
+    `get_cache_scopes` what it depends on.
+
+    With `conditional_get`, every visitor also gets Cache-Control and, when
+    PAGE_CONDITIONAL_GET is on, an ETag/Last-Modified pair and a 304 when
+    their copy is still current (the ETag covers the user, so logged-in
+    pages revalidate per user).
+    """
+    cache_params = ("page",)
+    conditional_get = False
+    # seconds anonymous clients (and shared caches) may reuse a response
+    # without revalidating; 0 means always revalidate
+    public_max_age = 0
+
+    def get_cache_scopes(self):
+        return []
+
+    def page_cacheable(self):
+        return (
+            self.request.method in ("GET", "HEAD")
+            and not len(get_messages(self.request))  # one-off flash messages
+        )
+
+    def page_signature(self, version, *extra):
+        params = [(name, self.request.GET.get(name, "")) for name in self.cache_params]
+        raw = "|".join([self.request.path, repr(params), version, *extra])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def page_etag(self, version):
+        user = self.request.user
+        # a new login rotates the CSRF secret embedded in the page's forms
+        viewer = [str(user.pk), self.request.META.get("CSRF_COOKIE", "")] if user.is_authenticated else []
+        return quote_etag(self.page_signature(version, *viewer))
+
+    def dispatch(self, request, *args, **kwargs):
+        key, validators, response = self.cache_lookup()
+        if response is not None:
+            return response
+        return self.cache_store(key, super().dispatch(request, *args, **kwargs), validators)
+
+    def cache_lookup(self):
+        """
+        (page cache key, validators, response) before running the view: the
+        response is a 304 or a cache hit that can be sent as is, or None
+        """
+        if not self.page_cacheable():
+            return None, {}, None
+        version, changed = scope_state(*self.get_cache_scopes())
+        validators = {}
+        if self.conditional_get and conditional_get_enabled():
+            validators = {"etag": self.page_etag(version), "last_modified": changed}
+            not_modified = get_conditional_response(self.request, **validators)
+            if not_modified is not None:
+                return None, validators, self.add_validators(not_modified, **validators)
+
+        if self.request.user.is_authenticated:
+            return None, validators, None
+        key = PAGE_PREFIX + self.page_signature(version)
+        hit = cache.get(key)
+        if hit is not None:
+            content, content_type = hit
+            return key, validators, self.add_validators(HttpResponse(content, content_type=content_type), **validators)
+        return key, validators, None
+
+    def cache_store(self, key, response, validators):
+        """Cache the view's response under `key` (if any) and add the validators"""
+        if key is not None and response.status_code == 200:
+            if hasattr(response, "add_post_render_callback"):
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(key, (rendered.content, rendered["Content-Type"]), page_timeout())
+                )
+            elif not response.streaming:
+                cache.set(key, (response.content, response["Content-Type"]), page_timeout())
+        return self.add_validators(response, **validators)
+
+    def add_validators(self, response, etag=None, last_modified=None):
+        if self.conditional_get and response.status_code in (200, 304):
+            if etag:
+                response["ETag"] = etag
+                response["Last-Modified"] = http_date(last_modified)
+            if self.request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            elif self.public_max_age:
+                patch_cache_control(response, public=True, max_age=self.public_max_age)
+            else:
+                # browsers keep the page but check back every time
+                patch_cache_control(response, no_cache=True)
+        return response
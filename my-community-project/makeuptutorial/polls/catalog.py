@@ -0,0 +1,265 @@
+"""
+Catalog import: supplier feeds (CSV, JSON array or NDJSON) into Product.
+
+    manage.py import_catalog feed.csv [--dry-run] [--batch-size 2000]
+
+Rows are read as a stream and matched to the existing products on the
+natural key (brand, name) - compared NFC-normalized, with whitespace
+collapsed and case folded - through one dict filled by a single query.
+Only the columns a feed has are compared, so a price-only feed updates
+prices and leaves the rest alone. New products are written with
+bulk_create and changed ones with bulk_update(fields=...) batch by batch;
+running the same feed again changes nothing.
+
+Bulk writes skip Product.save and its post_save signal, so the importer
+does that work itself: has_image and image_asset from the asset registry
+and the search index per batch, the product counter and the page caches
+once at the end.
+"""
+import csv
+import json
+import time
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import assets, caching, search, stats
+from .models import Product
+
+FIELDS = ("brand", "name", "category", "price", "image_url", "description")
+# fields the search index holds
+INDEXED = {"brand", "name", "category", "description"}
+# loaded with each product so bulk_update can write the image columns for the whole batch
+COLUMNS = ("id", *FIELDS, "has_image", "image_asset_id")
+MAX_ERRORS_KEPT = 100
+
+_CATEGORIES = {
+    spelling.casefold(): value
+    for value, label in Product.CATEGORY_CHOICES
+    for spelling in (value, label)
+}
+_PRICE_LIMIT = Decimal(10) ** (Product._meta.get_field("price").max_digits - 2)
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(value):
+    return unicodedata.normalize("NFC", " ".join(str(value).split()))
+
+
+def natural_key(brand, name):
+    return _text(brand).casefold(), _text(name).casefold()
+
+
+def read_csv(stream):
+    """Rows of a CSV feed with a header line"""
+    yield from csv.DictReader(stream)
+
+
+def read_json(stream, chunk_size=1 << 16):
+    """Objects of a JSON array or of newline-delimited JSON, decoded as the stream is read"""
+    decoder = json.JSONDecoder()
+    buffer, eof, in_array, started = "", False, False, False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and not started:
+            started = True
+            in_array = buffer[0] == "["
+            buffer = buffer[1:] if in_array else buffer
+            continue
+        if in_array and buffer[:1] == ",":
+            buffer = buffer[1:]
+            continue
+        if in_array and buffer[:1] == "]":
+            return
+        if buffer:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield value
+                buffer = buffer[end:]
+                continue
+        if eof:
+            if in_array:
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+READERS = {"csv": read_csv, "json": read_json}
+
+
+def clean(row):
+    """{field: value} for the catalog fields a feed row has; raises RowError"""
+    if not isinstance(row, dict):
+        raise RowError(f"Not an object: {row!r:.60}")
+    values = {}
+    for field in FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        value = "" if value is None else str(value).strip()
+        if field in ("brand", "name"):
+            value = _text(value)
+        elif field == "category" and value:
+            if value.casefold() not in _CATEGORIES:
+                raise RowError(f"Unknown category {value!r}")
+            value = _CATEGORIES[value.casefold()]
+        elif field == "price":
+            value = _price(value)
+        values[field] = value
+    for field in ("brand", "name"):
+        if not values.get(field):
+            raise RowError(f"Missing {field}")
+    return values
+
+
+def _price(value):
+    if value == "":
+        return None
+    try:
+        price = Decimal(value.replace(",", "")).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise RowError(f"Bad price {value!r}")
+    if price < 0 or price >= _PRICE_LIMIT:
+        raise RowError(f"Price out of range: {value}")
+    return price
+
+
+class Result:
+    def __init__(self):
+        self.read = self.created = self.updated = self.unchanged = self.invalid = 0
+        self.errors = []  # (row number, message), the first MAX_ERRORS_KEPT
+        self.seconds = 0.0
+
+    def error(self, number, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS_KEPT:
+            self.errors.append((number, str(message)))
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+class CatalogImporter:
+    """
+    Apply a feed's rows (dicts of FIELDS) to Product. With dry_run nothing
+    is written; `diff` (a callable taking one line) hears every change.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, diff=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.diff = diff
+        self.result = Result()
+        self._assets = {}  # Asset name -> ImageAsset row
+
+    def run(self, rows):
+        started = time.perf_counter()
+        if self.dry_run:
+            self._import(rows)
+        else:
+            with transaction.atomic():
+                self._import(rows)
+            if self.result.created:
+                stats.adjust("products", self.result.created)
+            if self.result.created or self.result.updated:
+                caching.invalidate_all()
+        self.result.seconds = time.perf_counter() - started
+        return self.result
+
+    def _import(self, rows):
+        existing = {
+            natural_key(values[1], values[2]): values
+            for values in Product.objects.values_list(*COLUMNS).iterator(chunk_size=self.batch_size)
+        }
+        seen = {}
+        creates, updates = [], []
+        for number, row in enumerate(rows, start=1):
+            self.result.read += 1
+            try:
+                values = clean(row)
+            except RowError as e:
+                self.result.error(number, e)
+                continue
+            key = natural_key(values["brand"], values["name"])
+            if key in seen:
+                self.result.error(number, f"Duplicate of row {seen[key]}")
+                continue
+            seen[key] = number
+
+            current = existing.get(key)
+            if current is None:
+                if not values.get("category"):
+                    self.result.error(number, "New product without a category")
+                    continue
+                creates.append(values)
+                self._show("+", values, values)
+            else:
+                current = dict(zip(COLUMNS, current))
+                changes = {field: value for field, value in values.items() if current[field] != value}
+                if not changes:
+                    self.result.unchanged += 1
+                    continue
+                updates.append((current, changes))
+                self._show("~", current, {f: f"{current[f]!s} -> {v!s}" for f, v in changes.items()})
+
+            if len(creates) >= self.batch_size:
+                self._create(creates)
+                creates = []
+            if len(updates) >= self.batch_size:
+                self._update(updates)
+                updates = []
+        self._create(creates)
+        self._update(updates)
+
+    def _show(self, sign, product, changes):
+        if self.diff:
+            details = "; ".join(f"{field} {value!s}" for field, value in changes.items()
+                                if field not in ("brand", "name") or sign == "~")
+            self.diff(f"{sign} {product['brand']} — {product['name']}: {details}")
+
+    def _with_image(self, product):
+        asset = assets.lookup(product.image_url)
+        product.has_image = asset is not None
+        if asset is not None and asset.name not in self._assets:
+            self._assets[asset.name] = None if self.dry_run else assets.stored(asset)
+        product.image_asset = self._assets[asset.name] if asset else None
+        return product
+
+    def _create(self, creates):
+        self.result.created += len(creates)
+        if self.dry_run or not creates:
+            return
+        products = Product.objects.bulk_create(
+            [self._with_image(Product(**values)) for values in creates], batch_size=self.batch_size,
+        )
+        search.index_products(products)
+
+    def _update(self, updates):
+        self.result.updated += len(updates)
+        if self.dry_run or not updates:
+            return
+        fields, products, reindex = set(), [], []
+        for current, changes in updates:
+            product = Product(**{**current, **changes})
+            fields.update(changes)
+            if "image_url" in changes:
+                self._with_image(product)
+                fields.update(("has_image", "image_asset"))
+            products.append(product)
+            if INDEXED & changes.keys():
+                reindex.append(product)
+        # the objects carry the prefetched columns only: write just the changed ones (the image
+        # columns are among those, so a batch mixing image and other changes keeps them all)
+        Product.objects.bulk_update(products, sorted(fields), batch_size=self.batch_size)
+        search.index_products(reindex)
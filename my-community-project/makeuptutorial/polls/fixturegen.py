@@ -0,0 +1,328 @@
+"""
+Parallel generator and loader for large load-test fixtures.
+
+`generate` splits the users into fixed-size shards and builds each shard
+in a multiprocessing pool. A shard's users, their reviews and the votes on
+those reviews come from a Random seeded with (seed, shard number), so the
+output is the same whatever the worker count. Every id is derived from the
+user's position: no coordination between workers is needed. Each shard
+streams CSV files (Postgres COPY csv format, with header) into the output
+directory next to a manifest.json.
+
+`load` ingests a fixture directory with COPY on Postgres or executemany on
+SQLite, then rebuilds the denormalized data like the bulk seeder does.
+
+    manage.py generate_fixtures out/ --users 100000 --products 2000 --reviews 10000000 --workers 8
+    manage.py load_fixtures out/
+"""
+import csv
+import json
+import multiprocessing
+import os
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from . import ratings
+from .models import Product, Review, ReviewHelpfulness, static_image_exists
+from .seeding import DEMO_PASSWORD, PRODUCT_LINES, PRODUCTS, BulkSeeder, fake_review
+
+MANIFEST = "manifest.json"
+SHARD_SIZE = 2000  # users per shard; fixed so output doesn't depend on --workers
+
+USER_COLUMNS = ["id", "password", "last_login", "is_superuser", "username", "first_name", "last_name",
+                "email", "is_staff", "is_active", "date_joined"]
+PRODUCT_COLUMNS = ["id", "brand", "name", "category", "price", "image_url", "has_image", "image_variants",
+                   "description", "created_at"] + ratings.SUMMARY_FIELDS  # summaries: zero until the refresh
+REVIEW_COLUMNS = ["id", "user_id", "product_id", "title", "body", "rating", "is_verified_purchase", "receipt",
+                  "helpful_votes", "not_helpful_votes", "skin_type", "skin_tone", "age_range",
+                  "created_at", "updated_at"]
+VOTE_COLUMNS = ["review_id", "user_id", "is_helpful", "created_at"]
+
+# load order respects the foreign keys
+TABLES = [
+    ("products", Product, PRODUCT_COLUMNS),
+    ("users", get_user_model(), USER_COLUMNS),
+    ("reviews", Review, REVIEW_COLUMNS),
+    ("votes", ReviewHelpfulness, VOTE_COLUMNS),
+]
+
+
+def _csv_value(value):
+    # COPY ... (FORMAT csv): an unquoted empty field is NULL
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class _Writer:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.file)
+        self.csv.writerow(columns)
+        self.rows = 0
+
+    def write(self, row):
+        self.csv.writerow([_csv_value(v) for v in row])
+        self.rows += 1
+
+    def close(self):
+        self.file.close()
+
+
+def review_quota(plan, user_index):
+    """(first review id, review count) for the user at `user_index`, from the plan alone"""
+    base, extra = divmod(plan["reviews"], plan["users"])
+    count = min(base + (user_index < extra), plan["products"])
+    first = plan["id_offset"] + user_index * base + min(user_index, extra) + 1
+    return first, count
+
+
+def generate_products(plan, out_dir):
+    rng = random.Random(f"{plan['seed']}:products")
+    categories = [c for c, _ in Product.CATEGORY_CHOICES]
+    has_image = {p["image_url"]: static_image_exists(p["image_url"]) for p in PRODUCTS}
+    now = datetime.fromisoformat(plan["now"])
+    writer = _Writer(os.path.join(out_dir, "products.csv"), PRODUCT_COLUMNS)
+    for i in range(1, plan["products"] + 1):
+        template = rng.choice(PRODUCTS)
+        writer.write([
+            plan["id_offset"] + i, template["brand"], f"{rng.choice(PRODUCT_LINES)} {template['name']} {i}",
+            rng.choice(categories), rng.randint(6, 80), template["image_url"], has_image[template["image_url"]],
+            "{}", f"Synthetic load-test product based on {template['brand']} {template['name']}.",
+            now - timedelta(days=rng.randrange(400)),
+            *[0] * len(ratings.SUMMARY_FIELDS),
+        ])
+    writer.close()
+    return {"products.csv": writer.rows}
+
+
+def generate_shard(plan, out_dir, shard):
+    """Write users/reviews/votes CSVs for one shard of users; returns {file: rows}"""
+    rng = random.Random(f"{plan['seed']}:{shard}")
+    now = datetime.fromisoformat(plan["now"])
+    offset, n_users, n_products = plan["id_offset"], plan["users"], plan["products"]
+    first_user, last_user = shard * SHARD_SIZE, min((shard + 1) * SHARD_SIZE, n_users)
+    # a long tail: the same product popularity in every shard
+    popularity = [1 / (rank + 1) ** 0.8 for rank in range(n_products)]
+    random.Random(f"{plan['seed']}:popularity").shuffle(popularity)
+
+    suffix = f"{shard:05d}.csv"
+    users = _Writer(os.path.join(out_dir, f"users-{suffix}"), USER_COLUMNS)
+    reviews = _Writer(os.path.join(out_dir, f"reviews-{suffix}"), REVIEW_COLUMNS)
+    votes = _Writer(os.path.join(out_dir, f"votes-{suffix}"), VOTE_COLUMNS)
+    vote_rate = plan["votes"] / max(plan["reviews"], 1)
+
+    for index in range(first_user, last_user):
+        user_id = offset + index + 1
+        joined = now - timedelta(seconds=rng.randrange(plan["days"] * 86400))
+        users.write([user_id, plan["password"], None, False, f"load{offset + index}", "", "",
+                     f"load{offset + index}@example.com", False, True, joined])
+
+        review_id, quota = review_quota(plan, index)
+        if quota * 2 > n_products:
+            picked = rng.sample(range(n_products), quota)
+        else:
+            picked = {}
+            while len(picked) < quota:
+                for p in rng.choices(range(n_products), weights=popularity, k=quota - len(picked)):
+                    picked[p] = None
+        for product_index in picked:
+            fields = fake_review(rng, now, plan["days"])
+            helpful = not_helpful = 0
+            # votes on this review, from distinct other users
+            voters = {rng.randrange(n_users) for _ in range(int(vote_rate) + (rng.random() < vote_rate % 1))}
+            voters.discard(index)
+            for voter in voters:
+                is_helpful = rng.random() < 0.75
+                helpful += is_helpful
+                not_helpful += not is_helpful
+                votes.write([review_id, offset + voter + 1, is_helpful, min(fields["created_at"] + timedelta(hours=1), now)])
+            reviews.write([
+                review_id, user_id, offset + product_index + 1, fields["title"], fields["body"], fields["rating"],
+                fields["is_verified_purchase"], None, helpful, not_helpful, fields["skin_type"],
+                fields["skin_tone"], fields["age_range"], fields["created_at"], fields["updated_at"],
+            ])
+            review_id += 1
+
+    for writer in (users, reviews, votes):
+        writer.close()
+    return {os.path.basename(w.file.name): w.rows for w in (users, reviews, votes)}
+
+
+def _run_shard(args):
+    return generate_shard(*args)
+
+
+def generate(out_dir, users, products, reviews, votes=0, seed=42, workers=None, days=365, id_offset=0, now=None):
+    """Write a fixture to `out_dir`; returns the manifest. Dates are spread back from `now`."""
+    os.makedirs(out_dir, exist_ok=True)
+    plan = {
+        "users": users, "products": products, "reviews": min(reviews, users * products), "votes": votes,
+        "seed": seed, "days": days, "id_offset": id_offset, "now": (now or timezone.now()).isoformat(),
+        # one hash shared by every load user (fixed salt: same seed, same files)
+        "password": make_password(DEMO_PASSWORD, salt=f"fixtures{seed}"),
+    }
+    files = generate_products(plan, out_dir)
+    shards = [(plan, out_dir, shard) for shard in range(-(-users // SHARD_SIZE))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        results = [_run_shard(shard) for shard in shards]
+    else:
+        # forked workers inherit the configured Django; spawned ones would have to set it up again
+        connections.close_all()  # don't share an open database socket with the children
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            results = pool.map(_run_shard, shards)
+    for result in results:
+        files.update(result)
+
+    manifest = {key: value for key, value in plan.items() if key != "password"}
+    manifest["files"] = files
+    with open(os.path.join(out_dir, MANIFEST), "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+# Loading
+
+def _files_for(out_dir, manifest, table):
+    return sorted(name for name in manifest["files"] if name.split("-")[0].removesuffix(".csv") == table)
+
+
+def _sqlite_converter(field, db):
+    """CSV text -> the value Django would store for `field` on SQLite connection `db`"""
+    internal = (field.target_field if field.is_relation else field).get_internal_type()
+    if internal in ("CharField", "TextField", "JSONField", "FileField"):
+        convert = str  # already in stored form
+    elif internal == "BooleanField":
+        convert = "t".__eq__
+    elif "Integer" in internal or "AutoField" in internal:
+        convert = int
+    elif internal == "DateTimeField":
+        # Django's SQLite text format (naive UTC), so range filters compare correctly
+        convert = lambda v: db.ops.adapt_datetimefield_value(datetime.fromisoformat(v))  # noqa: E731
+    else:
+        convert = lambda v: field.get_db_prep_save(field.to_python(v), db)  # noqa: E731
+    if field.null:
+        return lambda v: None if v == "" else convert(v)
+    return convert
+
+
+def _sqlite_converters(model, columns):
+    # the real wrapper, not the `connection` proxy: it's hit for every value
+    db = connections[DEFAULT_DB_ALIAS]
+    fields = {f.column: f for f in model._meta.concrete_fields}
+    return [_sqlite_converter(fields[column], db) for column in columns]
+
+
+def _load_sqlite(cursor, model, columns, path, batch_size):
+    sql = (f"INSERT INTO {model._meta.db_table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    converters = _sqlite_converters(model, columns)
+    rows = 0
+    with open(path, newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        next(reader)  # header
+        batch = []
+        for row in reader:
+            batch.append([convert(v) for convert, v in zip(converters, row)])
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                rows += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            rows += len(batch)
+    return rows
+
+
+def _load_postgres(cursor, model, columns, path):
+    sql = f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)"
+    raw = cursor.cursor
+    with open(path, "rb") as fh:
+        if hasattr(raw, "copy"):  # psycopg 3
+            with raw.copy(sql) as copy:
+                while chunk := fh.read(1 << 20):
+                    copy.write(chunk)
+        else:  # psycopg2
+            raw.copy_expert(sql, fh)
+    return raw.rowcount
+
+
+def _check_free_ids(manifest):
+    """Fail before loading when the fixture's ids or load{n} usernames are taken"""
+    offset = manifest["id_offset"]
+    for model in (Product, get_user_model(), Review):
+        if model.objects.filter(pk__gt=offset).exists():
+            raise ValueError(
+                f"{model._meta.db_table} already has ids above {offset}; "
+                f"regenerate with --id-offset past them or load into an empty database"
+            )
+    # BulkSeeder names its users load0, load1, ... too, whatever their ids
+    names = get_user_model().objects.filter(username__startswith="load").values_list("username", flat=True)
+    taken = sorted(
+        int(name[4:]) for name in names.iterator()
+        if name[4:].isdigit() and offset <= int(name[4:]) < offset + manifest["users"]
+    )
+    if taken:
+        raise ValueError(
+            f"{len(taken)} of the fixture's usernames exist already (load{taken[0]}...load{taken[-1]}); "
+            f"regenerate with --id-offset {taken[-1] + 1} or more, or load into an empty database"
+        )
+
+
+@contextmanager
+def deferred_indexes(model, enabled=True):
+    """
+    Drop the model's Meta.indexes for the duration of a bulk load and build
+    them once at the end: one sorted build beats millions of random inserts.
+    """
+    indexes = list(model._meta.indexes) if enabled else []
+    # only for its SQL: SQLite refuses to *enter* a schema editor inside a transaction
+    editor = connection.schema_editor(collect_sql=True)
+    with connection.cursor() as cursor:
+        for index in indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+    yield
+    with connection.cursor() as cursor:
+        for index in indexes:
+            cursor.execute(str(index.create_sql(model, editor)))
+
+
+def load(out_dir, batch_size=10000, refresh=True, with_search=True, defer_indexes=True, out=print):
+    """Ingest a generated fixture into the default database; returns {table: rows}"""
+    with open(os.path.join(out_dir, MANIFEST)) as fh:
+        manifest = json.load(fh)
+    _check_free_ids(manifest)
+    seeder = BulkSeeder(out=out)
+    loaded = {}
+    for table, model, columns in TABLES:
+        with seeder.phase(f"load {table}") as counter, transaction.atomic():
+            with deferred_indexes(model, defer_indexes), connection.cursor() as cursor:
+                for name in _files_for(out_dir, manifest, table):
+                    path = os.path.join(out_dir, name)
+                    if connection.vendor == "postgresql":
+                        counter["rows"] += _load_postgres(cursor, model, columns, path)
+                    else:
+                        counter["rows"] += _load_sqlite(cursor, model, columns, path, batch_size)
+        loaded[table] = counter["rows"]
+
+    # explicit ids leave Postgres sequences behind
+    reset = connection.ops.sequence_reset_sql(no_style(), [model for _, model, _ in TABLES])
+    if reset:
+        with connection.cursor() as cursor:
+            for sql in reset:
+                cursor.execute(sql)
+    if refresh:
+        seeder.refresh_derived(with_search=with_search)
+    return loaded
@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 from django.forms import inlineformset_factory
+from django.template.defaultfilters import filesizeformat
 from .models import Review, ReviewMedia, ReviewHelpfulness
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
@@ -47,8 +49,45 @@ class ReviewForm(forms.ModelForm):
         r = self.cleaned_data.get("rating") or 0
         return max(1, min(5, int(r)))
 
+    def clean_receipt(self):
+        receipt = self.cleaned_data.get("receipt")
+        check_upload_size(receipt, getattr(settings, "RECEIPT_MAX_BYTES", 10 * 1024 * 1024))
+        return receipt
+
+
+def check_upload_size(upload, limit):
+    # only fresh uploads have a size worth checking (not an already-stored file)
+    if upload and hasattr(upload, "content_type") and upload.size > limit:
+        raise forms.ValidationError(
+            f"File is too large ({filesizeformat(upload.size)}); the limit is {filesizeformat(limit)}."
+        )
+
+
+class ReviewMediaForm(forms.ModelForm):
+    """One photo/video upload; processing happens later in a background job"""
+    LIMITS = {
+        ReviewMedia.PHOTO: ("REVIEW_PHOTO_MAX_BYTES", 15 * 1024 * 1024),
+        ReviewMedia.VIDEO: ("REVIEW_VIDEO_MAX_BYTES", 200 * 1024 * 1024),
+    }
+
+    def clean(self):
+        cleaned = super().clean()
+        upload, kind = cleaned.get("file"), cleaned.get("kind")
+        if not upload or not hasattr(upload, "content_type") or kind not in self.LIMITS:
+            return cleaned
+        if not (upload.content_type or "").startswith("image/" if kind == ReviewMedia.PHOTO else "video/"):
+            self.add_error("file", f"That doesn't look like a {kind}.")
+        setting, default = self.LIMITS[kind]
+        try:
+            check_upload_size(upload, getattr(settings, setting, default))
+        except forms.ValidationError as e:
+            self.add_error("file", e)
+        return cleaned
+
+
 ReviewMediaFormSet = inlineformset_factory(
     Review, ReviewMedia,
+    form=ReviewMediaForm,
     fields=["file", "kind"],
     extra=2, can_delete=True,
     widgets={
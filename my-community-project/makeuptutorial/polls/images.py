@@ -0,0 +1,153 @@
+"""
+Resized, modern-format copies of product images.
+
+Each product's original (the shipped file behind `image_url`, see
+polls/assets.py) is resized to the widths of each preset below, at 1x and
+2x, and encoded as AVIF and WebP. Files go to MEDIA_ROOT/product_variants/ with a hash of
+their content in the name, so they can be cached forever. Product.image_variants
+records them:
+
+    {"url": <image_url they were made from>, "source": <hash of the original>,
+     "width": ..., "height": ...,
+     "card": {"avif": [[320, "product_variants/..."], [640, ...]], "webp": [...]},
+     "detail": {...}}
+
+`manage.py generate_image_variants` builds them ahead of time; with
+IMAGE_VARIANTS_LAZY on, pages link to `product-image` instead and the
+first request for a product builds its set (see ProductImageVariant).
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import assets, caching
+from .models import Product
+
+VARIANT_DIR = "product_variants"
+
+# preset -> (CSS width in px, the `sizes` attribute the templates use)
+PRESETS = {
+    "card": (320, "(max-width: 640px) 100vw, 320px"),
+    "detail": (720, "(max-width: 900px) 100vw, 720px"),
+}
+DENSITIES = (1, 2)
+
+# format -> (MIME type, Pillow save options), best first
+FORMATS = {
+    "avif": ("image/avif", {"quality": 60, "speed": 6}),
+    "webp": ("image/webp", {"quality": 80, "method": 4}),
+}
+
+
+def enabled_formats():
+    """Configured formats this Pillow build can actually encode"""
+    wanted = getattr(settings, "IMAGE_VARIANT_FORMATS", tuple(FORMATS))
+    return [f for f in wanted if f in FORMATS and features.check(f)]
+
+
+def lazy_enabled():
+    return getattr(settings, "IMAGE_VARIANTS_LAZY", settings.DEBUG)
+
+
+def current_variants(product):
+    """The recorded variants if they were made from the product's current image_url"""
+    variants = product.image_variants or {}
+    if variants.get("url") and variants["url"] == product.image_url:
+        return variants
+    return None
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **FORMATS[fmt][1])
+    return buffer.getvalue()
+
+
+def _store(name, data):
+    # content-hashed names: an existing file already holds these exact bytes
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _open_source(path):
+    image = Image.open(path)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+    return image
+
+
+def build_variants(product, force=False):
+    """
+    Generate (or reuse) the variant files for one product and return the
+    image_variants dict, or {} when it has no readable local original.
+    """
+    asset = assets.lookup(product.image_url)
+    if asset is None:
+        return {}
+    path, source = asset.path, asset.sha256[:12]
+
+    existing = current_variants(product)
+    if existing and existing.get("source") == source and not force:
+        return existing
+
+    try:
+        original = _open_source(path)
+    except (OSError, Image.DecompressionBombError):
+        return {}
+
+    stem = f"{VARIANT_DIR}/{product.pk}"
+    variants = {"url": product.image_url, "source": source,
+                "width": original.width, "height": original.height}
+    formats = enabled_formats()
+    for preset, (css_width, _) in PRESETS.items():
+        # never upscale: past the original's width a bigger file adds nothing
+        widths = sorted({min(css_width * d, original.width) for d in DENSITIES})
+        variants[preset] = {fmt: [] for fmt in formats}
+        for width in widths:
+            resized = original.resize(
+                (width, max(1, round(original.height * width / original.width))),
+                Image.Resampling.LANCZOS,
+            ) if width < original.width else original
+            for fmt in formats:
+                data = _encode(resized, fmt)
+                name = _store(f"{stem}-{preset}-{width}.{_digest(data)}.{fmt}", data)
+                variants[preset][fmt].append([width, name])
+    return variants
+
+
+def refresh_product(product, force=False):
+    """Build a product's variants and record them; returns the dict stored"""
+    variants = build_variants(product, force=force)
+    if variants != product.image_variants:
+        # a plain UPDATE: this is not an edit, so skip save() and its signals
+        Product.objects.filter(pk=product.pk).update(image_variants=variants)
+        product.image_variants = variants
+        caching.product_changed(product.pk)
+    return variants
+
+
+def variant_url(variants, preset, fmt, width):
+    """
+    Media URL of the recorded variant closest to `width` (the smallest one
+    at least that wide), or None if that preset/format was not generated.
+    """
+    recorded = sorted(variants.get(preset, {}).get(fmt, []))
+    if not recorded:
+        return None
+    name = next((n for w, n in recorded if w >= width), recorded[-1][1])
+    return default_storage.url(name)
+
+
+def planned_widths(preset):
+    css_width = PRESETS[preset][0]
+    return sorted({css_width * d for d in DENSITIES})
@@ -0,0 +1,108 @@
+"""
+Database-backed background jobs.
+
+Tasks are plain functions registered with @task("name"); `enqueue` writes a
+Job row (inside the caller's transaction, so a rolled-back request leaves no
+job behind) and `manage.py run_jobs` executes them. Workers claim a job with
+a conditional UPDATE ... WHERE status = 'queued', so any number of them can
+share the table. Failures are retried with exponential backoff up to
+Job.max_attempts; jobs whose worker died are re-queued after JOB_LOCK_TIMEOUT.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register a function as the handler for jobs called `name`"""
+    def register(func):
+        _registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=None, max_attempts=3, **payload):
+    """Queue a call to task `name` with JSON-serializable keyword arguments"""
+    if name not in _registry:
+        raise KeyError(f"Unknown job {name!r}")
+    run_after = timezone.now() + (delay or timedelta(0))
+    return Job.objects.create(name=name, payload=payload, run_after=run_after, max_attempts=max_attempts)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def lock_timeout():
+    return timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 15 * 60))
+
+
+def requeue_stale(now=None):
+    """Give jobs locked by a worker that died mid-run back to the queue"""
+    now = now or timezone.now()
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - lock_timeout()).update(
+        status=Job.QUEUED, locked_by="", locked_at=None,
+    )
+
+
+def claim(worker, now=None):
+    """Take the next runnable job for `worker`, or None if the queue is empty"""
+    now = now or timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by("run_after", "id")
+    for job_id in ready.values_list("id", flat=True)[:5]:
+        # only one worker's UPDATE can see the row still queued
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def run(job):
+    """Execute one claimed job and record the outcome"""
+    try:
+        _registry[job.name](**job.payload)
+    except Exception:
+        logger.exception("Job %s #%s failed (attempt %s/%s)", job.name, job.pk, job.attempts, job.max_attempts)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.locked_by, job.locked_at = "", None
+    job.save(update_fields=["status", "run_after", "finished_at", "last_error", "locked_by", "locked_at"])
+    return job.status
+
+
+def work(worker=None, max_jobs=None):
+    """Run jobs until the queue is empty (or `max_jobs` ran); returns how many ran"""
+    worker = worker or worker_id()
+    requeue_stale()
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        close_old_connections()
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        ran += 1
+    return ran
@@ -0,0 +1,110 @@
+"""
+Throughput at concurrency against a running server, to compare
+deployments (see `manage.py loadtest`):
+
+    gunicorn mysite.wsgi --workers 4
+    uvicorn mysite.asgi:application --workers 4 --no-access-log
+
+`run` keeps `concurrency` keep-alive HTTP/1.1 connections busy until
+`total` requests have been answered, cycling through the paths. It is a
+plain asyncio client (no dependencies) and measures what the server can
+answer, not the browser: no cookies, no assets.
+"""
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from .benchmark import _percentile
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []  # ms
+        self.statuses = {}
+        self.errors = 0
+        self.bytes = 0
+
+    def report(self, elapsed, concurrency):
+        done = len(self.latencies)
+        return {
+            "concurrency": concurrency,
+            "requests": done,
+            "errors": self.errors,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "seconds": round(elapsed, 3),
+            "rps": round(done / elapsed, 1) if elapsed else None,
+            "mb_per_s": round(self.bytes / elapsed / 1e6, 2) if elapsed else None,
+            "p50_ms": round(statistics.median(self.latencies), 2) if done else None,
+            "p95_ms": round(_percentile(self.latencies, 95), 2) if done else None,
+            "p99_ms": round(_percentile(self.latencies, 99), 2) if done else None,
+        }
+
+
+async def _read_response(reader):
+    """Status and body size of one response (Content-Length or chunked)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    size = 0
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while (chunk := int((await reader.readline()).split(b";")[0], 16)):
+            size += len(await reader.readexactly(chunk + 2)) - 2
+        await reader.readline()
+    elif "content-length" in headers:
+        size = len(await reader.readexactly(int(headers["content-length"])))
+    else:
+        size = len(await reader.read())
+    return status, size, headers.get("connection", "").lower() == "close"
+
+
+async def _worker(url, host_header, paths, counter, stats):
+    reader = writer = None
+    while counter:
+        i = counter.pop()
+        path = paths[i % len(paths)]
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host_header}\r\n"
+                   f"User-Agent: polls-loadtest\r\nAccept: text/html\r\n\r\n").encode()
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            writer.write(request)
+            await writer.drain()
+            status, size, close = await _read_response(reader)
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        stats.latencies.append((time.perf_counter() - started) * 1000)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.bytes += size
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run(base_url, paths, concurrency, total):
+    url = urlsplit(base_url)
+    if url.scheme != "http":
+        raise ValueError(f"Only http:// URLs are supported, not {base_url!r}")
+    host_header = url.netloc
+    counter = list(range(total - 1, -1, -1))
+    stats = Stats()
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(url, host_header, paths, counter, stats) for _ in range(concurrency)))
+    return stats.report(time.perf_counter() - started, concurrency)
+
+
+def run(base_url, paths, concurrency=50, total=2000):
+    """Load `base_url` with `total` GETs over `concurrency` connections; returns the report"""
+    return asyncio.run(_run(base_url.rstrip("/"), paths, concurrency, total))
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import benchmark
+from polls.seeding import BulkSeeder
+
+
+def _ratio(value):
+    return f"{value:5.2f}x" if value is not None else "    -"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every polls URL (latency percentiles, query counts, peak memory) and write a JSON report. "
+        "Use a scratch database: --size seeds it and the scenarios write (votes, sessions)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", choices=list(benchmark.DATASETS),
+                            help="Grow the database to this dataset with the bulk seeder first")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per scenario (and mode)")
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", action="append", metavar="URL_NAME", help="Only this scenario (repeatable)")
+        parser.add_argument("--json", dest="json_path", help="Write the report here")
+        parser.add_argument("--compare", help="An earlier report to compare against")
+        parser.add_argument("--fail-over-budget", action="store_true",
+                            help="Exit with an error when a scenario runs more queries than its budget")
+
+    def handle(self, *args, size, seed, iterations, warmup, only, json_path, compare, fail_over_budget, **options):
+        if size:
+            self.stdout.write(f"Seeding the {size} dataset...")
+            BulkSeeder(seed=seed, out=self.stdout.write).run(**benchmark.DATASETS[size])
+        try:
+            report = benchmark.run(names=only, iterations=iterations, warmup=warmup, out=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+        report["size"] = size
+
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {json_path}")
+        if compare:
+            with open(compare) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"Against {compare} (commit {baseline.get('commit')}):")
+            for name, p50, p95, queries in benchmark.compare(report, baseline):
+                self.stdout.write(f"  {name:<22} p50 {_ratio(p50)}  p95 {_ratio(p95)}  queries {queries:+d}")
+
+        over = benchmark.over_budget(report)
+        for result in over:
+            self.stdout.write(self.style.WARNING(
+                f"{result['name']}: {result['queries']} queries, budget {result['budget']}"
+            ))
+        if over and fail_over_budget:
+            raise CommandError(f"{len(over)} scenario(s) over their query budget")
+        self.stdout.write(self.style.SUCCESS(f"Benchmarked {len(report['results'])} scenarios."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute the ranked trending lists (run periodically, e.g. every few minutes from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild-buckets", action="store_true",
+                            help="Regenerate the daily review buckets from the reviews table first")
+        parser.add_argument("--window", type=int, action="append", dest="windows", choices=trending.WINDOWS,
+                            help="Only recompute these windows (repeatable)")
+
+    def handle(self, *args, rebuild_buckets, windows, **options):
+        started = time.perf_counter()
+        if rebuild_buckets:
+            buckets = trending.rebuild_buckets()
+            self.stdout.write(f"Rebuilt {buckets} daily buckets.")
+        written = trending.compute_scores(windows or trending.WINDOWS)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} trending rows in {time.perf_counter() - started:.2f}s."
+        ))
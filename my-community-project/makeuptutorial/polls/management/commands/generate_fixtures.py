@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import fixturegen
+
+
+class Command(BaseCommand):
+    help = "Generate a load-test fixture (CSV shards + manifest) in parallel; load it with load_fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument("out_dir")
+        parser.add_argument("--users", type=int, required=True)
+        parser.add_argument("--products", type=int, required=True)
+        parser.add_argument("--reviews", type=int, required=True, help="Total reviews (spread evenly over users)")
+        parser.add_argument("--votes", type=int, default=0, help="Approximate total helpfulness votes")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workers", type=int, help="Processes to use (default: one per CPU)")
+        parser.add_argument("--days", type=int, default=365, help="Spread review dates over this many days")
+        parser.add_argument("--id-offset", type=int, default=0, help="Start generated ids after this value")
+
+    def handle(self, *args, out_dir, **options):
+        started = time.perf_counter()
+        manifest = fixturegen.generate(
+            out_dir, options["users"], options["products"], options["reviews"], votes=options["votes"],
+            seed=options["seed"], workers=options["workers"], days=options["days"], id_offset=options["id_offset"],
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(manifest["files"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows:,} rows in {len(manifest['files'])} files to {out_dir} "
+            f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):,.0f} rows/s)."
+        ))
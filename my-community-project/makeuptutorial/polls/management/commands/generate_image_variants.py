@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from polls import images
+from polls.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate resized AVIF/WebP variants of product images and record them on Product.image_variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--product", type=int, action="append", dest="product_ids",
+                            help="Only this product id (repeatable)")
+        parser.add_argument("--force", action="store_true", help="Re-encode even if the original is unchanged")
+
+    def handle(self, *args, product_ids, force, **options):
+        products = Product.objects.only("id", "image_url", "image_variants").order_by("id")
+        if product_ids:
+            products = products.filter(pk__in=product_ids)
+
+        self.stdout.write(f"Formats: {', '.join(images.enabled_formats()) or 'none'}")
+        built = skipped = 0
+        for product in products.iterator():
+            before = product.image_variants
+            variants = images.refresh_product(product, force=force)
+            if not variants:
+                skipped += 1
+                self.stdout.write(self.style.WARNING(f"  no local image: #{product.pk} {product.image_url or '-'}"))
+            elif variants != before or force:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {built} products, {skipped} without an image."))
@@ -0,0 +1,62 @@
+import csv
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import catalog
+
+FORMATS = {".csv": "csv", ".json": "json", ".ndjson": "json", ".jsonl": "json"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Create and update products from a CSV or JSON (array or NDJSON) feed, matched on brand and name. "
+        f"Columns: {', '.join(catalog.FIELDS)}; only the ones present are compared. Re-running a feed is a no-op."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Feed file, or "-" for stdin')
+        parser.add_argument("--format", choices=sorted(catalog.READERS), help="Default: from the file extension")
+        parser.add_argument("--dry-run", action="store_true", help="Show the changes without writing them")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, path, format, dry_run, batch_size, encoding, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        format = format or FORMATS.get(Path(path).suffix.lower())
+        if format is None:
+            raise CommandError("Can't tell the feed format from the name; pass --format")
+
+        importer = catalog.CatalogImporter(
+            batch_size=batch_size, dry_run=dry_run, diff=self.stdout.write if dry_run else None,
+        )
+        try:
+            if path == "-":
+                stream = open(sys.stdin.fileno(), encoding=encoding, newline="", closefd=False)
+            else:
+                stream = open(path, encoding=encoding, newline="")
+        except OSError as e:
+            raise CommandError(f"Can't read {path}: {e}")
+        try:
+            with stream:
+                result = importer.run(catalog.READERS[format](stream))
+        except (ValueError, csv.Error) as e:
+            # a feed that doesn't parse (rows that don't clean are reported below)
+            raise CommandError(f"{path}: {e}")
+
+        for number, message in result.errors:
+            self.stderr.write(self.style.WARNING(f"Row {number}: {message}"))
+        if result.invalid > len(result.errors):
+            self.stderr.write(self.style.WARNING(f"... and {result.invalid - len(result.errors)} more"))
+
+        summary = (
+            f"{result.read} rows: {result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.invalid} skipped "
+            f"in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s)."
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run, nothing written. {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
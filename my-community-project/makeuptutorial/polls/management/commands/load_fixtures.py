@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from polls import fixturegen
+
+
+class Command(BaseCommand):
+    help = "Load a fixture written by generate_fixtures (COPY on Postgres, executemany on SQLite)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture_dir")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows per executemany (SQLite)")
+        parser.add_argument("--no-refresh", action="store_true",
+                            help="Skip rebuilding ratings/trending/search/stats afterwards")
+        parser.add_argument("--skip-search", action="store_true", help="Skip only the search index rebuild")
+
+    def handle(self, *args, fixture_dir, batch_size, no_refresh, skip_search, **options):
+        try:
+            loaded = fixturegen.load(fixture_dir, batch_size=batch_size, refresh=not no_refresh,
+                                     with_search=not skip_search, out=self.stdout.write)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            # the table being loaded is rolled back; tables loaded before it stay
+            raise CommandError(
+                f"The fixture clashes with rows already in the database ({e}). Regenerate it with "
+                f"--id-offset past the existing ids, or load it into an empty database."
+            )
+        summary = ", ".join(f"{rows:,} {table}" for table, rows in loaded.items())
+        self.stdout.write(self.style.SUCCESS(f"Loaded {summary}."))
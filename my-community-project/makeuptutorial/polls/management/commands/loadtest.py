@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import loadtest
+
+DEFAULT_PATHS = ["/", "/products/", "/products/?sort=rating&page=2", "/trends/?days=30"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests per second and latency percentiles of a running server at a given concurrency, "
+        "e.g. gunicorn (mysite.wsgi) against uvicorn (mysite.asgi). Add product pages with --path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Base URL of the running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help=f"Path to request, cycled through (repeatable; default: {' '.join(DEFAULT_PATHS)})")
+        parser.add_argument("--concurrency", "-c", type=int, action="append",
+                            help="Open connections (repeatable, one run each; default 50)")
+        parser.add_argument("--requests", "-n", type=int, default=2000, help="Requests per run")
+        parser.add_argument("--label", help="Name of the deployment in the report, e.g. uvicorn-4")
+        parser.add_argument("--json", dest="json_path", help="Write the report here")
+
+    def handle(self, *args, url, paths, concurrency, requests, label, json_path, **options):
+        paths = paths or DEFAULT_PATHS
+        runs = []
+        for level in concurrency or [50]:
+            try:
+                result = loadtest.run(url, paths, concurrency=level, total=requests)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(
+                f"  c={level:<4} {result['rps'] or 0:8.1f} req/s  p50 {result['p50_ms'] or 0:7.1f} ms  "
+                f"p95 {result['p95_ms'] or 0:7.1f} ms  p99 {result['p99_ms'] or 0:7.1f} ms  "
+                f"errors {result['errors']}  {result['statuses']}"
+            )
+            runs.append(result)
+
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump({"label": label, "url": url, "paths": paths, "runs": runs}, f, indent=2)
+            self.stdout.write(f"Wrote {json_path}")
+        self.stdout.write(self.style.SUCCESS(f"Load tested {url} at {len(runs)} concurrency level(s)."))
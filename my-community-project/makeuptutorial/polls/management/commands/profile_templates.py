@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import templating
+from polls.benchmark import _client
+
+
+class Command(BaseCommand):
+    help = (
+        "Render a page and show where the template time goes: per template, {% block %} and {% include %}, "
+        "with calls, total and self time. The page cache is cleared before each render."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="URL path, e.g. /products/12/")
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--user", help="Render as this username")
+        parser.add_argument("--limit", type=int, default=25, help="Rows to show")
+
+    def handle(self, *args, path, iterations, user, limit, **options):
+        client = _client()
+        if user:
+            try:
+                client.force_login(get_user_model().objects.get(username=user))
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user {user!r}")
+
+        with templating.profile() as report:
+            for _ in range(iterations):
+                cache.clear()
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} answered {response.status_code}")
+
+        self.stdout.write(f"{'kind':<9} {'name':<60} {'calls':>7} {'total ms':>9} {'self ms':>9}")
+        for entry in report.rows()[:limit]:
+            self.stdout.write(
+                f"{entry.kind:<9} {entry.name[:60]:<60} {entry.calls / iterations:7.1f} "
+                f"{entry.total * 1000 / iterations:9.2f} {entry.self_time * 1000 / iterations:9.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Profiled {iterations} renders of {path} (per render)."))
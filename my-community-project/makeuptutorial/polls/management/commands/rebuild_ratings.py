@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.ratings import rebuild_rating_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized product rating summaries from the reviews table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true",
+                            help="Only report drifted products; exit non-zero if any are found")
+        parser.add_argument("--product", type=int, action="append", dest="product_ids",
+                            help="Limit to these product ids (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, verify, product_ids, batch_size, **options):
+        drifted = rebuild_rating_summaries(product_ids, commit=not verify, batch_size=batch_size)
+        for product in drifted[:20]:
+            self.stdout.write(f"  drift: product #{product.pk}")
+        if verify:
+            if drifted:
+                raise CommandError(f"{len(drifted)} product rating summaries are out of date.")
+            self.stdout.write(self.style.SUCCESS("All product rating summaries match."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(drifted)} product rating summaries."))
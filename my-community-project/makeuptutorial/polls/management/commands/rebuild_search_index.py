@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product/review search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, batch_size, **options):
+        started = time.perf_counter()
+        backend = search.get_backend()
+        products, reviews = search.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {products} products and {reviews} reviews with {type(backend).__name__} "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
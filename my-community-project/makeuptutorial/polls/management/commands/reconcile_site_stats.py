@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from polls import stats
+
+
+class Command(BaseCommand):
+    help = "Recount the cached site KPI counters (run periodically to correct drift)"
+
+    def handle(self, *args, **options):
+        for name, value in stats.reconcile().items():
+            self.stdout.write(f"  {name}: {value}")
+        self.stdout.write(self.style.SUCCESS("Site statistics reconciled."))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (review media processing etc.)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty")
+        parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, burst, max_jobs, sleep, **options):
+        worker = jobs.worker_id()
+        self.stdout.write(f"Worker {worker} started.")
+        total = 0
+        try:
+            while max_jobs is None or total < max_jobs:
+                ran = jobs.work(worker, max_jobs=None if max_jobs is None else max_jobs - total)
+                total += ran
+                if burst and not ran:
+                    break
+                if not ran:
+                    time.sleep(sleep)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} jobs."))
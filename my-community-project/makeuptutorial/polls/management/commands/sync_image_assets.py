@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import assets, caching
+
+
+class Command(BaseCommand):
+    help = (
+        "Register the shipped product images under their canonical names, point every product at its "
+        "asset and refresh Product.has_image. With --check, fail when an image_url doesn't resolve (deploys)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Exit with an error when a product's image_url is not a shipped image")
+
+    def handle(self, *args, check, **options):
+        found = assets.registry()
+        updated, unresolved = assets.link_products()
+        if updated:
+            caching.invalidate_all()  # plain UPDATEs: no signals bumped the page caches
+
+        for url, count in sorted(unresolved.items()):
+            self.stdout.write(self.style.WARNING(f"  unresolved: {url or '(empty)'} ({count} products)"))
+        if unresolved and check:
+            raise CommandError(f"{len(unresolved)} image_url(s) don't match a shipped image")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(found.by_name)} assets; updated {updated} products, {len(unresolved)} unresolved image_urls."
+        ))
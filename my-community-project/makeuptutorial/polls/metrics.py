@@ -0,0 +1,321 @@
+"""
+Per-request performance metrics.
+
+MetricsMiddleware (first in MIDDLEWARE) measures every request: wall time,
+number and total time of SQL queries (through an execute wrapper on
+every database connection), the slowest statements, template render time
+(the DjangoTemplates backend below times each top-level render) and the
+response size. Samples are tagged with the resolved URL name ("trends",
+"api-products", ...; "static" for WhiteNoise's files, "unmatched" for 404s).
+
+They feed histograms exported in Prometheus text format by MetricsView
+(staff, or a scraper sending METRICS_TOKEN as a bearer token):
+
+- polls_request_*: cumulative histograms, the usual Prometheus kind
+  (use rate() for windows)
+- polls_request_*_window{quantile=...}: p50/p95/p99 over the last
+  METRICS_WINDOW_SECONDS, for a quick look without a Prometheus server
+
+Requests slower than SLOW_REQUEST_MS are logged with their slowest SQL.
+
+The registry lives in each process: with several workers every scrape
+sees the worker that served it, so scrape each one (or run one worker
+per port) when the numbers must add up.
+"""
+import heapq
+import hmac
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.backends import django as django_backend
+from django.views import generic
+
+logger = logging.getLogger(__name__)
+
+_sample = ContextVar("request_sample", default=None)
+
+# bucket upper bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (1_000, 5_000, 20_000, 50_000, 100_000, 250_000, 1_000_000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# name -> (help, buckets, sample attribute)
+HISTOGRAMS = {
+    "polls_request_duration_seconds": ("Wall time of the request", SECONDS_BUCKETS, "wall"),
+    "polls_request_sql_queries": ("SQL statements run by the request", QUERY_BUCKETS, "queries"),
+    "polls_request_sql_duration_seconds": ("Time spent in SQL", SECONDS_BUCKETS, "sql"),
+    "polls_request_template_duration_seconds": ("Time spent rendering templates", SECONDS_BUCKETS, "template"),
+    "polls_response_size_bytes": ("Response body size (not streamed responses)", BYTES_BUCKETS, "size"),
+}
+
+
+def slow_request_ms():
+    return getattr(settings, "SLOW_REQUEST_MS", 500)
+
+
+def window_seconds():
+    return getattr(settings, "METRICS_WINDOW_SECONDS", 300)
+
+
+class Sample:
+    """What one request measured (times in seconds)"""
+    slowest_kept = 3
+
+    def __init__(self):
+        self.wall = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.size = None
+        self.slowest = []  # heap of (seconds, sql)
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.sql += elapsed
+        entry = (elapsed, sql)
+        if len(self.slowest) < self.slowest_kept:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_queries(self):
+        return sorted(self.slowest, reverse=True)
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, plus the same counts per time slot so the
+    quantiles of a rolling window can be read off them
+    """
+    slots = 10
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.recent = deque()  # (slot start, per-bucket counts)
+
+    def _bucket(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                return i
+        return len(self.buckets)
+
+    def observe(self, value, now):
+        i = self._bucket(value)
+        self.counts[i] += 1
+        self.sum += value
+        slot = now - now % (window_seconds() / self.slots)
+        if not self.recent or self.recent[-1][0] != slot:
+            self.recent.append((slot, [0] * len(self.counts)))
+        self.recent[-1][1][i] += 1
+
+    def window_counts(self, now):
+        while self.recent and self.recent[0][0] <= now - window_seconds():
+            self.recent.popleft()
+        return [sum(counts[i] for _, counts in self.recent) for i in range(len(self.counts))]
+
+    def quantile(self, q, counts):
+        """Estimate, interpolating inside the bucket (as Prometheus' histogram_quantile does)"""
+        total = sum(counts)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # beyond the last bound: report it
+                lower = self.buckets[i - 1] if i else 0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (metric, view) -> Histogram
+        self.requests = {}  # (view, method, status class) -> count
+
+    def record(self, view, method, status, sample, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            key = (view, method, f"{status // 100}xx")
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, (_, buckets, attribute) in HISTOGRAMS.items():
+                value = getattr(sample, attribute)
+                if value is None:
+                    continue
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[name, view] = Histogram(buckets)
+                histogram.observe(value, now)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+    def render(self, now=None):
+        """Everything in the Prometheus text exposition format"""
+        now = time.time() if now is None else now
+        lines = [
+            "# HELP polls_requests_total Requests served",
+            "# TYPE polls_requests_total counter",
+        ]
+        with self.lock:
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f"polls_requests_total{_labels(view=view, method=method, status=status)} {count}")
+            for name, (help_text, buckets, _) in HISTOGRAMS.items():
+                series = sorted((view, h) for (metric, view), h in self.histograms.items() if metric == name)
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for view, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip([*buckets, "+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(view=view, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(view=view)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_labels(view=view)} {cumulative}")
+                lines += [f"# HELP {name}_window {help_text}, last {window_seconds()}s",
+                          f"# TYPE {name}_window gauge"]
+                for view, histogram in series:
+                    counts = histogram.window_counts(now)
+                    for q in QUANTILES:
+                        value = histogram.quantile(q, counts)
+                        if value is not None:
+                            lines.append(f"{name}_window{_labels(view=view, quantile=q)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Works under WSGI and ASGI; see time_query for how queries are attributed"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = Sample()
+        token = _sample.set(sample)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, started)
+
+    async def __acall__(self, request):
+        sample = Sample()
+        token = _sample.set(sample)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, started)
+
+    def finish(self, request, response, sample, started):
+        sample.wall = time.perf_counter() - started
+        if not response.streaming:
+            sample.size = len(response.content)
+
+        match = request.resolver_match
+        if match:
+            view = match.view_name
+        else:
+            view = "static" if request.path.startswith(settings.STATIC_URL) else "unmatched"
+        registry.record(view, request.method, response.status_code, sample)
+        if sample.wall * 1000 >= slow_request_ms():
+            log_slow_request(request, view, response, sample)
+        return response
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Installed on every database connection as it opens (see
+    install_query_timer), rather than around each request: under ASGI the
+    queries run on sync threads, not where the middleware runs. The
+    request's sample follows them there as a context variable.
+    """
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def log_slow_request(request, view, response, sample):
+    slowest = "".join(f"\n  {elapsed * 1000:7.1f} ms  {sql[:300]}" for elapsed, sql in sample.slowest_queries())
+    logger.warning(
+        "Slow request: %s %s (%s) %s in %.0f ms; %d queries in %.0f ms, templates %.0f ms, %s bytes%s",
+        request.method, request.get_full_path(), view, response.status_code, sample.wall * 1000,
+        sample.queries, sample.sql * 1000, sample.template * 1000,
+        "streamed" if sample.size is None else sample.size, slowest,
+    )
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        sample = _sample.get()
+        if sample is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The standard backend, with each top-level render timed into the request's sample"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+class MetricsView(generic.View):
+    """Prometheus scrape target"""
+
+    def get(self, request):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        offered = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not (request.user.is_staff or (token and hmac.compare_digest(offered.encode(), token.encode()))):
+            raise PermissionDenied
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
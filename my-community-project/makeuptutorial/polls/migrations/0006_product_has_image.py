@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+import os
+
+from django.db import migrations, models
+
+
+def populate_has_image(apps, schema_editor):
+    Product = apps.get_model('polls', 'Product')
+    static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+    with_image = []
+    for pk, url in Product.objects.values_list('pk', 'image_url').iterator():
+        url = (url or '').strip()
+        if url.startswith('/static/') and os.path.exists(os.path.join(static_dir, url.split('/static/', 1)[1])):
+            with_image.append(pk)
+    for i in range(0, len(with_image), 500):
+        Product.objects.filter(pk__in=with_image[i:i + 500]).update(has_image=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_reviewlike'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='has_image',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(populate_has_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    ProductDailyStats = apps.get_model('polls', 'ProductDailyStats')
+    Review = apps.get_model('polls', 'Review')
+    rows = (
+        Review.objects.annotate(day=TruncDate('created_at'))
+        .values('product_id', 'day')
+        .order_by()
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating'))
+    )
+    ProductDailyStats.objects.bulk_create(
+        (ProductDailyStats(**row) for row in rows.iterator()), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='polls.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'product'], name='polls_dailystats_day_idx')],
+                'unique_together': {('product', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_days', models.PositiveSmallIntegerField()),
+                ('category', models.CharField(blank=True, max_length=30)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('recent_reviews', models.PositiveIntegerField()),
+                ('recent_avg', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='polls.product')),
+            ],
+            options={
+                'ordering': ['window_days', 'category', 'rank'],
+                'unique_together': {('window_days', 'category', 'rank')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+import itertools
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE polls_search ('
+            ' id bigint PRIMARY KEY,'
+            ' product_id bigint NOT NULL,'
+            ' document tsvector NOT NULL)'
+        )
+        schema_editor.execute('CREATE INDEX polls_search_document_gin ON polls_search USING GIN (document)')
+        schema_editor.execute('CREATE INDEX polls_search_product_id ON polls_search (product_id)')
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            if not any('FTS5' in row[0] for row in cursor.fetchall()):
+                return  # no FTS5 in this SQLite build: search falls back to icontains
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE polls_search USING fts5('
+            'product_id UNINDEXED, brand, name, category, description, reviews, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+# Frozen copies of what polls.search did when this migration was written, so
+# later changes to that module can't change (or break) this migration.
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"['’`]", '', text.lower())
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+
+# columns: row id (product id * 2, review id * 2 + 1), product_id, brand, name, category, description, reviews
+INSERT_SQL = {
+    'sqlite': (
+        'INSERT INTO polls_search (rowid, product_id, brand, name, category, description, reviews) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    ),
+    'postgresql': (
+        'INSERT INTO polls_search (id, product_id, document) VALUES (%s, %s, '
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'D'))"
+    ),
+}
+
+
+def fill_search_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in INSERT_SQL or 'polls_search' not in connection.introspection.table_names():
+        return
+    Product = apps.get_model('polls', 'Product')
+    Review = apps.get_model('polls', 'Review')
+    labels = dict(Product._meta.get_field('category').choices)
+    products = (
+        (pk * 2, pk, normalize(brand), normalize(name), normalize(labels.get(category, category)),
+         normalize(description), '')
+        for pk, brand, name, category, description in Product.objects.using(connection.alias)
+        .values_list('id', 'brand', 'name', 'category', 'description').iterator(chunk_size=2000)
+    )
+    reviews = (
+        (pk * 2 + 1, product_id, '', '', '', '', normalize(f'{title} {body}'))
+        for pk, product_id, title, body in Review.objects.using(connection.alias)
+        .values_list('id', 'product_id', 'title', 'body').iterator(chunk_size=2000)
+    )
+    with connection.cursor() as cursor:
+        for rows in (products, reviews):
+            while chunk := list(itertools.islice(rows, 500)):
+                cursor.executemany(INSERT_SQL[connection.vendor], chunk)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute('DROP TABLE IF EXISTS polls_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_trending'),
+    ]
+
+    operations = [
+        # polls.search owns this table; `manage.py rebuild_search_index` rebuilds it
+        migrations.RunPython(create_search_table, drop_search_table),
+        migrations.RunPython(fill_search_table, migrations.RunPython.noop),
+    ]
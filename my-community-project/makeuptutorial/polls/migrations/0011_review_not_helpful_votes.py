@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:14
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_vote_counters(apps, schema_editor):
+    Review = apps.get_model('polls', 'Review')
+    ReviewHelpfulness = apps.get_model('polls', 'ReviewHelpfulness')
+    rows = ReviewHelpfulness.objects.values('review_id').order_by().annotate(
+        helpful=Count('id', filter=Q(is_helpful=True)),
+        not_helpful=Count('id', filter=Q(is_helpful=False)),
+    )
+    for row in rows.iterator():
+        Review.objects.filter(pk=row['review_id']).update(
+            helpful_votes=row['helpful'], not_helpful_votes=row['not_helpful'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='not_helpful_votes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_counters, migrations.RunPython.noop),
+    ]
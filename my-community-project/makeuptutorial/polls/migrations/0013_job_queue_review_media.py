@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_media_ready(apps, schema_editor):
+    # uploads made before the job queue were served as-is; don't show them as processing
+    ReviewMedia = apps.get_model('polls', 'ReviewMedia')
+    ReviewMedia.objects.update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewmedia',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='reviewmedia',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='processing', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='reviewmedia',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to='review_media/thumbs/'),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['run_after', 'id'], name='job_ready_idx'), models.Index(fields=['status', 'locked_at'], name='job_status_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_media_ready, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,43 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+from . import assets
+
+
+def static_image_exists(url):
+    """True if an image URL is one of the shipped images (see polls/assets.py)"""
+    return assets.lookup(url) is not None
+
+
+def static_image_url(url):
+    """
+    URL to serve for an image URL: for shipped images the staticfiles
+    storage's URL of their canonical asset name (content-hashed, ASCII)
+    """
+    asset = assets.lookup(url)
+    if asset is None:
+        return (url or "").strip()
+    try:
+        return staticfiles_storage.url(asset.name)
+    except ValueError:
+        # not in the manifest (added after collectstatic): the original name still works
+        return url
+
+
+class ImageAsset(models.Model):
+    """A shipped image under its canonical name; products point here (polls/assets.py)"""
+    name = models.CharField(max_length=200, unique=True)  # relative to STATIC_URL
+    source = models.CharField(max_length=300)  # the original file, relative to polls/static
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
 
 
 class Product(models.Model):
@@ -32,27 +68,70 @@ class Product(models.Model):
     category=models.CharField(max_length=30,choices=CATEGORY_CHOICES)
     price=models.DecimalField(max_digits=7,decimal_places=2,null=True,blank=True)
     image_url = models.URLField(blank=True)   # product card image
+    has_image = models.BooleanField(default=False, db_index=True, editable=False)  # image_url resolves to a real file
+    image_asset = models.ForeignKey(ImageAsset, null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name="products", editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized WebP/AVIF copies, see polls.images
     description = models.TextField(blank=True, help_text="Product description")
     created_at=models.DateTimeField(auto_now_add=True)
+
+    # Denormalized rating summary, maintained by polls.ratings on every review write
+    rating_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, db_index=True, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # ProductBrowse: category filter + sort, price range/sort, newest ("-id" is the tie-breaker)
+            models.Index(fields=["-rating_avg", "-id"], condition=models.Q(has_image=True),
+                         name="product_rating_idx"),
+            models.Index(fields=["category", "-rating_avg", "-id"], condition=models.Q(has_image=True),
+                         name="product_cat_rating_idx"),
+            models.Index(fields=["category", "price", "-id"], name="product_cat_price_idx"),
+            models.Index(fields=["price", "-id"], name="product_price_idx"),
+            models.Index(fields=["created_at"], name="product_created_idx"),
+        ]
     
     def __str__(self): return f"{self.brand} {self.name}"
+
+    def save(self, *args, **kwargs):
+        # keep the indexed image flag and the asset in step with image_url
+        asset = assets.lookup(self.image_url)
+        self.has_image = asset is not None
+        self.image_asset = assets.stored(asset)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "image_url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "has_image", "image_asset"}
+        super().save(*args, **kwargs)
     
+    @property
+    def image_src(self):
+        """image_url as served: the canonical asset name (hashed, ASCII)"""
+        return static_image_url(self.image_url)
+
     @property
     def average_rating(self):
-        """Calculate average rating from all reviews"""
-        from django.db.models import Avg
-        return self.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
+        """Average rating from the stored summary"""
+        return self.rating_avg
     
     @property
     def review_count(self):
         """Get total number of reviews"""
-        return self.reviews.count()
+        return self.rating_count
     
     @property
     def rating_distribution(self):
         """Get rating distribution for charts"""
-        from django.db.models import Count
-        return self.reviews.values('rating').annotate(count=Count('rating')).order_by('rating')
+        return [
+            {"rating": star, "count": getattr(self, f"rating_{star}_count")}
+            for star in range(1, 6)
+            if getattr(self, f"rating_{star}_count")
+        ]
 
 class Review(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reviews")
@@ -65,6 +144,7 @@ class Review(models.Model):
     
     # Additional review features
     helpful_votes = models.PositiveIntegerField(default=0)
+    not_helpful_votes = models.PositiveIntegerField(default=0)
     skin_type = models.CharField(max_length=50, blank=True, help_text="Oily, Dry, Combination, Sensitive, Normal")
     skin_tone = models.CharField(max_length=50, blank=True, help_text="Fair, Light, Medium, Tan, Deep")
     age_range = models.CharField(max_length=20, blank=True, help_text="18-24, 25-34, 35-44, 45-54, 55+")
@@ -75,13 +155,36 @@ class Review(models.Model):
     class Meta: 
         ordering = ["-created_at"]
         unique_together = ['user', 'product']  # One review per user per product
+        indexes = [
+            # product feed / ReviewListView newest-oldest (keyset on created_at, id)
+            models.Index(fields=["product", "-created_at", "-id"], name="review_product_created_idx"),
+            # ReviewListView filters and sorts within a product
+            models.Index(fields=["product", "rating", "-created_at"], name="review_product_rating_idx"),
+            models.Index(fields=["product", "skin_type", "-created_at"], name="review_product_skin_idx"),
+            models.Index(fields=["product", "-helpful_votes"], name="review_product_helpful_idx"),
+            models.Index(fields=["product", "-created_at"], condition=models.Q(is_verified_purchase=True),
+                         name="review_verified_idx"),
+            # UserProfileView
+            models.Index(fields=["user", "-created_at"], name="review_user_created_idx"),
+            # recent-activity windows (trends)
+            models.Index(fields=["created_at"], name="review_created_idx"),
+            # incremental exports (polls/exports.py)
+            models.Index(fields=["updated_at", "id"], name="review_updated_idx"),
+        ]
     
     def __str__(self): return f"{self.product} • {self.rating}/5 by {self.user}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember what was loaded so signal handlers can apply rating deltas
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     @property
     def helpful_percentage(self):
         """Calculate helpful percentage if there are votes"""
-        total_votes = self.helpful_votes + getattr(self, 'not_helpful_votes', 0)
+        total_votes = self.helpful_votes + self.not_helpful_votes
         if total_votes == 0:
             return 0
         return (self.helpful_votes / total_votes) * 100
@@ -90,13 +193,25 @@ class ReviewMedia(models.Model):
     PHOTO = "photo"
     VIDEO = "video"
     KIND_CHOICES = [(PHOTO, "Photo"), (VIDEO, "Video")]
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PROCESSING, "Processing"), (READY, "Ready"), (FAILED, "Failed")]
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="media")
     file = models.FileField(upload_to="review_media/")
     kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # filled in by the background job (polls.uploads) after the request returns
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PROCESSING, editable=False)
+    checksum = models.CharField(max_length=64, blank=True, db_index=True, editable=False)  # sha256 of the upload
+    thumbnail = models.FileField(upload_to="review_media/thumbs/", blank=True, editable=False)  # photo thumb / video poster
 
     def __str__(self):
         return f"{self.kind} for {self.review_id}"
 
+    @property
+    def is_ready(self):
+        return self.status == self.READY
+
 class ReviewHelpfulness(models.Model):
     """Track helpful votes on reviews"""
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="helpfulness_votes")
@@ -118,4 +233,68 @@ class WearTest(models.Model):
     notes = models.TextField(blank=True, help_text="Wear test observations")
 
     def __str__(self):
-        return f"WearTest for review {self.review_id}"
\ No newline at end of file
+        return f"WearTest for review {self.review_id}"
+
+
+class ProductDailyStats(models.Model):
+    """Per-product, per-day review count and rating sum (the trending engine's buckets)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'day']
+        indexes = [models.Index(fields=["day", "product"], name="polls_dailystats_day_idx")]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.review_count} reviews"
+
+class TrendingScore(models.Model):
+    """Precomputed, ranked trending list per (window, category); category "" means all"""
+    window_days = models.PositiveSmallIntegerField()
+    category = models.CharField(max_length=30, blank=True)
+    rank = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="trending_scores")
+    score = models.FloatField()
+    recent_reviews = models.PositiveIntegerField()
+    recent_avg = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["window_days", "category", "rank"]
+        unique_together = ['window_days', 'category', 'rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.product_id} ({self.window_days}d {self.category or 'all'})"
+
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py run_jobs` (see polls.jobs)"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=64)  # a task registered with polls.jobs.task
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's "next runnable job" lookup
+            models.Index(fields=["run_after", "id"], condition=models.Q(status="queued"), name="job_ready_idx"),
+            models.Index(fields=["status", "locked_at"], name="job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the ordering values of the last row on a page, JSON-encoded in
+urlsafe base64 (datetimes to the microsecond, as stored). The next page is "rows strictly after those values", which
+an index on the ordering columns can seek to directly, unlike OFFSET.
+"""
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _field_name(order):
+    return order.lstrip("-")
+
+
+def _row_value(row, name):
+    # rows are model instances, or dicts from values()
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but times keep their microseconds: rows a millisecond apart mustn't tie"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, model, ordering):
+    """Turn a cursor back into typed ordering values; raises InvalidCursor"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(token)
+
+    typed = []
+    for order, value in zip(ordering, values):
+        try:
+            field = model._meta.get_field(_field_name(order))
+        except FieldDoesNotExist:
+            typed.append(value)  # annotation: keep the JSON value
+            continue
+        try:
+            typed.append(field.to_python(value))
+        except ValidationError as exc:
+            raise InvalidCursor(token) from exc
+    return typed
+
+
+def keyset_filter(qs, ordering, values):
+    """Rows strictly after `values` in `ordering` (e.g. ["-created_at", "-id"])"""
+    clauses = []
+    for i, order in enumerate(ordering):
+        lookup = "lt" if order.startswith("-") else "gt"
+        clause = Q(**{f"{_field_name(order)}__{lookup}": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            clause &= Q(**{_field_name(prev): value})
+        clauses.append(clause)
+    return qs.filter(reduce(or_, clauses))
+
+
+def keyset_page(qs, ordering, cursor=None, size=10):
+    """
+    One page of `qs` in `ordering` (which must end in a unique field).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    A values() queryset works too, as long as it selects the ordering fields.
+    """
+    qs = qs.order_by(*ordering)
+    if cursor:
+        qs = keyset_filter(qs, ordering, decode_cursor(cursor, qs.model, ordering))
+    rows = list(qs[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(_row_value(last, _field_name(o)) for o in ordering)
@@ -0,0 +1,88 @@
+"""
+Denormalized rating summary on Product (count, sum, average and a 1–5 star
+histogram). Review writes adjust it with single UPDATE ... SET col = col + n
+statements, so listing pages can read/sort the columns without touching the
+reviews table. `rebuild_rating_summaries` recomputes it from scratch.
+"""
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Product, Review
+
+STARS = range(1, 6)
+SUMMARY_FIELDS = ["rating_count", "rating_sum", "rating_avg"] + [f"rating_{s}_count" for s in STARS]
+
+
+def _star(rating):
+    return max(1, min(5, int(rating)))
+
+
+def apply_rating_change(product_id, old=None, new=None):
+    """Move one review of `product_id` from `old` to `new` stars (None = no review)"""
+    old = _star(old) if old is not None else None
+    new = _star(new) if new is not None else None
+    if old == new:
+        return
+
+    count_delta = (new is not None) - (old is not None)
+    sum_delta = (new or 0) - (old or 0)
+    count = F("rating_count") + count_delta
+    total = F("rating_sum") + sum_delta
+
+    updates = {
+        "rating_count": count,
+        "rating_sum": total,
+        # every right-hand side sees the pre-update row, so this is the new average
+        "rating_avg": Coalesce(Cast(total, FloatField()) / NullIf(count, 0), 0.0),
+    }
+    if old is not None:
+        updates[f"rating_{old}_count"] = F(f"rating_{old}_count") - 1
+    if new is not None:
+        updates[f"rating_{new}_count"] = F(f"rating_{new}_count") + 1
+    Product.objects.filter(pk=product_id).update(**updates)
+
+
+def compute_rating_summaries(product_ids=None):
+    """Aggregate the reviews table into {product_id: {summary field: value}}"""
+    reviews = Review.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+    rows = reviews.values("product_id").order_by().annotate(
+        rating_count=Count("id"),
+        rating_sum=Sum("rating"),
+        **{f"rating_{s}_count": Count("id", filter=Q(rating=s)) for s in STARS},
+    )
+    summaries = {}
+    for row in rows:
+        product_id = row.pop("product_id")
+        row["rating_avg"] = row["rating_sum"] / row["rating_count"]
+        summaries[product_id] = row
+    return summaries
+
+
+def rebuild_rating_summaries(product_ids=None, commit=True, batch_size=1000):
+    """
+    Compare stored summaries with the reviews table and fix drifted rows.
+    Returns the drifted products (left untouched when commit=False).
+    """
+    expected = compute_rating_summaries(product_ids)
+    empty = dict.fromkeys(SUMMARY_FIELDS, 0)
+
+    products = Product.objects.only("id", *SUMMARY_FIELDS).order_by("id")
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    drifted, pending = [], []
+    for product in products.iterator(chunk_size=batch_size):
+        want = expected.get(product.pk, empty)
+        if any(abs(getattr(product, f) - want[f]) > 1e-9 for f in SUMMARY_FIELDS):
+            for f in SUMMARY_FIELDS:
+                setattr(product, f, want[f])
+            drifted.append(product)
+            pending.append(product)
+        if commit and len(pending) >= batch_size:
+            Product.objects.bulk_update(pending, SUMMARY_FIELDS)
+            pending = []
+    if commit and pending:
+        Product.objects.bulk_update(pending, SUMMARY_FIELDS)
+    return drifted
@@ -0,0 +1,115 @@
+"""
+Database routing for read replicas.
+
+settings.py defines one alias per entry in DB_REPLICAS (replica1, replica2,
+...) and lists them in DATABASE_REPLICAS. Reads are spread over those
+aliases; writes and migrations always go to "default".
+
+Replicas lag the primary, so a user who just wrote must not read from them
+straight away. ReplicaPinMiddleware opens a request scope in which:
+
+- unsafe requests (POST, ...) read from the primary throughout
+- as soon as anything is written, the rest of the request reads from the
+  primary, and a short-lived cookie keeps that user's following requests
+  there for REPLICA_PIN_SECONDS
+- any other request sticks to one replica, so a page never mixes two
+  replicas at different lag
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_pin"
+
+_scope = ContextVar("replica_scope", default=None)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+
+class _Scope:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Route reads for the duration of one request; yields the scope state"""
+    token = _scope.set(_Scope(pinned))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        scope = _scope.get()
+        if not aliases or (scope and scope.pinned) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # inside a transaction on the primary, read what it just wrote
+            return DEFAULT_DB_ALIAS
+        if scope is None:
+            return random.choice(aliases)
+        if scope.replica not in aliases:
+            scope.replica = random.choice(aliases)
+        return scope.replica
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.wrote = scope.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # every alias holds the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for replica routing. Goes above SessionMiddleware so
+    the session saved on the way out (e.g. at login) counts as a write.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope(self.pinned(request)) as scope:
+            response = self.get_response(request)
+        return self.pin(scope, response)
+
+    async def __acall__(self, request):
+        # the scope is a context variable, so the ORM's sync threads see it too
+        with request_scope(self.pinned(request)) as scope:
+            response = await self.get_response(request)
+        return self.pin(scope, response)
+
+    def pinned(self, request):
+        return request.method not in ("GET", "HEAD", "OPTIONS") or PIN_COOKIE in request.COOKIES
+
+    def pin(self, scope, response):
+        if scope.wrote and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, "1", max_age=pin_seconds(), httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,321 @@
+"""
+Product search.
+
+Products and reviews are indexed into one full-text table, `polls_search`:
+one row per product (brand, name, category, description) and one per review
+(title + body), so a match on review text finds its product. Two backends
+share that layout:
+
+- SQLite FTS5 (development), ranked with bm25()
+- Postgres tsvector + GIN (production), ranked with ts_rank()
+
+Anything else falls back to the old icontains scan. Text is folded to
+lower-case ASCII without apostrophes on both sides ("L'Oréal" -> "loreal"),
+every term matches as a prefix, and terms that look like a misspelt brand
+are widened with their closest brand names.
+
+search_products() takes the caller's Product filters (`within`) into the
+index query, so the result limit applies to the products actually shown.
+Signals keep the index current, migration 0009 fills it and
+`manage.py rebuild_search_index` rebuilds it.
+"""
+import difflib
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, Q, Value, When
+
+from .models import Product, Review
+
+TABLE = "polls_search"
+BRAND_VOCAB_KEY = "search:brand-vocab"
+CATEGORY_LABELS = dict(Product.CATEGORY_CHOICES)
+
+
+def normalize(text):
+    """Fold text to searchable form: lower-case ASCII, apostrophes dropped"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"['’`]", "", text.lower())
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def query_terms(query):
+    return normalize(query).split()[:10]
+
+
+def brand_vocabulary():
+    """Normalized brand words and whole brand names, for typo correction"""
+    vocab = cache.get(BRAND_VOCAB_KEY)
+    if vocab is None:
+        vocab = set()
+        for brand in Product.objects.values_list("brand", flat=True).distinct():
+            words = normalize(brand).split()
+            vocab.update(w for w in words if len(w) > 2)
+            vocab.add("".join(words))
+        vocab = sorted(vocab)
+        cache.set(BRAND_VOCAB_KEY, vocab, 600)
+    return vocab
+
+
+def expand_term(term, vocab):
+    """A term plus the brand names it is probably a typo of"""
+    if len(term) < 4 or term in vocab:
+        return [term]
+    return [term] + difflib.get_close_matches(term, vocab, n=3, cutoff=0.75)
+
+
+# Row ids: products get even ids, reviews odd ones, so both fit in one table
+def product_row_id(product_id):
+    return product_id * 2
+
+
+def review_row_id(review_id):
+    return review_id * 2 + 1
+
+
+def _chunks(rows, size=500):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class LikeBackend:
+    """No index: icontains over the product columns (the original behaviour)"""
+
+    def __init__(self, using="default"):
+        self.using = using
+
+    def index_products(self, rows):
+        pass
+
+    def index_reviews(self, rows):
+        pass
+
+    def remove(self, row_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit, within=None):
+        q = Q()
+        for term in query.split():
+            q &= Q(name__icontains=term) | Q(brand__icontains=term) | Q(category__icontains=term)
+        products = Product.objects.all() if within is None else within
+        return list(products.using(self.using).filter(q).order_by("-rating_avg", "-id")
+                    .values_list("id", flat=True)[:limit])
+
+
+class _IndexBackend(LikeBackend):
+    def _cursor(self):
+        return connections[self.using].cursor()
+
+    @staticmethod
+    def product_fields(row):
+        pk, brand, name, category, description = row
+        return pk, normalize(brand), normalize(name), normalize(CATEGORY_LABELS.get(category, category)), normalize(description)
+
+    @staticmethod
+    def review_fields(row):
+        pk, product_id, title, body = row
+        return pk, product_id, normalize(f"{title} {body}")
+
+    def remove(self, row_ids):
+        with self._cursor() as cursor:
+            for chunk in _chunks(row_ids):
+                cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+    def clear(self):
+        with self._cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+
+    def within_sql(self, within):
+        """(" AND product_id IN (...)", params) restricting matches to a Product queryset"""
+        if within is None:
+            return "", []
+        sql, params = within.values("pk").query.get_compiler(using=self.using).as_sql()
+        return f" AND product_id IN ({sql})", list(params)
+
+
+class SqliteFTSBackend(_IndexBackend):
+    # bm25 column weights: product_id, brand, name, category, description, reviews
+    WEIGHTS = "bm25(0, 10.0, 10.0, 4.0, 2.0, 1.0)"
+
+    def index_products(self, rows):
+        for chunk in _chunks(self.product_fields(r) for r in rows):
+            self.remove([product_row_id(r[0]) for r in chunk])
+            with self._cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (rowid, product_id, brand, name, category, description, reviews) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, '')",
+                    [(product_row_id(r[0]), *r) for r in chunk],
+                )
+
+    def index_reviews(self, rows):
+        for chunk in _chunks(self.review_fields(r) for r in rows):
+            self.remove([review_row_id(r[0]) for r in chunk])
+            with self._cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (rowid, product_id, brand, name, category, description, reviews) "
+                    "VALUES (%s, %s, '', '', '', '', %s)",
+                    [(review_row_id(pk), product_id, text) for pk, product_id, text in chunk],
+                )
+
+    @staticmethod
+    def match_expression(terms, vocab):
+        groups = []
+        for term in terms:
+            options = [f'"{term}"*'] + [f'"{alt}"' for alt in expand_term(term, vocab)[1:]]
+            groups.append(f"({' OR '.join(options)})")
+        return " AND ".join(groups)
+
+    def search(self, query, limit, within=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        expression = self.match_expression(terms, brand_vocabulary())
+        restrict, params = self.within_sql(within)
+        ids = {}
+        with self._cursor() as cursor:
+            # one product can match through many review rows: keep its best-ranked hit
+            cursor.execute(
+                f"SELECT product_id FROM {TABLE} WHERE {TABLE} MATCH %s AND rank MATCH %s{restrict} ORDER BY rank",
+                [expression, self.WEIGHTS, *params],
+            )
+            for (product_id,) in cursor:
+                ids.setdefault(product_id, None)
+                if len(ids) >= limit:
+                    break
+        return list(ids)
+
+
+class PostgresSearchBackend(_IndexBackend):
+    def _upsert(self, rows):
+        with self._cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (id, product_id, document) VALUES (%s, %s, "
+                "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D')) "
+                "ON CONFLICT (id) DO UPDATE SET product_id = EXCLUDED.product_id, document = EXCLUDED.document",
+                rows,
+            )
+
+    def index_products(self, rows):
+        for chunk in _chunks(self.product_fields(r) for r in rows):
+            self._upsert([(product_row_id(r[0]), *r, "") for r in chunk])
+
+    def index_reviews(self, rows):
+        for chunk in _chunks(self.review_fields(r) for r in rows):
+            self._upsert([(review_row_id(pk), product_id, "", "", "", "", text) for pk, product_id, text in chunk])
+
+    def remove(self, row_ids):
+        with self._cursor() as cursor:
+            for chunk in _chunks(row_ids):
+                cursor.execute(f"DELETE FROM {TABLE} WHERE id = ANY(%s)", [chunk])
+
+    @staticmethod
+    def tsquery(terms, vocab):
+        groups = []
+        for term in terms:
+            options = [f"{term}:*"] + expand_term(term, vocab)[1:]
+            groups.append(f"({' | '.join(options)})")
+        return " & ".join(groups)
+
+    def search(self, query, limit, within=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        restrict, params = self.within_sql(within)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {TABLE}, to_tsquery('simple', %s) AS query "
+                f"WHERE document @@ query{restrict} GROUP BY product_id "
+                "ORDER BY MAX(ts_rank(document, query)) DESC, product_id DESC LIMIT %s",
+                [self.tsquery(terms, brand_vocabulary()), *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cursor.fetchall())
+
+
+def backend_name(connection):
+    configured = getattr(settings, "SEARCH_BACKEND", None)
+    if configured:
+        return configured
+    if connection.vendor == "postgresql":
+        return "postgres"
+    if connection.vendor == "sqlite" and sqlite_has_fts5(connection):
+        return "fts5"
+    return "like"
+
+
+BACKENDS = {"fts5": SqliteFTSBackend, "postgres": PostgresSearchBackend, "like": LikeBackend}
+_backends = {}
+
+
+def get_backend(using="default"):
+    if using not in _backends:
+        _backends[using] = BACKENDS[backend_name(connections[using])](using)
+    return _backends[using]
+
+
+def search_products(query, limit=None, within=None):
+    """
+    Ids of products matching `query`, best match first. `within` (a Product
+    queryset) restricts the matches before the limit is applied.
+    """
+    limit = limit or getattr(settings, "SEARCH_MAX_RESULTS", 500)
+    return get_backend().search(query, limit, within)
+
+
+def relevance(matches):
+    """Order expression putting products in the order of `matches` (search_products ids)"""
+    ranks = {pk: rank for rank, pk in enumerate(matches)}
+    return Case(*[When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()], default=Value(len(ranks)))
+
+
+# Index maintenance (called from signals and the rebuild command)
+
+def index_products(products):
+    get_backend().index_products((p.pk, p.brand, p.name, p.category, p.description) for p in products)
+    cache.delete(BRAND_VOCAB_KEY)
+
+
+def index_reviews(reviews):
+    get_backend().index_reviews((r.pk, r.product_id, r.title, r.body) for r in reviews)
+
+
+def remove_product(product_id):
+    get_backend().remove([product_row_id(product_id)])
+    cache.delete(BRAND_VOCAB_KEY)
+
+
+def remove_review(review_id):
+    get_backend().remove([review_row_id(review_id)])
+
+
+def rebuild(batch_size=2000):
+    """Re-index every product and review; returns (products, reviews) indexed"""
+    backend = get_backend()
+    products = Product.objects.values_list("id", "brand", "name", "category", "description")
+    reviews = Review.objects.values_list("id", "product_id", "title", "body")
+    with transaction.atomic():
+        backend.clear()
+        backend.index_products(products.iterator(chunk_size=batch_size))
+        backend.index_reviews(reviews.iterator(chunk_size=batch_size))
+    cache.delete(BRAND_VOCAB_KEY)
+    return products.count(), reviews.count()
@@ -0,0 +1,634 @@
+"""
+Seed data and the bulk seeding engine.
+
+The demo corpora (users, catalog, review snippets) live here so both
+`seed.py` and the bulk generator use them. `BulkSeeder` (behind
+`python seed.py --bulk ...`) grows the database to target sizes for load
+tests: batched bulk_create inside one transaction per batch, existing
+user/product pairs looked up with one query per batch of users, and every
+phase reports its rows/sec. bulk_create skips the model signals, so
+`refresh_derived` rebuilds what they normally maintain afterwards.
+"""
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from PIL import Image
+
+from . import assets, caching, ratings, search, stats, trending, votes
+from .models import Product, Review, ReviewHelpfulness, ReviewMedia, static_image_exists
+from .uploads import file_checksum, thumbnail_bytes
+from .utils import batched
+
+DEMO_PASSWORD = "demo12345"  # login password for all demo users
+
+USERS = [
+    {"username": "aria", "email": "aria@example.com"},
+    {"username": "ben", "email": "ben@example.com"},
+    {"username": "cami", "email": "cami@example.com"},
+    {"username": "diego", "email": "diego@example.com"},
+    {"username": "fatima", "email": "fatima@example.com"},
+    {"username": "sophia", "email": "sophia@example.com"},
+    {"username": "maya", "email": "maya@example.com"},
+    {"username": "zoe", "email": "zoe@example.com"},
+    {"username": "luna", "email": "luna@example.com"},
+    {"username": "chloe", "email": "chloe@example.com"},
+    {"username": "emma", "email": "emma@example.com"},
+    {"username": "olivia", "email": "olivia@example.com"},
+    {"username": "ava", "email": "ava@example.com"},
+    {"username": "isabella", "email": "isabella@example.com"},
+    {"username": "mia", "email": "mia@example.com"},
+    {"username": "charlotte", "email": "charlotte@example.com"},
+    {"username": "amelia", "email": "amelia@example.com"},
+    {"username": "harper", "email": "harper@example.com"},
+    {"username": "evelyn", "email": "evelyn@example.com"},
+    {"username": "abigail", "email": "abigail@example.com"},
+]
+
+PRODUCTS = [
+    # Trending Lip Products
+    {
+        "brand": "Fenty Beauty",
+        "name": "Stunna Lip Paint in Uncensored",
+        "category": "lipstick",
+        "price": 25,
+        "image_url": "/static/img/products/Fenty Beauty — Stunna Lip Paint in Uncensored.jpg",
+    },
+    {
+        "brand": "Rare Beauty",
+        "name": "Liquid Lipstick in Brave",
+        "category": "lipstick",
+        "price": 22,
+        "image_url": "/static/img/products/Rare Beauty — Liquid Lipstick in Brave.webp",
+    },
+    {
+        "brand": "Glossier",
+        "name": "Generation G Matte Lipstick in Cake",
+        "category": "lipstick",
+        "price": 18,
+        "image_url": "/static/img/products/Glossier — Generation G Matte Lipstick in Cake.png",
+    },
+    {
+        "brand": "Charlotte Tilbury",
+        "name": "Pillow Talk Lipstick",
+        "category": "lipstick",
+        "price": 35,
+        "image_url": "/static/img/products/Charlotte Tilbury — Pillow Talk Lipstick.webp",
+    },
+    
+    # Trending Foundation & Base
+    {
+        "brand": "Fenty Beauty",
+        "name": "Pro Filt'r Soft Matte Foundation",
+        "category": "foundation",
+        "price": 38,
+        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Soft Matte Foundation.webp",
+    },
+    {
+        "brand": "Rare Beauty",
+        "name": "Liquid Touch Weightless Foundation",
+        "category": "foundation",
+        "price": 29,
+        "image_url": "/static/img/products/Rare Beauty — Liquid Touch Weightless Foundation.webp",
+    },
+    {
+        "brand": "NARS",
+        "name": "Light Reflecting Foundation",
+        "category": "foundation",
+        "price": 50,
+        "image_url": "/static/img/products/NARS — Light Reflecting Foundation.avif",
+    },
+    {
+        "brand": "Glossier",
+        "name": "Perfecting Skin Tint",
+        "category": "foundation",
+        "price": 26,
+        "image_url": "/static/img/products/Glossier — Perfecting Skin Tint.jpeg",
+    },
+    
+    # Trending Eyeshadow Palettes
+    {
+        "brand": "Anastasia Beverly Hills",
+        "name": "Modern Renaissance Palette",
+        "category": "eyeshadow",
+        "price": 45,
+        "image_url": "/static/img/products/Anastasia Beverly Hills — Modern Renaissance Palette.jpg",
+    },
+    {
+        "brand": "Urban Decay",
+        "name": "Naked Heat Eyeshadow Palette",
+        "category": "eyeshadow",
+        "price": 54,
+        "image_url": "/static/img/products/Urban Decay — Naked Heat Eyeshadow Palette.jpg",
+    },
+    {
+        "brand": "Huda Beauty",
+        "name": "Desert Dusk Eyeshadow Palette",
+        "category": "eyeshadow",
+        "price": 65,
+        "image_url": "/static/img/products/Huda Beauty — Desert Dusk Eyeshadow Palette.avif",
+    },
+    {
+        "brand": "Morphe",
+        "name": "35O2 Second Nature Eyeshadow Palette",
+        "category": "eyeshadow",
+        "price": 25,
+        "image_url": "/static/img/products/Morphe — 35O2 Second Nature Eyeshadow Palette.webp",
+    },
+    
+    # Trending Mascara & Lashes
+    {
+        "brand": "Too Faced",
+        "name": "Better Than Sex Mascara",
+        "category": "mascara",
+        "price": 26,
+        "image_url": "/static/img/products/Too Faced — Better Than Sex Mascara.avif",
+    },
+    {
+        "brand": "Benefit Cosmetics",
+        "name": "They're Real! Mascara",
+        "category": "mascara",
+        "price": 25,
+        "image_url": "/static/img/products/Benefit Cosmetics — They're Real! Mascara.avif",
+    },
+    {
+        "brand": "L'Oréal",
+        "name": "Lash Paradise Mascara",
+        "category": "mascara",
+        "price": 12,
+        "image_url": "/static/img/products/L'Oréal — Lash Paradise Mascara.jpg",
+    },
+    {
+        "brand": "Maybelline",
+        "name": "Sky High Mascara",
+        "category": "mascara",
+        "price": 9,
+        "image_url": "/static/img/products/Maybelline — Sky High Mascara.webp",
+    },
+    
+    # Trending Concealer & Corrector
+    {
+        "brand": "Tarte",
+        "name": "Shape Tape Concealer",
+        "category": "concealer",
+        "price": 27,
+        "image_url": "/static/img/products/Tarte — Shape Tape Concealer.jpg",
+    },
+    {
+        "brand": "NARS",
+        "name": "Radiant Creamy Concealer",
+        "category": "concealer",
+        "price": 32,
+        "image_url": "/static/img/products/NARS — Radiant Creamy Concealer.avif",
+    },
+    {
+        "brand": "Fenty Beauty",
+        "name": "Pro Filt'r Instant Retouch Concealer",
+        "category": "concealer",
+        "price": 25,
+        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Instant Retouch Concealer.avif",
+    },
+    
+    # Trending Blush & Highlighter
+    {
+        "brand": "Rare Beauty",
+        "name": "Soft Pinch Liquid Blush",
+        "category": "blush",
+        "price": 20,
+        "image_url": "/static/img/products/Rare Beauty — Soft Pinch Liquid Blush.webp",
+    },
+    {
+        "brand": "Fenty Beauty",
+        "name": "Cheeks Out Freestyle Cream Blush",
+        "category": "blush",
+        "price": 22,
+        "image_url": "/static/img/products/Fenty Beauty — Cheeks Out Freestyle Cream Blush.jpg",
+    },
+    {
+        "brand": "Glossier",
+        "name": "Cloud Paint in Puff",
+        "category": "blush",
+        "price": 18,
+        "image_url": "/static/img/products/Glossier — Cloud Paint in Puff.jpg",
+    },
+    {
+        "brand": "Fenty Beauty",
+        "name": "Killawatt Freestyle Highlighter",
+        "category": "highlighter",
+        "price": 38,
+        "image_url": "/static/img/products/Fenty Beauty — Killawatt Freestyle Highlighter.webp",
+    },
+    
+    # Trending Skincare-Makeup Hybrids
+    {
+        "brand": "Glossier",
+        "name": "Futuredew Oil-Serum Hybrid",
+        "category": "skincare",
+        "price": 24,
+        "image_url": "/static/img/products/Glossier — Futuredew Oil-Serum Hybrid.png",
+    },
+    {
+        "brand": "Rare Beauty",
+        "name": "Always an Optimist 4-in-1 Prime & Set Mist",
+        "category": "skincare",
+        "price": 22,
+        "image_url": "/static/img/products/Rare Beauty — Always an Optimist 4-in-1 Prime & Set Mist.webp",
+    },
+    {
+        "brand": "Fenty Beauty",
+        "name": "Pro Filt'r Instant Retouch Setting Powder",
+        "category": "powder",
+        "price": 32,
+        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Instant Retouch Setting Powder.jpg",
+    },
+    
+    # --- New additions ---
+    {
+        "brand": "Kylie Cosmetics",
+        "name": "Matte Liquid Lipstick “Candy K”",
+        "category": "lipstick",
+        "price": 18,
+        "image_url": "/static/img/products/Kylie Cosmetics — Matte Liquid Lipstick “Candy K”.jpg",
+    },
+    {
+        "brand": "Kylie Cosmetics",
+        "name": "Velvet Lip Kit “Bare”",
+        "category": "lipstick",
+        "price": 29,
+        "image_url": "/static/img/products/Kylie Cosmetics — Velvet Lip Kit “Bare”.jpg",
+    },
+    {
+        "brand": "Kylie Cosmetics",
+        "name": "Kylash Volume Mascara",
+        "category": "mascara",
+        "price": 24,
+        "image_url": "/static/img/products/Kylie Cosmetics — Kylash Volume Mascara.webp",
+    },
+    {
+        "brand": "Kylie Cosmetics",
+        "name": "Pressed Blush Powder “Baddie on the Block”",
+        "category": "blush",
+        "price": 20,
+        "image_url": "/static/img/products/Kylie Cosmetics — Pressed Blush Powder “Baddie on the Block”.avif",
+    },
+    {
+        "brand": "Huda Beauty",
+        "name": "Power Bullet Matte Lipstick “Interview”",
+        "category": "lipstick",
+        "price": 27,
+        "image_url": "/static/img/products/Huda Beauty — Power Bullet Matte Lipstick “Interview”.jpg",
+    },
+    {
+        "brand": "Huda Beauty",
+        "name": "FauxFilter Luminous Matte Foundation",
+        "category": "foundation",
+        "price": 42,
+        "image_url": "/static/img/products/Huda Beauty — FauxFilter Luminous Matte Foundation.jpg",
+    },
+    {
+        "brand": "Huda Beauty",
+        "name": "Easy Bake Loose Baking & Setting Powder",
+        "category": "powder",
+        "price": 35,
+        "image_url": "/static/img/products/Huda Beauty — Easy Bake Loose Baking & Setting Powder.jpg",
+    },
+    {
+        "brand": "Huda Beauty",
+        "name": "Legit Lashes Double-Ended Mascara",
+        "category": "mascara",
+        "price": 27,
+        "image_url": "/static/img/products/Huda Beauty — Legit Lashes Double-Ended Mascara.webp",
+    },
+    {
+        "brand": "Summer Fridays",
+        "name": "Lip Butter Balm “Vanilla”",
+        "category": "skincare",
+        "price": 24,
+        "image_url": "/static/img/products/Summer Fridays — Lip Butter Balm “Vanilla”.webp",
+    },
+    {
+        "brand": "Summer Fridays",
+        "name": "Jet Lag Mask",
+        "category": "skincare",
+        "price": 49,
+        "image_url": "/static/img/products/Summer Fridays — Jet Lag Mask.jpg",
+    },
+    {
+        "brand": "NARS",
+        "name": "Buttermelt Blush",
+        "category": "blush",
+        "price": 34,
+        "image_url": "/static/img/products/Nars - Buttermelt Blush.jpg",
+    },
+]
+
+POSITIVE_SNIPPETS = [
+    "Absolutely love this! The formula is incredible and lasts all day.",
+    "This is my holy grail product. Perfect for my skin type.",
+    "Amazing pigmentation and blendability. Worth every penny!",
+    "I've been using this for months and it's still my go-to.",
+    "The color payoff is stunning and it doesn't budge all day.",
+    "Perfect for my oily skin - no creasing or fading.",
+    "The texture is so smooth and applies like a dream.",
+    "Love how buildable this is - can go from subtle to dramatic.",
+    "The finish is flawless and looks expensive.",
+    "I've tried so many similar products and this is the best.",
+]
+
+MIXED_SNIPPETS = [
+    "Good product overall, but the price is a bit steep.",
+    "Nice formula, but the shade range could be better.",
+    "Works well, though it takes some practice to apply correctly.",
+    "I like it, but it's not quite what I expected from the reviews.",
+    "Nice color, but the staying power could be better.",
+    "Good product, but the packaging could be more travel-friendly.",
+]
+
+CRITICAL_SNIPPETS = [
+    "Not worth the hype. Doesn't work well with my skin type.",
+    "The formula is too thick and hard to blend.",
+    "Color doesn't match what I expected from the swatches.",
+    "This product doesn't last as long as advertised.",
+    "Too expensive for what you get. Disappointed.",
+    "The packaging broke after just a few uses.",
+]
+
+TITLES_BY_RATING = {
+    5: [
+        "Absolutely perfect!", "Holy grail product!", "Worth every penny!",
+        "Life-changing!", "My new favorite!", "Incredible quality!",
+    ],
+    4: [
+        "Really great product", "Solid choice", "Would recommend", "Good quality",
+    ],
+    3: [
+        "It's okay", "Decent product", "Average quality", "Mixed feelings",
+    ],
+    2: [
+        "Disappointed", "Not what I expected", "Below average", "Not great",
+    ],
+    1: [
+        "Terrible", "Waste of money", "Awful quality", "Regret purchase",
+    ],
+}
+
+
+def pick_snippet_for_rating(r: int, rng=random) -> str:
+    if r >= 5:
+        pool = POSITIVE_SNIPPETS
+    elif r == 4:
+        pool = POSITIVE_SNIPPETS + MIXED_SNIPPETS
+    elif r == 3:
+        pool = MIXED_SNIPPETS
+    elif r == 2:
+        pool = MIXED_SNIPPETS + CRITICAL_SNIPPETS
+    else:
+        pool = CRITICAL_SNIPPETS
+    return rng.choice(pool)
+
+
+RATING_WEIGHTS = [8, 14, 28, 32, 18]  # 1..5 stars, biased around 3–4 like the demo data
+SKIN_TYPES = ["", "oily", "dry", "combination", "sensitive", "normal"]
+SKIN_TONES = ["", "fair", "light", "medium", "tan", "deep"]
+AGE_RANGES = ["", "18-24", "25-34", "35-44", "45-54", "55+"]
+PRODUCT_LINES = ["Velvet", "Glow", "Matte", "Silk", "Cloud", "Power", "Soft", "Hydra", "Lumi", "Pro"]
+
+
+def fake_review(rng, now, days=365):
+    """Field values for one synthetic review (everything but user/product)"""
+    rating = rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]
+    created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+    return {
+        "rating": rating,
+        "title": rng.choice(TITLES_BY_RATING[rating]),
+        "body": pick_snippet_for_rating(rating, rng),
+        "is_verified_purchase": rng.random() < 0.4,
+        "skin_type": rng.choice(SKIN_TYPES),
+        "skin_tone": rng.choice(SKIN_TONES),
+        "age_range": rng.choice(AGE_RANGES),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+@contextmanager
+def backdating(model):
+    """Let bulk_create keep the created_at/updated_at we set instead of stamping now()"""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class BulkSeeder:
+    """Grow each table to a target row count; existing rows count towards it"""
+
+    def __init__(self, seed=42, batch_size=5000, days=365, out=print):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.now = timezone.now()
+        self.out = out
+
+    @contextmanager
+    def phase(self, label):
+        started = time.perf_counter()
+        counter = {"rows": 0}
+        yield counter
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.out(f"  {label}: {counter['rows']:,} rows in {elapsed:.1f}s ({counter['rows'] / elapsed:,.0f} rows/s)")
+
+    def _insert(self, model, objs, counter, **kwargs):
+        for batch in batched(objs, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size, **kwargs)
+            counter["rows"] += len(batch)
+
+    def seed_users(self, target):
+        User = get_user_model()
+        need = target - User.objects.count()
+        if need <= 0:
+            return
+        taken = set(User.objects.filter(username__startswith="load").values_list("username", flat=True))
+        password = make_password(DEMO_PASSWORD)  # hashing is slow: one hash shared by every load user
+
+        def users():
+            i = made = 0
+            while made < need:
+                name = f"load{i}"
+                i += 1
+                if name not in taken:
+                    made += 1
+                    yield User(username=name, email=f"{name}@example.com", password=password)
+
+        with self.phase("users") as counter:
+            self._insert(User, users(), counter)
+
+    def seed_products(self, target):
+        need = target - Product.objects.count()
+        if need <= 0:
+            return
+        start = Product.objects.aggregate(n=Max("id"))["n"] or 0
+        has_image = {p["image_url"]: static_image_exists(p["image_url"]) for p in PRODUCTS}
+        categories = [c for c, _ in Product.CATEGORY_CHOICES]
+
+        def products():
+            for i in range(start + 1, start + need + 1):
+                template = self.rng.choice(PRODUCTS)
+                yield Product(
+                    brand=template["brand"],
+                    name=f"{self.rng.choice(PRODUCT_LINES)} {template['name']} {i}",
+                    category=self.rng.choice(categories),
+                    price=self.rng.randint(6, 80),
+                    image_url=template["image_url"],
+                    has_image=has_image[template["image_url"]],
+                    description=f"Synthetic load-test product based on {template['brand']} {template['name']}.",
+                )
+
+        with self.phase("products") as counter:
+            self._insert(Product, products(), counter)
+
+    def seed_reviews(self, target):
+        need = target - Review.objects.count()
+        if need <= 0:
+            return
+        user_ids = list(get_user_model().objects.order_by("id").values_list("id", flat=True))
+        product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+        if not user_ids or not product_ids:
+            self.out("  reviews: no users or products to review")
+            return
+        # a long tail: a few products collect most of the reviews
+        popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(product_ids))]
+        self.rng.shuffle(popularity)
+        users_per_batch = max(1, self.batch_size * len(user_ids) // need)
+
+        def reviews():
+            made = 0
+            for i, chunk in enumerate(batched(user_ids, users_per_batch)):
+                existing = set(Review.objects.filter(user_id__in=chunk).values_list("user_id", "product_id"))
+                for j, user_id in enumerate(chunk, start=i * users_per_batch):
+                    # spread what is still owed over the users left, so shortfalls carry forward
+                    quota = min(-(-(need - made) // (len(user_ids) - j)), len(product_ids))
+                    picked = self._pick_products(product_ids, popularity, quota, user_id, existing)
+                    for product_id in picked:
+                        yield Review(user_id=user_id, product_id=product_id, **fake_review(self.rng, self.now, self.days))
+                    made += len(picked)
+                    if made >= need:
+                        return
+
+        with self.phase("reviews") as counter, backdating(Review):
+            self._insert(Review, reviews(), counter)
+        if counter["rows"] < need:
+            self.out(f"  reviews: {need - counter['rows']:,} short (every user has reviewed every product they could)")
+
+    def _pick_products(self, product_ids, popularity, quota, user_id, existing):
+        if quota <= 0:
+            return []
+        if quota * 2 > len(product_ids):
+            pool = [p for p in product_ids if (user_id, p) not in existing]
+            return self.rng.sample(pool, min(quota, len(pool)))
+        picked = {}
+        for _ in range(8):  # weighted draws repeat; a few rounds fill the quota
+            for p in self.rng.choices(product_ids, weights=popularity, k=quota - len(picked)):
+                if (user_id, p) not in existing:
+                    picked[p] = None
+            if len(picked) >= quota:
+                break
+        return list(picked)[:quota]
+
+    def _sample_reviews(self, count):
+        """About `count` random (review id, author id) pairs, a batch at a time"""
+        bounds = Review.objects.aggregate(lo=Min("id"), hi=Max("id"))
+        if bounds["lo"] is None:
+            return
+        while count > 0:
+            ids = {self.rng.randint(bounds["lo"], bounds["hi"]) for _ in range(min(count, self.batch_size))}
+            rows = list(Review.objects.filter(pk__in=ids).values_list("id", "user_id"))
+            yield rows
+            count -= len(rows) or 1
+
+    def seed_votes(self, target):
+        need = target - ReviewHelpfulness.objects.count()
+        if need <= 0:
+            return
+        user_ids = list(get_user_model().objects.values_list("id", flat=True))
+
+        def vote_rows():
+            for rows in self._sample_reviews(need):
+                for review_id, author_id in rows:
+                    voter = self.rng.choice(user_ids)
+                    if voter != author_id:
+                        yield ReviewHelpfulness(review_id=review_id, user_id=voter, is_helpful=self.rng.random() < 0.75)
+
+        with self.phase("votes") as counter:
+            # (review, user) is unique: a repeated random pair is simply skipped
+            self._insert(ReviewHelpfulness, vote_rows(), counter, ignore_conflicts=True)
+
+    def seed_media(self, target):
+        need = target - ReviewMedia.objects.count()
+        if need <= 0:
+            return
+        name, thumbnail, checksum = self._sample_photo()
+
+        def media_rows():
+            for rows in self._sample_reviews(need):
+                for review_id, _ in rows:
+                    yield ReviewMedia(review_id=review_id, file=name, thumbnail=thumbnail, kind=ReviewMedia.PHOTO,
+                                      status=ReviewMedia.READY, checksum=checksum)
+
+        with self.phase("media") as counter:
+            self._insert(ReviewMedia, islice(media_rows(), need), counter)
+
+    def _sample_photo(self):
+        """One stored photo every seeded ReviewMedia row points at (as deduped uploads would)"""
+        name, thumb = "review_media/seed-sample.jpg", "review_media/thumbs/seed-sample.webp"
+        if not default_storage.exists(name):
+            image = Image.new("RGB", (800, 600), (232, 180, 188))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=80)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+            default_storage.save(thumb, ContentFile(thumbnail_bytes(image)))
+        return name, thumb, file_checksum(ReviewMedia(file=name).file)
+
+    def refresh_derived(self, with_search=True):
+        """Rebuild what the review/product signals would have maintained"""
+        steps = [
+            ("image assets", lambda: assets.link_products()[0]),
+            ("rating summaries", lambda: len(ratings.rebuild_rating_summaries())),
+            ("vote totals", votes.rebuild_vote_totals),
+            ("trending buckets", trending.rebuild_buckets),
+            ("trending scores", trending.compute_scores),
+        ]
+        if with_search:
+            steps.append(("search index", lambda: sum(search.rebuild())))
+        steps.append(("site stats", lambda: len(stats.reconcile())))
+        for label, step in steps:
+            with self.phase(label) as counter:
+                counter["rows"] = step()
+        caching.invalidate_all()  # bulk writes skipped the signals that bump page caches
+
+    def run(self, users=0, products=0, reviews=0, votes=0, media=0, refresh=True, with_search=True):
+        started = time.perf_counter()
+        self.seed_users(users)
+        self.seed_products(products)
+        self.seed_reviews(reviews)
+        self.seed_votes(votes)
+        self.seed_media(media)
+        if refresh:
+            self.refresh_derived(with_search=with_search)
+        self.out(f"  total: {time.perf_counter() - started:.1f}s")
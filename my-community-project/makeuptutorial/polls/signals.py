@@ -0,0 +1,122 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, ratings, search, stats, trending, uploads
+from .models import Product, Review, ReviewHelpfulness, ReviewMedia
+
+
+def _loaded(review, field):
+    """Value of `field` as last read from / written to the database, if known"""
+    return getattr(review, "_loaded_values", {}).get(field)
+
+
+def _apply_rating_change(review, product_id, old=None, new=None):
+    ratings.apply_rating_change(product_id, old=old, new=new)
+    trending.record_rating_change(product_id, review.created_at, old=old, new=new)
+
+
+def _after_commit(func, *args):
+    # cache counters must not move for writes that get rolled back
+    transaction.on_commit(partial(func, *args))
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        _apply_rating_change(instance, instance.product_id, new=instance.rating)
+        _after_commit(stats.adjust, "reviews", 1)
+        if instance.receipt:
+            uploads.enqueue_receipt(instance)
+    elif update_fields is None or {"rating", "product", "product_id"} & set(update_fields):
+        old_product, old_rating = _loaded(instance, "product_id"), _loaded(instance, "rating")
+        if old_product is None or old_rating is None:
+            # loaded with rating deferred (or never loaded): recount from the table
+            ratings.rebuild_rating_summaries([instance.product_id])
+        elif old_product != instance.product_id:
+            _apply_rating_change(instance, old_product, old=old_rating)
+            _apply_rating_change(instance, instance.product_id, new=instance.rating)
+        else:
+            _apply_rating_change(instance, instance.product_id, old=old_rating, new=instance.rating)
+        if old_product not in (None, instance.product_id):
+            _after_commit(caching.reviews_changed, old_product)
+    _after_commit(caching.reviews_changed, instance.product_id)
+    if created or update_fields is None or {"title", "body"} & set(update_fields):
+        search.index_reviews([instance])
+    instance._loaded_values = {
+        **getattr(instance, "_loaded_values", {}),
+        "product_id": instance.product_id,
+        "rating": instance.rating,
+    }
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    rating = _loaded(instance, "rating")
+    _apply_rating_change(
+        instance,
+        _loaded(instance, "product_id") or instance.product_id,
+        old=rating if rating is not None else instance.rating,
+    )
+    search.remove_review(instance.pk)
+    _after_commit(caching.reviews_changed, instance.product_id)
+    _after_commit(stats.adjust, "reviews", -1)
+
+
+@receiver(post_save, sender=ReviewMedia)
+def review_media_saved(sender, instance, created, raw=False, **kwargs):
+    # the job row commits (or rolls back) together with the upload
+    if created and not raw and instance.status == ReviewMedia.PROCESSING:
+        uploads.enqueue_media(instance)
+    if not raw:
+        _after_commit(caching.review_changed, instance.review_id)
+
+
+@receiver(post_delete, sender=ReviewMedia)
+def review_media_deleted(sender, instance, **kwargs):
+    _after_commit(caching.review_changed, instance.review_id)
+
+
+@receiver(post_save, sender=ReviewHelpfulness)
+def vote_saved(sender, instance, raw=False, **kwargs):
+    # flips done by votes.cast_vote are plain UPDATEs and bump there
+    if not raw:
+        _after_commit(caching.review_changed, instance.review_id)
+
+
+@receiver(post_delete, sender=ReviewHelpfulness)
+def vote_deleted(sender, instance, **kwargs):
+    _after_commit(caching.review_changed, instance.review_id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_products([instance])
+    if created:
+        _after_commit(stats.adjust, "products", 1)
+    _after_commit(caching.product_changed, instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+    _after_commit(stats.adjust, "products", -1)
+    _after_commit(caching.product_changed, instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _after_commit(stats.adjust, "users", 1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    _after_commit(stats.adjust, "users", -1)
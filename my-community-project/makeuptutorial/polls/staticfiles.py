@@ -0,0 +1,59 @@
+"""
+Production static files storage (STORAGES["staticfiles"] when DEBUG is off).
+
+`collectstatic` copies everything into STATIC_ROOT with CSS minified on
+the way in, then WhiteNoise's CompressedManifestStaticFilesStorage adds a
+content hash to every name (rewriting url() references in the CSS), writes
+staticfiles.json, and stores .br/.gz copies of the compressible files.
+WhiteNoiseMiddleware serves the hashed names with a far-future
+`Cache-Control: max-age=315360000, public, immutable` and picks the .br or
+.gz copy from Accept-Encoding.
+
+Templates get hashed URLs from {% static %} and Product.image_src (the
+product images' canonical names, see polls/assets.py, are hashed already).
+"""
+import re
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets
+
+# quoted strings (kept as they are) and comments (dropped, except /*! ... */ licences)
+_CSS_SKIP = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*(?!!).*?\*/)""", re.S)
+
+
+def _squeeze(css):
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r" ?([{};,>]) ?", r"\1", css)
+    # after a colon only: " :hover" in a selector is not ":hover"
+    return css.replace(": ", ":").replace(";}", "}")
+
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS doesn't need; strings and url()s are kept"""
+    parts, text, position = [], [], 0
+    for match in _CSS_SKIP.finditer(css):
+        text.append(css[position:match.start()])
+        if match.group(1):
+            parts += [_squeeze(" ".join(text)), match.group(1)]
+            text = []
+        position = match.end()
+    text.append(css[position:])
+    parts.append(_squeeze(" ".join(text)))
+    return "".join(parts).strip()
+
+
+class MinifiedCompressedManifestStorage(CompressedManifestStaticFilesStorage):
+    def hashed_name(self, name, content=None, filename=None):
+        # registry assets carry their content hash already
+        if name.startswith(assets.PREFIX):
+            return name
+        return super().hashed_name(name, content, filename)
+
+    def _save(self, name, content):
+        # both the plain and the hashed copy are written through here
+        if name.endswith(".css"):
+            content.seek(0)
+            content = ContentFile(minify_css(content.read().decode("utf-8")).encode("utf-8"))
+        return super()._save(name, content)
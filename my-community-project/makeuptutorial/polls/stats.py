@@ -0,0 +1,53 @@
+"""
+Site-wide KPI counters (products, reviews, users, active reviewers).
+
+Counts live in Django's cache (see CACHES in settings), without a timeout,
+so pages never run COUNT(*) on the big tables. A missing counter is counted
+once on the next read; after that signals nudge products, reviews and users
+on create/delete without querying. Active reviewers would need a query per
+write to follow, so they move only when `manage.py reconcile_site_stats`
+recounts everything (run it periodically, e.g. every 10 minutes).
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import Product, Review
+
+KEY_PREFIX = "site-stats:"
+
+COUNTERS = {
+    "products": lambda: Product.objects.count(),
+    "reviews": lambda: Review.objects.count(),
+    "users": lambda: get_user_model().objects.count(),
+    "active_reviewers": lambda: Review.objects.values("user_id").distinct().count(),
+}
+
+
+def get_site_stats(*names):
+    """Current counters as a dict (all of them unless names are given)"""
+    names = names or tuple(COUNTERS)
+    cached = cache.get_many([KEY_PREFIX + n for n in names])
+    stats = {n: cached.get(KEY_PREFIX + n) for n in names}
+    missing = {n: COUNTERS[n]() for n, value in stats.items() if value is None}
+    if missing:
+        cache.set_many({KEY_PREFIX + n: v for n, v in missing.items()}, None)
+        stats.update(missing)
+    return stats
+
+
+def reconcile():
+    """Recount every counter and overwrite the cache"""
+    stats = {n: count() for n, count in COUNTERS.items()}
+    cache.set_many({KEY_PREFIX + n: v for n, v in stats.items()}, None)
+    return stats
+
+
+def adjust(name, delta):
+    """Nudge one counter; a missing key is left for the next read to count"""
+    key = KEY_PREFIX + name
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        return
+    # the generic incr (file backend) stores the sum with the default timeout
+    cache.touch(key, None)
@@ -0,0 +1,14 @@
+from django import template
+
+from polls import caching
+
+register = template.Library()
+
+
+@register.filter
+def cache_version(obj):
+    """
+    Version token for {% cache %} keys of fragments showing a product or one
+    of its reviews, e.g. {% cache 86400 product-card p.pk p|cache_version %}.
+    """
+    return caching.fragment_version(obj)
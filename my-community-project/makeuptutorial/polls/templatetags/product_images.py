@@ -0,0 +1,46 @@
+from django import template
+from django.forms.utils import flatatt
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from polls import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_picture(product, preset="card", **attrs):
+    """
+    <picture> for a product image: AVIF/WebP <source>s with a srcset per
+    density and the original as the <img> fallback. Extra keyword arguments
+    become <img> attributes, e.g. {% product_picture p "detail" loading="eager" %}.
+    """
+    attrs = {"alt": f"{product.brand} {product.name}", "loading": "lazy", "decoding": "async", **attrs}
+    variants = images.current_variants(product)
+
+    if variants:
+        sources = [
+            (fmt, [(images.default_storage.url(name), w) for w, name in variants[preset][fmt]])
+            for fmt in variants.get(preset, {})
+        ]
+        # intrinsic size of the 1x variant, so the browser can reserve the box
+        width = min(images.PRESETS[preset][0], variants["width"])
+        attrs.setdefault("width", width)
+        attrs.setdefault("height", round(variants["height"] * width / variants["width"]))
+    elif images.lazy_enabled() and product.has_image:
+        sources = [
+            (fmt, [(reverse("product-image", args=[product.pk, preset, w, fmt]), w)
+                   for w in images.planned_widths(preset)])
+            for fmt in images.enabled_formats()
+        ]
+    else:
+        sources = []
+
+    source_tags = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (images.FORMATS[fmt][0], ", ".join(f"{url} {w}w" for url, w in candidates), images.PRESETS[preset][1])
+            for fmt, candidates in sources if candidates
+        ),
+    )
+    return format_html('<picture>{}<img src="{}"{}></picture>', source_tags, product.image_src, flatatt(attrs))
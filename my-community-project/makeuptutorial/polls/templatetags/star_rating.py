@@ -0,0 +1,42 @@
+import math
+
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+STAR_PATH = "M12 2l3.1 6.3 6.9 1-5 4.9 1.2 6.8L12 17.8 5.8 21l1.2-6.8-5-4.9 6.9-1z"
+MAX_STARS = 5
+
+
+def _star(style, filled):
+    if style == "svg":
+        return (f'<svg viewBox="0 0 24 24" class="star{" filled" if filled else ""}">'
+                f'<path d="{STAR_PATH}"/></svg>')
+    return f'<span class="star-rating {"filled" if filled else "empty"}">★</span>'
+
+
+# the markup of every possible rating, built once: {style: [0 filled, 1 filled, ... 5 filled]}
+STARS = {
+    style: [mark_safe("".join(_star(style, i < filled) for i in range(MAX_STARS))) for filled in range(MAX_STARS + 1)]
+    for style in ("text", "svg")
+}
+
+
+def filled_stars(value):
+    """Whole stars earned by a rating or an average (4.6 -> 4); none for no rating"""
+    if value is None or value == "":
+        return 0
+    try:
+        return max(0, min(MAX_STARS, math.floor(float(value))))
+    except (TypeError, ValueError):
+        return 0
+
+
+@register.simple_tag
+def star_rating(value, style="text"):
+    """
+    Five stars for a rating, e.g. {% star_rating r.rating %}, or
+    {% star_rating p.rating_avg "svg" %} for the product cards' SVG stars
+    """
+    return STARS[style][filled_stars(value)]
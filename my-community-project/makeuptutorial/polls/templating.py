@@ -0,0 +1,129 @@
+"""
+Template loading and render profiling.
+
+`preload()` compiles every template of the project's apps into the cached
+loader (PollsConfig.ready calls it when TEMPLATE_PRELOAD is on).
+
+`profile()` attributes render time to templates, {% block %}s and
+{% include %}s, e.g. (or use `manage.py profile_templates PATH`):
+
+    with templating.profile() as report:
+        client.get("/products/")
+    for row in report.rows():
+        ...
+
+Each entry has its calls, total time (including what it renders inside)
+and self time (excluding it). The timers are installed on first use and
+cost one context variable lookup per node when no profile is running.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.apps import apps
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import Template
+from django.template.loader_tags import BlockNode, IncludeNode
+
+_profile = ContextVar("template_profile", default=None)
+_installed = False
+
+
+def preload():
+    """Compile every app template with each Django template engine; returns how many"""
+    names = set()
+    for config in apps.get_app_configs():
+        root = Path(config.path) / "templates"
+        names.update(path.relative_to(root).as_posix() for path in root.rglob("*.html"))
+    loaded = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in sorted(names):
+            engine.get_template(name)
+            loaded += 1
+    return loaded
+
+
+class Entry:
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.total = 0.0  # seconds
+        self.self_time = 0.0
+
+
+class RenderProfile:
+    def __init__(self):
+        self.entries = {}  # (kind, name) -> Entry
+        self.stack = []  # children time of each open entry
+
+    @contextmanager
+    def measure(self, kind, name):
+        entry = self.entries.get((kind, name))
+        if entry is None:
+            entry = self.entries[kind, name] = Entry(kind, name)
+        self.stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            entry.calls += 1
+            entry.total += elapsed
+            entry.self_time += elapsed - children
+
+    def rows(self):
+        """Entries, most self time first"""
+        return sorted(self.entries.values(), key=lambda e: (-e.self_time, e.kind, e.name))
+
+
+def _template_name(template):
+    return template.origin.template_name or template.name or "<string>"
+
+
+def _node_template(node):
+    origin = getattr(node, "origin", None)
+    return origin.template_name if origin is not None and origin.template_name else "<string>"
+
+
+def _timed(method, kind, name_of):
+    @functools.wraps(method)
+    def wrapper(self, context):
+        profile = _profile.get()
+        if profile is None:
+            return method(self, context)
+        with profile.measure(kind, name_of(self)):
+            return method(self, context)
+    return wrapper
+
+
+def _install():
+    global _installed
+    if _installed:
+        return
+    # Template._render also runs for {% extends %} parents, which skip Template.render
+    Template._render = _timed(Template._render, "template", _template_name)
+    BlockNode.render = _timed(BlockNode.render, "block", lambda node: f"{_node_template(node)}: {node.name}")
+    IncludeNode.render = _timed(IncludeNode.render, "include",
+                                lambda node: f"{_node_template(node)}: {node.template.token}")
+    _installed = True
+
+
+@contextmanager
+def profile():
+    """Profile the template renders of this context (thread or task) while the block runs"""
+    _install()
+    report = RenderProfile()
+    token = _profile.set(report)
+    try:
+        yield report
+    finally:
+        _profile.reset(token)
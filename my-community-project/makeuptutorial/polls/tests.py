@@ -1,3 +1,1592 @@
-from django.test import TestCase
+import asyncio
+import csv
+import filecmp
+import io
+import json
+import os
+import random
+import re
+import runpy
+import shutil
+import tempfile
+import time
+import unicodedata
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import quote, unquote
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import (assets, async_views, benchmark, caching, catalog, fixturegen, images, jobs, loadtest, metrics, ratings, routers,
+               search, stats, templating, trending, votes)
+from .models import (ImageAsset, Job, Product, ProductDailyStats, Review, ReviewHelpfulness, ReviewMedia,
+                     TrendingScore, static_image_exists)
+from .pagination import decode_cursor, encode_cursor
+from .seeding import PRODUCTS, BulkSeeder
+from .staticfiles import minify_css
+from . import urls as polls_urls
+from .views import ProductBrowse, ProductDetail, ReviewListView, UserProfileView, review_feed_page
+
+
+class ListingIndexTests(TestCase):
+    """EXPLAIN every listing query against a seeded catalog and require an index"""
+
+    PRODUCTS = 300
+    USERS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        now = timezone.now()
+        categories = [c for c, _ in Product.CATEGORY_CHOICES]
+        User = get_user_model()
+        User.objects.bulk_create(User(username=f"load{i}") for i in range(cls.USERS))
+        users = list(User.objects.all())
+        Product.objects.bulk_create(
+            Product(brand=f"Brand {i % 25}", name=f"Product {i}", category=categories[i % len(categories)],
+                    price=rng.randint(5, 80), image_url="/static/x.jpg", has_image=i % 10 != 0,
+                    rating_avg=rng.uniform(1, 5), rating_count=cls.USERS)
+            for i in range(cls.PRODUCTS)
+        )
+        products = list(Product.objects.all())
+        Review.objects.bulk_create(
+            Review(user=u, product=p, title="t", body="b", rating=rng.randint(1, 5),
+                   is_verified_purchase=rng.random() < 0.3, helpful_votes=rng.randint(0, 50),
+                   skin_type=rng.choice(["oily", "dry", "combination", "sensitive", "normal"]))
+            for p in products for u in users
+        )
+        # spread creation dates over a year (auto_now_add ignores the constructor)
+        reviews = list(Review.objects.only("id"))
+        for review in reviews:
+            review.created_at = now - timedelta(days=rng.uniform(0, 365))
+        Review.objects.bulk_update(reviews, ["created_at"], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.product = products[len(products) // 2]
+        cls.user = users[0]
+
+    def assertUsesIndex(self, qs):
+        plan = qs.explain()
+        if connection.vendor == "sqlite":
+            uses_index = "USING INDEX" in plan or "USING COVERING INDEX" in plan
+        else:
+            uses_index = "Index Scan" in plan or "Index Only Scan" in plan
+        self.assertTrue(uses_index, f"no index used for:\n{qs.query}\n{plan}")
+
+    def view_queryset(self, view_class, path, user=None, **kwargs):
+        request = RequestFactory().get(path)
+        request.user = user
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view.get_queryset()
+
+    def test_review_list_filters(self):
+        for params in ["", "?rating=4", "?verified=true", "?skin_type=oily",
+                       "?sort=most_helpful", "?sort=oldest", "?rating=5&sort=newest"]:
+            with self.subTest(params=params):
+                self.assertUsesIndex(self.view_queryset(ReviewListView, f"/x/{params}", product_id=self.product.pk))
+
+    def test_review_feed(self):
+        reviews = self.product.reviews.order_by("-created_at", "-id")
+        self.assertUsesIndex(reviews[:11])
+        page, cursor = review_feed_page(self.product, size=10)
+        self.assertEqual(len(page), 10)
+
+    def test_user_profile(self):
+        self.assertUsesIndex(self.view_queryset(UserProfileView, "/profile/", user=self.user))
+
+    def test_recent_reviews(self):
+        self.assertUsesIndex(Review.objects.filter(created_at__gte=timezone.now() - timedelta(days=7)))
+
+    def test_product_browse(self):
+        for params in ["?category=lipstick", "?category=mascara&sort=price_asc", "?min=70&sort=price_asc"]:
+            with self.subTest(params=params):
+                self.assertUsesIndex(self.view_queryset(ProductBrowse, f"/products/{params}"))
+
+
+class ImageFilterTests(TestCase):
+    """Listings drop products without a shipped image in SQL and page with LIMIT/OFFSET"""
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create(
+            Product(brand="B", name=f"Product {i}", category="blush", has_image=i % 3 != 0, rating_avg=i % 5)
+            for i in range(30)
+        )
+        ProductDailyStats.objects.bulk_create(
+            ProductDailyStats(product=p, day=timezone.localdate(), review_count=i + 1, rating_sum=4 * (i + 1))
+            for i, p in enumerate(products)
+        )
+        cls.shown = {p.pk for p in products if p.has_image}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def walk(self, url):
+        """Ids on every page of a listing, and the SQL each page ran"""
+        ids, page_sql = [], []
+        for page in (1, 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"page": page})
+            self.assertEqual(response.status_code, 200)
+            ids += [product.pk for product in response.context["page_obj"]]
+            page_sql.append("\n".join(q["sql"] for q in queries))
+        return ids, page_sql
+
+    def test_listings(self):
+        for name in ("products", "trends"):
+            with self.subTest(name):
+                ids, page_sql = self.walk(reverse(name))
+                self.assertEqual(len(ids), len(self.shown))  # pages of 12 and 8
+                self.assertEqual(set(ids), self.shown)
+                for sql in page_sql:
+                    self.assertRegex(sql, r'WHERE [^\n]*"polls_product"\."has_image"')
+                self.assertRegex(page_sql[1], r'FROM "polls_product"[^\n]* LIMIT \d+ OFFSET 12')
+
+    def test_query_count_is_flat(self):
+        # hiding imageless products is a WHERE clause, not a per-product check
+        for name in ("products", "trends"):
+            with self.subTest(name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as first:
+                    self.client.get(reverse(name))
+                Product.objects.bulk_create(
+                    Product(brand="C", name=f"{name} {i}", category="blush", has_image=i % 2 == 0) for i in range(10)
+                )
+                cache.clear()
+                with self.assertNumQueries(len(first)):
+                    self.client.get(reverse(name))
+
+
+class ReviewFeedTests(TestCase):
+    """The "load more" review feed: walking the cursor returns every review once, ties included"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        users = User.objects.bulk_create(User(username=f"feed{i}") for i in range(6))
+        cls.product = Product.objects.create(brand="B", name="Feed", category="blush", price=10)
+        reviews = Review.objects.bulk_create(
+            Review(user=u, product=cls.product, title="t", body="b", rating=4) for u in users
+        )
+        # three share a timestamp, the rest are less than a millisecond apart
+        moment = timezone.now().replace(microsecond=500000)
+        for review, offset in zip(reviews, [0, 0, 0, 1, 250, 999]):
+            review.created_at = moment + timedelta(microseconds=offset)
+        Review.objects.bulk_update(reviews, ["created_at"])
+
+    @mock.patch.object(ProductDetail, "review_page_size", 1)
+    def test_pages_cover_each_review_once(self):
+        url = reverse("product-review-feed", args=[self.product.pk])
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {"after": cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["reviews"]), 1)
+            seen += [review.pk for review in response.context["reviews"]]
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+        expected = self.product.reviews.order_by("-created_at", "-id").values_list("pk", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_cursor_keeps_microseconds(self):
+        moment = timezone.now().replace(microsecond=123456)
+        token = encode_cursor([moment, 7])
+        self.assertEqual(decode_cursor(token, Review, ["-created_at", "-id"]), [moment, 7])
+
+
+class HelpfulVoteTests(TestCase):
+    """Vote totals move by deltas and stay equal to the vote rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author, cls.voter = User.objects.create(username="author"), User.objects.create(username="voter")
+        product = Product.objects.create(brand="B", name="P", category="lipstick", price=10)
+        cls.review = Review.objects.create(user=cls.author, product=product, title="t", body="b", rating=4)
+
+    def vote(self, is_helpful, **headers):
+        self.client.force_login(self.voter)
+        return self.client.post(reverse("review-helpful", args=[self.review.pk]),
+                                {"is_helpful": "true" if is_helpful else "false"}, **headers)
+
+    def assertTotals(self, helpful, not_helpful):
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.helpful_votes, self.review.not_helpful_votes), (helpful, not_helpful))
+        votes = self.review.helpfulness_votes
+        self.assertEqual(votes.filter(is_helpful=True).count(), helpful)
+        self.assertEqual(votes.filter(is_helpful=False).count(), not_helpful)
+
+    def test_vote_repeat_and_flip(self):
+        self.assertEqual(self.vote(True).status_code, 302)
+        self.assertTotals(1, 0)
+        self.vote(True)
+        self.assertTotals(1, 0)
+        self.vote(False)
+        self.assertTotals(0, 1)
+        self.assertEqual(ReviewHelpfulness.objects.count(), 1)
+
+    def test_ajax_vote_returns_totals(self):
+        response = self.vote(False, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(response.json(), {"helpful_votes": 0, "not_helpful_votes": 1, "helpful_percentage": 0.0})
+        response = self.vote(True, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json()["helpful_percentage"], 100.0)
+
+
+class RatingSummaryTests(TestCase):
+    """Product rating summary kept by the review signals, and its rebuild command"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.ann, cls.bob = User.objects.create(username="ann"), User.objects.create(username="bob")
+        cls.product = Product.objects.create(brand="B", name="Rated", category="blush")
+        cls.other = Product.objects.create(brand="B", name="Other", category="blush")
+
+    def assertSummary(self, product, count, total, histogram):
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual((product.rating_count, product.rating_sum), (count, total))
+        self.assertAlmostEqual(product.rating_avg, total / count if count else 0)
+        self.assertEqual([getattr(product, f"rating_{star}_count") for star in ratings.STARS], histogram)
+
+    def review(self, user, rating, product=None):
+        return Review.objects.create(user=user, product=product or self.product, title="t", body="b", rating=rating)
+
+    def test_create_edit_and_delete(self):
+        first = self.review(self.ann, 5)
+        self.assertSummary(self.product, 1, 5, [0, 0, 0, 0, 1])
+        second = self.review(self.bob, 2)
+        self.assertSummary(self.product, 2, 7, [0, 1, 0, 0, 1])
+
+        first.rating = 3
+        first.save()
+        self.assertSummary(self.product, 2, 5, [0, 1, 1, 0, 0])
+        # saves that don't touch the rating leave the summary alone
+        first.title = "Changed my mind"
+        first.save(update_fields=["title"])
+        self.assertSummary(self.product, 2, 5, [0, 1, 1, 0, 0])
+
+        second.product = self.other
+        second.save()
+        self.assertSummary(self.product, 1, 3, [0, 0, 1, 0, 0])
+        self.assertSummary(self.other, 1, 2, [0, 1, 0, 0, 0])
+
+        first.delete()
+        self.assertSummary(self.product, 0, 0, [0, 0, 0, 0, 0])
+
+    def test_edit_of_a_deferred_rating_recounts(self):
+        self.review(self.ann, 4)
+        review = Review.objects.defer("rating").get()
+        review.rating = 1
+        review.save()
+        self.assertSummary(self.product, 1, 1, [1, 0, 0, 0, 0])
+
+    def test_rebuild_finds_and_fixes_drift(self):
+        self.review(self.ann, 4)
+        self.review(self.bob, 2)
+        self.assertEqual(ratings.rebuild_rating_summaries(), [])
+        Product.objects.filter(pk=self.product.pk).update(rating_count=7, rating_4_count=0)
+        Product.objects.filter(pk=self.other.pk).update(rating_sum=3)
+
+        with self.assertRaisesMessage(CommandError, "2 product rating summaries are out of date"):
+            call_command("rebuild_ratings", "--verify", stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(pk=self.product.pk).rating_count, 7)  # --verify writes nothing
+
+        out = io.StringIO()
+        call_command("rebuild_ratings", stdout=out)
+        self.assertIn("Rebuilt 2 product rating summaries", out.getvalue())
+        self.assertSummary(self.product, 2, 6, [0, 1, 0, 1, 0])
+        self.assertSummary(self.other, 0, 0, [0, 0, 0, 0, 0])
+        call_command("rebuild_ratings", "--verify", stdout=io.StringIO())
+
+
+class TrendingTests(TestCase):
+    """Daily review buckets, window scoring, the stored top-N lists and their live fallback"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.busy, cls.steady, cls.old = Product.objects.bulk_create([
+            Product(brand="B", name="Busy", category="lipstick", has_image=True, rating_avg=3),
+            Product(brand="B", name="Steady", category="blush", has_image=True, rating_avg=4),
+            Product(brand="B", name="Old", category="blush", has_image=True, rating_avg=5),
+        ])
+        hidden = Product.objects.create(brand="B", name="No image", category="blush")
+        ProductDailyStats.objects.bulk_create([
+            ProductDailyStats(product=cls.busy, day=cls.today, review_count=6, rating_sum=24),
+            ProductDailyStats(product=cls.steady, day=cls.today - timedelta(days=3), review_count=2, rating_sum=10),
+            ProductDailyStats(product=cls.steady, day=cls.today - timedelta(days=20), review_count=3, rating_sum=12),
+            ProductDailyStats(product=cls.old, day=cls.today - timedelta(days=45), review_count=9, rating_sum=45),
+            ProductDailyStats(product=hidden, day=cls.today, review_count=50, rating_sum=250),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_snap_window(self):
+        for days, window in [(1, 7), (10, 7), (11, 14), (30, 30), (45, 30), (50, 60), (1000, 60)]:
+            with self.subTest(days=days):
+                self.assertEqual(trending.snap_window(days), window)
+
+    def test_bump_bucket(self):
+        product = self.busy
+        day = self.today - timedelta(days=1)
+        trending.bump_bucket(product.pk, day, count_delta=-1, sum_delta=-4)  # nothing to take from
+        self.assertFalse(ProductDailyStats.objects.filter(product=product, day=day).exists())
+        trending.bump_bucket(product.pk, day, count_delta=1, sum_delta=4)
+        trending.bump_bucket(product.pk, day, count_delta=1, sum_delta=2)
+        trending.bump_bucket(product.pk, day, sum_delta=-1)  # a review edited from 3 to 2 stars
+        bucket = ProductDailyStats.objects.get(product=product, day=day)
+        self.assertEqual((bucket.review_count, bucket.rating_sum), (2, 5))
+
+    def test_review_writes_feed_the_bucket(self):
+        user = get_user_model().objects.create(username="trendy")
+        review = Review.objects.create(user=user, product=self.busy, title="t", body="b", rating=4)
+        review.rating = 2
+        review.save()
+        bucket = ProductDailyStats.objects.get(product=self.busy, day=timezone.localdate(review.created_at))
+        self.assertEqual((bucket.review_count, bucket.rating_sum), (7, 26))
+        review.delete()
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.review_count, bucket.rating_sum), (6, 24))
+
+    def test_compute_window(self):
+        week = trending.compute_window(7)
+        self.assertEqual([r["product_id"] for r in week], [self.busy.pk, self.steady.pk])
+        self.assertEqual((week[1]["recent_reviews"], week[1]["recent_avg"]), (2, 5.0))
+        self.assertAlmostEqual(week[1]["score"], trending.trending_score(2, 5.0, 4))
+        month = trending.compute_window(30)
+        self.assertEqual([r["recent_reviews"] for r in month], [6, 5])
+        self.assertEqual([r["product_id"] for r in trending.compute_window(60)],
+                         [self.old.pk, self.busy.pk, self.steady.pk])
+
+    @override_settings(TRENDING_TOP_N=1)
+    def test_compute_scores_ranks_each_category(self):
+        self.assertEqual(trending.compute_scores(windows=[60]), 3)  # all, lipstick, blush
+        stored = {(row.category, row.rank): row.product_id for row in TrendingScore.objects.filter(window_days=60)}
+        self.assertEqual(stored, {("", 1): self.old.pk, ("lipstick", 1): self.busy.pk, ("blush", 1): self.old.pk})
+        self.assertEqual(list(trending.trending_products(60, "blush")), [self.old])
+
+    def test_live_ranking_until_scores_are_stored(self):
+        live = trending.trending_products(30, "blush")
+        self.assertEqual([(p.pk, p.rank, p.recent_reviews) for p in live], [(self.steady.pk, 1, 5)])
+        self.assertEqual([p.pk for p in trending.trending_products(30)], [self.busy.pk, self.steady.pk])
+
+        trending.compute_scores(windows=[30])
+        ProductDailyStats.objects.filter(product=self.old).update(day=self.today)
+        # stored now: later activity waits for the next compute_trending
+        self.assertEqual([p.pk for p in trending.trending_products(30)], [self.busy.pk, self.steady.pk])
+        self.assertAlmostEqual(trending.trending_products(30)[0].trending_score, trending.trending_score(6, 4.0, 3))
+
+    def test_trends_page_before_compute_trending(self):
+        response = self.client.get(reverse("trends"), {"days": 7})
+        self.assertEqual([p.pk for p in response.context["object_list"]], [self.busy.pk, self.steady.pk])
+
+
+class SiteStatsTests(TestCase):
+    """Cached KPI counters: signal nudges on commit, counted once on a miss, reconcile"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create(username="counted")
+        self.product = Product.objects.create(brand="B", name="Counted", category="blush")
+
+    def test_missing_counters_are_recounted_and_cached(self):
+        with self.assertNumQueries(4):
+            self.assertEqual(stats.get_site_stats(),
+                             {"products": 1, "reviews": 0, "users": 1, "active_reviewers": 0})
+        with self.assertNumQueries(0):
+            stats.get_site_stats("products", "users")
+        cache.delete(stats.KEY_PREFIX + "users")
+        with self.assertNumQueries(1):
+            self.assertEqual(stats.get_site_stats("products", "users"), {"products": 1, "users": 1})
+
+    def test_signals_adjust_counters_after_commit(self):
+        stats.get_site_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Product.objects.create(brand="B", name="Other", category="blush")
+            review = Review.objects.create(user=self.user, product=self.product, title="t", body="b", rating=4)
+            Review.objects.create(user=self.user, product=other, title="t", body="b", rating=4)
+            get_user_model().objects.create(username="newcomer")
+            # nothing moves before the commit
+            self.assertEqual(stats.get_site_stats("products")["products"], 1)
+        # active reviewers would take a query per write: they wait for reconcile
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.get_site_stats(),
+                             {"products": 2, "reviews": 2, "users": 2, "active_reviewers": 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+            other.delete()  # cascades to its review
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.get_site_stats(),
+                             {"products": 1, "reviews": 0, "users": 2, "active_reviewers": 0})
+
+    def test_adjust_leaves_a_missing_counter_for_the_next_read(self):
+        stats.adjust("products", 5)
+        self.assertIsNone(cache.get(stats.KEY_PREFIX + "products"))
+        self.assertEqual(stats.get_site_stats("products"), {"products": 1})
+
+    def test_counters_do_not_expire(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        file_cache = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                  "LOCATION": location, "TIMEOUT": 60}}
+        with override_settings(CACHES=file_cache):
+            stats.get_site_stats("products")
+            stats.adjust("products", 2)  # the file backend's incr re-sets the key
+            later = time.time() + 365 * 24 * 60 * 60
+            with mock.patch("django.core.cache.backends.filebased.time.time", return_value=later):
+                with self.assertNumQueries(0):
+                    self.assertEqual(stats.get_site_stats("products"), {"products": 3})
+
+    def test_reconcile_fixes_drift(self):
+        stats.get_site_stats()
+        cache.set(stats.KEY_PREFIX + "products", 40)
+        stats.adjust("reviews", 3)
+        out = io.StringIO()
+        call_command("reconcile_site_stats", stdout=out)
+        self.assertIn("products: 1", out.getvalue())
+        self.assertEqual(stats.get_site_stats(),
+                         {"products": 1, "reviews": 0, "users": 1, "active_reviewers": 0})
+
+
+@skipUnless(search.backend_name(connection) != "like", "needs SQLite FTS5 or Postgres")
+class SearchTests(TestCase):
+    """Full-text product search: ranking, folding, typo expansion, filters, index upkeep"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(username="searcher")
+        cls.loreal = Product.objects.create(brand="L'Oréal", name="Lash Paradise Mascara", category="mascara", price=12)
+        cls.maybelline = Product.objects.create(brand="Maybelline", name="Sky High Mascara", category="mascara",
+                                                price=30)
+        cls.described = Product.objects.create(brand="Milani", name="Baked Blush", category="blush", price=9,
+                                               description="Pairs well with any mascara")
+        Review.objects.create(user=cls.user, product=cls.described, title="Velvet", body="Silky velvet finish",
+                              rating=5)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_name_matches_rank_above_description_matches(self):
+        matches = search.search_products("mascara")
+        self.assertEqual(set(matches), {self.loreal.pk, self.maybelline.pk, self.described.pk})
+        self.assertEqual(matches[-1], self.described.pk)
+
+    def test_accents_and_apostrophes_fold(self):
+        for query in ["loreal", "L'Oréal", "l’oreal", "LOREAL lash"]:
+            with self.subTest(query=query):
+                self.assertEqual(search.search_products(query), [self.loreal.pk])
+
+    def test_terms_match_as_prefixes_and_review_text(self):
+        self.assertEqual(search.search_products("parad"), [self.loreal.pk])
+        self.assertEqual(search.search_products("velvet"), [self.described.pk])
+
+    def test_misspelt_brand_is_expanded(self):
+        self.assertEqual(search.expand_term("maybeline", search.brand_vocabulary()), ["maybeline", "maybelline"])
+        self.assertEqual(search.search_products("maybeline"), [self.maybelline.pk])
+
+    def test_filters_apply_before_the_limit(self):
+        cheap = Product.objects.filter(price__lt=20, category="mascara")
+        self.assertEqual(search.search_products("mascara", limit=1, within=cheap), [self.loreal.pk])
+        self.assertEqual(search.search_products("mascara", within=Product.objects.filter(category="lipstick")), [])
+
+    def test_listing_searches_within_its_filters(self):
+        Product.objects.update(has_image=True)
+        with self.settings(SEARCH_MAX_RESULTS=1):
+            response = self.client.get(reverse("products"), {"q": "mascara", "category": "blush"})
+        self.assertEqual([p.pk for p in response.context["object_list"]], [self.described.pk])
+
+    def test_index_follows_product_saves_and_deletes(self):
+        product = Product.objects.create(brand="Glossier", name="Cloud Paint", category="blush")
+        self.assertEqual(search.search_products("cloud"), [product.pk])
+        product.name = "Balm Dotcom"
+        product.save()
+        self.assertEqual(search.search_products("cloud"), [])
+        self.assertEqual(search.search_products("dotcom"), [product.pk])
+        product.delete()
+        self.assertEqual(search.search_products("dotcom"), [])
+
+    def test_index_follows_review_deletes(self):
+        Review.objects.get(product=self.described).delete()
+        self.assertEqual(search.search_products("velvet"), [])
+
+    def test_like_fallback(self):
+        search._backends.clear()
+        self.addCleanup(search._backends.clear)
+        with self.settings(SEARCH_BACKEND="like"):
+            self.assertIsInstance(search.get_backend(), search.LikeBackend)
+            self.assertEqual(search.search_products("sky high"), [self.maybelline.pk])
+            self.assertEqual(set(search.search_products("Mascara")), {self.loreal.pk, self.maybelline.pk})
+            self.assertEqual(search.search_products("mascara", within=Product.objects.filter(price__gt=20)),
+                             [self.maybelline.pk])
+
+
+class ImageVariantTests(TestCase):
+    """Variants are generated from the shipped originals and picked up by the template tag"""
+
+    IMAGE = "/static/img/products/Glossier — Cloud Paint in Puff.jpg"
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_FORMATS=("webp",),
+                                              IMAGE_VARIANTS_LAZY=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = Product.objects.create(brand="Glossier", name="Cloud Paint", category="blush",
+                                              image_url=self.IMAGE)
+
+    def render(self, product):
+        return Template('{% load product_images %}{% product_picture p "card" %}').render(Context({"p": product}))
+
+    def test_lazy_request_builds_and_records_variants(self):
+        self.assertIn(f"/products/{self.product.pk}/image/card-320.webp 320w", self.render(self.product))
+
+        response = self.client.get(reverse("product-image", args=[self.product.pk, "card", 320, "webp"]))
+        self.assertEqual(response.status_code, 302)
+        self.assertRegex(response["Location"], rf"/media/product_variants/{self.product.pk}-card-\d+\.[0-9a-f]{{12}}\.webp$")
+
+        self.product.refresh_from_db()
+        variants = self.product.image_variants
+        self.assertEqual(variants["url"], self.IMAGE)
+        self.assertEqual(set(variants), {"url", "source", "width", "height", *images.PRESETS})
+        html = self.render(self.product)
+        self.assertIn('type="image/webp" srcset="/media/product_variants/', html)
+        self.assertIn(f'src="/static/{assets.lookup(self.IMAGE).name}"', html)
+
+    def test_no_encoding_on_request_unless_lazy(self):
+        url = reverse("product-image", args=[self.product.pk, "card", 320, "webp"])
+        with override_settings(IMAGE_VARIANTS_LAZY=False), mock.patch.object(images, "refresh_product") as refresh:
+            response = self.client.get(url)
+        refresh.assert_not_called()
+        self.assertRedirects(response, self.product.image_src, fetch_redirect_response=False)
+
+        images.refresh_product(self.product)  # as generate_image_variants does
+        with override_settings(IMAGE_VARIANTS_LAZY=False):
+            response = self.client.get(url)
+        self.assertRegex(response["Location"], r"/media/product_variants/.*\.webp$")
+
+    def test_changed_image_url_drops_stale_variants(self):
+        images.refresh_product(self.product)
+        self.product.image_url = "/static/img/products/missing.jpg"
+        self.product.save()
+        self.assertIsNone(images.current_variants(self.product))
+        self.assertNotIn("<source", self.render(self.product))
+
+
+class ReviewMediaJobTests(TestCase):
+    """Uploads return straight away as "processing"; the job worker finishes them"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, REVIEW_PHOTO_MAX_EDGE=64)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create(username="uploader")
+        self.product = Product.objects.create(brand="B", name="P", category="lipstick", price=10)
+        self.client.force_login(self.user)
+
+    def photo(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"  # camera make, standing in for GPS & co.
+        buffer = io.BytesIO()
+        Image.new("RGB", (200, 100), "red").save(buffer, format="JPEG", exif=exif)
+        return SimpleUploadedFile("selfie.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def post_review(self, upload):
+        return self.client.post(reverse("review-create", args=[self.product.pk]), {
+            "title": "t", "body": "b", "rating": 5,
+            "media-TOTAL_FORMS": 1, "media-INITIAL_FORMS": 0,
+            "media-0-file": upload, "media-0-kind": "photo",
+        })
+
+    def test_photo_processed_off_request(self):
+        self.assertEqual(self.post_review(self.photo()).status_code, 302)
+        media = ReviewMedia.objects.get()
+        self.assertEqual(media.status, ReviewMedia.PROCESSING)
+        self.assertEqual(Job.objects.get().name, "process_review_media")
+
+        self.assertEqual(jobs.work(), 1)
+        media.refresh_from_db()
+        self.assertEqual((media.status, Job.objects.get().status), (ReviewMedia.READY, Job.DONE))
+        with media.file.open("rb") as fh:
+            cleaned = Image.open(io.BytesIO(fh.read()))
+            self.assertEqual(cleaned.size, (64, 32))
+            self.assertEqual(len(cleaned.getexif()), 0)
+        self.assertTrue(media.thumbnail)
+
+        # the same bytes again (from someone else): stored once
+        self.client.force_login(get_user_model().objects.create(username="reposter"))
+        self.post_review(self.photo())
+        jobs.work()
+        duplicate = ReviewMedia.objects.exclude(pk=media.pk).get()
+        self.assertEqual((duplicate.status, duplicate.file.name), (ReviewMedia.READY, media.file.name))
+
+    def test_upload_must_match_kind(self):
+        upload = SimpleUploadedFile("clip.mp4", b"not really a video", content_type="video/mp4")
+        self.assertEqual(self.post_review(upload).status_code, 200)
+        self.assertFalse(ReviewMedia.objects.exists())
+
+    def test_failing_job_is_retried_then_failed(self):
+        calls = []
+
+        @jobs.task("test_flaky")
+        def flaky():
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        self.addCleanup(jobs._registry.pop, "test_flaky")
+
+        job = jobs.enqueue("test_flaky", max_attempts=2)
+        with self.assertLogs("polls.jobs", "ERROR"):
+            self.assertEqual(jobs.work(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())  # skip the backoff
+        with self.assertLogs("polls.jobs", "ERROR"):
+            jobs.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, len(calls)), (Job.FAILED, 2))
+
+
+class BulkSeederTests(TestCase):
+    """Target sizes are met, the run is reproducible, and derived data is rebuilt"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def seed(self, seed=3, **sizes):
+        BulkSeeder(seed=seed, batch_size=50, out=lambda line: None).run(**sizes)
+
+    def test_targets_and_derived_data(self):
+        self.seed(users=30, products=12, reviews=200, votes=150, media=10)
+        self.assertEqual(get_user_model().objects.count(), 30)
+        self.assertEqual((Product.objects.count(), Review.objects.count()), (12, 200))
+        self.assertEqual(ReviewMedia.objects.count(), 10)
+        self.assertGreater(ReviewHelpfulness.objects.count(), 100)  # repeated random pairs are skipped
+
+        self.assertEqual(ratings.rebuild_rating_summaries(commit=False), [])
+        review = Review.objects.filter(helpfulness_votes__isnull=False).first()
+        self.assertEqual(review.helpful_votes, review.helpfulness_votes.filter(is_helpful=True).count())
+        # backdated, not all stamped "now"
+        self.assertGreater(Review.objects.values("created_at__date").distinct().count(), 30)
+
+        # growing to a larger target only adds the difference
+        self.seed(seed=4, users=30, products=12, reviews=260)
+        self.assertEqual(Review.objects.count(), 260)
+
+    def test_same_seed_same_data(self):
+        self.seed(users=10, products=8, reviews=40)
+        first = list(Review.objects.order_by("id").values_list("user__username", "product__name", "rating", "title"))
+        Review.objects.all().delete()
+        Product.objects.all().delete()
+        get_user_model().objects.all().delete()
+        self.seed(users=10, products=8, reviews=40)
+        second = list(Review.objects.order_by("id").values_list("user__username", "product__name", "rating", "title"))
+        self.assertEqual(first, second)
+
+
+class FixtureGeneratorTests(TestCase):
+    """Sharded generation is deterministic and the loader ingests it intact"""
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out)
+
+    def generate(self, out, workers):
+        return fixturegen.generate(out, users=fixturegen.SHARD_SIZE + 50, products=20, reviews=9000, votes=1500,
+                                   seed=5, workers=workers, now=self.now)
+
+    def test_generate_and_load(self):
+        self.now = timezone.now()
+        manifest = self.generate(self.out, workers=2)
+        serial = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, serial)
+        self.generate(serial, workers=1)
+        names = sorted(os.listdir(self.out))
+        self.assertEqual(len(names), 8)  # products + 2 shards x (users, reviews, votes) + manifest
+        self.assertEqual(filecmp.cmpfiles(self.out, serial, names, shallow=False)[1:], ([], []))
+
+        loaded = fixturegen.load(self.out, batch_size=1000, with_search=False, out=lambda line: None)
+        self.assertEqual(loaded["reviews"], 9000)
+        self.assertEqual(loaded["votes"], sum(n for f, n in manifest["files"].items() if f.startswith("votes")))
+        self.assertEqual(Review.objects.filter(created_at__gte=self.now - timedelta(days=30)).count(),
+                         sum(1 for r in Review.objects.only("created_at") if r.created_at >= self.now - timedelta(days=30)))
+        self.assertEqual(ratings.rebuild_rating_summaries(commit=False), [])
+        review = Review.objects.filter(helpfulness_votes__isnull=False).first()
+        self.assertEqual(review.not_helpful_votes, review.helpfulness_votes.filter(is_helpful=False).count())
+
+        with self.assertRaises(ValueError):  # ids are taken now
+            fixturegen.load(self.out, out=lambda line: None)
+
+    def test_load_refuses_taken_usernames(self):
+        # BulkSeeder's load{n} users have low ids, so only their names clash
+        get_user_model().objects.create(username="load1003")
+        fixturegen.generate(self.out, users=10, products=2, reviews=10, seed=5, workers=1, id_offset=1000)
+        with self.assertRaisesMessage(CommandError, "1 of the fixture's usernames exist already (load1003...load1003)"
+                                                    "; regenerate with --id-offset 1004"):
+            call_command("load_fixtures", self.out, stdout=io.StringIO())
+        self.assertFalse(Product.objects.exists())
+
+
+class PageCacheTests(TestCase):
+    """Anonymous pages come from the cache until a write bumps a scope they depend on"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author, cls.voter = User.objects.create(username="author"), User.objects.create(username="voter")
+        cls.product = Product.objects.create(brand="B", name="Lip Tint", category="lipstick", price=10)
+        cls.review = Review.objects.create(user=cls.author, product=cls.product, title="Lovely", body="b", rating=4)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.url = reverse("product-detail", args=[self.product.pk])
+
+    def test_detail_served_from_cache_until_review_changes(self):
+        self.assertContains(self.client.get(self.url), "Lovely")
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.url), "Lovely")
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.filter(pk=self.review.pk).update(title="Smudges")  # no signal: still cached
+        self.assertContains(self.client.get(self.url), "Lovely")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review.title = "Smudges"
+            self.review.save()
+        self.assertContains(self.client.get(self.url), "Smudges")
+
+    def test_invalidation_is_scoped(self):
+        lipstick, mascara = caching.listing_scopes("lipstick"), caching.listing_scopes("mascara")
+        before = {s: caching.versions(*s) for s in map(tuple, (lipstick, mascara, caching.listing_scopes()))}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review.rating = 2
+            self.review.save()
+        after = {s: caching.versions(*s) for s in before}
+        self.assertNotEqual(before[tuple(lipstick)], after[tuple(lipstick)])
+        self.assertNotEqual(before[tuple(caching.listing_scopes())], after[tuple(caching.listing_scopes())])
+        self.assertEqual(before[tuple(mascara)], after[tuple(mascara)])
+
+        # a vote flip is a plain UPDATE, invalidated by cast_vote itself
+        votes.cast_vote(self.review.pk, self.voter.pk, True)
+        page = caching.versions(caching.product_scope(self.product.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            votes.cast_vote(self.review.pk, self.voter.pk, False)
+        self.assertNotEqual(page, caching.versions(caching.product_scope(self.product.pk)))
+
+    @override_settings(PAGE_CONDITIONAL_GET=True)
+    def test_conditional_get(self):
+        for url in (self.url, reverse("review-list", args=[self.product.pk]) + "?sort=most_helpful",
+                    reverse("products") + "?category=lipstick", reverse("trends")):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response["ETag"]
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual((response.status_code, response.content), (304, b""))
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+                self.assertEqual(response.status_code, 304)
+
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.voter, product=self.product, title="New", body="b", rating=5)
+        self.assertContains(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag), "New")
+
+        self.client.force_login(self.author)  # per-user pages: another ETag, private
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_no_conditional_get_without_a_shared_cache(self):
+        # a per-process cache can't tell whether another worker saw a write
+        self.assertFalse(settings.PAGE_CONDITIONAL_GET)
+        response = self.client.get(self.url)
+        self.assertNotIn("ETag", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_versions_expire_with_the_pages(self):
+        with override_settings(PAGE_CACHE_TIMEOUT=60), mock.patch.object(cache, "set_many") as set_many:
+            caching.scope_state(caching.product_scope(self.product.pk))
+            caching.bump("catalog")
+        self.assertEqual([c.args[1] for c in set_many.call_args_list], [60, 60])
+
+    def test_logged_in_users_skip_page_cache(self):
+        self.assertContains(self.client.get(self.url), "Sign up")
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertContains(response, "Logout")
+        self.assertContains(response, reverse("review-update", args=[self.review.pk]))  # outside the shared fragment
+
+
+class ApiTests(TestCase):
+    """JSON API: keyset pages cover every row once, sparse fields, errors, caching headers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        users = User.objects.bulk_create(User(username=f"api{i}") for i in range(6))
+        cls.products = Product.objects.bulk_create(
+            Product(brand="B", name=f"Gloss {i}", category="lipstick" if i % 2 else "blush",
+                    price=[8, 12, None][i % 3], has_image=True, rating_avg=i % 4, rating_count=i)
+            for i in range(25)
+        )
+        cls.product = cls.products[0]
+        Review.objects.bulk_create(
+            Review(user=u, product=cls.product, title=f"t{i}", body="b", rating=i % 5 + 1,
+                   is_verified_purchase=i % 2 == 0, skin_type="oily" if i < 3 else "dry")
+            for i, u in enumerate(users)
+        )
+        ratings.rebuild_rating_summaries([cls.product.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def walk(self, url):
+        rows = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            rows += response.json()["results"]
+            url = response.json()["next"]
+        return rows
+
+    def test_product_pages_cover_each_row_once(self):
+        for sort in ["rating", "reviewed", "newest", "price_asc", "price_desc", "name"]:
+            with self.subTest(sort=sort):
+                rows = self.walk(f"/api/v1/products/?sort={sort}&limit=4&fields=id,price")
+                ids = [row["id"] for row in rows]
+                self.assertEqual(len(ids), len(set(ids)))
+                expected = Product.objects.exclude(price=None) if sort.startswith("price") else Product.objects
+                self.assertEqual(set(ids), set(expected.values_list("id", flat=True)))
+                self.assertEqual(set(rows[0]), {"id", "price"})
+
+        lipstick = self.walk("/api/v1/products/?category=lipstick&min=10&limit=3")
+        self.assertTrue(all(row["category"] == "lipstick" and float(row["price"]) >= 10 for row in lipstick))
+
+    def test_product_detail_and_reviews(self):
+        url = reverse("api-product", args=[self.product.pk])
+        detail = self.client.get(url + "?fields=name,rating_histogram").json()
+        self.assertEqual(detail, {"name": "Gloss 0", "rating_histogram": {"1": 2, "2": 1, "3": 1, "4": 1, "5": 1}})
+
+        reviews_url = reverse("api-product-reviews", args=[self.product.pk])
+        rows = self.walk(reviews_url + "?sort=highest_rating&limit=2&fields=rating,author")
+        self.assertEqual([row["rating"] for row in rows], [5, 4, 3, 2, 1, 1])
+        with self.assertNumQueries(2):  # product exists + one values() query
+            filtered = self.client.get(reviews_url + "?skin_type=oily&verified=true").json()["results"]
+        self.assertEqual([(r["skin_type"], r["is_verified_purchase"]) for r in filtered], [("oily", True)] * 2)
+        self.assertEqual(filtered[0]["media_count"], 0)
+
+    def test_review_pages_cover_each_row_once(self):
+        # ties and sub-millisecond gaps in created_at must not lose rows between pages
+        moment = timezone.now().replace(microsecond=500000)
+        reviews = list(self.product.reviews.order_by("id"))
+        for review, offset in zip(reviews, [0, 0, 0, 1, 250, 999]):
+            review.created_at = moment + timedelta(microseconds=offset)
+        Review.objects.bulk_update(reviews, ["created_at"])
+        reviews_url = reverse("api-product-reviews", args=[self.product.pk])
+        for sort in ["newest", "oldest", "highest_rating", "lowest_rating", "most_helpful"]:
+            with self.subTest(sort=sort):
+                ids = [row["id"] for row in self.walk(f"{reviews_url}?sort={sort}&limit=1&fields=id")]
+                self.assertEqual(sorted(ids), sorted(review.pk for review in reviews))
+
+    def test_images_are_given_as_served_urls(self):
+        image = "/static/img/products/Huda Beauty — Power Bullet Matte Lipstick “Interview”.jpg"
+        Product.objects.filter(pk=self.product.pk).update(image_url=image)
+        served = f"/static/{assets.lookup(image).name}"
+        detail = self.client.get(reverse("api-product", args=[self.product.pk]) + "?fields=id,image_src").json()
+        self.assertEqual(detail, {"id": self.product.pk, "image_src": served})
+        rows = self.walk("/api/v1/products/?sort=newest&limit=25")
+        self.assertNotIn("image_url", rows[0])
+        self.assertEqual({row["image_src"] for row in rows if row["id"] == self.product.pk}, {served})
+
+    def test_errors(self):
+        for url, status in [("/api/v1/products/?fields=id,secret", 400), ("/api/v1/products/?cursor=nope", 400),
+                            ("/api/v1/products/?sort=relevance", 400), ("/api/v1/products/0/", 404),
+                            ("/api/v1/products/0/reviews/", 404)]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn("error", response.json())
+
+    @override_settings(PAGE_CONDITIONAL_GET=True)
+    def test_gzip_and_conditional_get(self):
+        response = self.client.get("/api/v1/products/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("max-age=60", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/v1/products/", HTTP_ACCEPT_ENCODING="gzip",
+                                       HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+class QueryBudgetTests(TestCase):
+    """Every polls URL stays within its query budget, and its count doesn't grow with the data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BulkSeeder(seed=3, out=lambda *args: None).run(users=20, products=30, reviews=300, votes=100)
+        get_user_model().objects.create_user("analyst", is_staff=True)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_FORMATS=("webp",))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def query_counts(self):
+        counts = {}
+        for scenario in benchmark.scenarios():
+            result = benchmark.run_scenario(scenario, iterations=1, warmup=1)
+            self.assertLess(result["status"], 400, scenario.path)
+            counts[scenario.name] = result["queries"]
+        return counts
+
+    def test_every_url_has_a_scenario_and_budget(self):
+        names = {pattern.name for pattern in polls_urls.urlpatterns}
+        self.assertEqual({scenario.name for scenario in benchmark.scenarios()}, names)
+        self.assertEqual(set(benchmark.QUERY_BUDGETS), names)
+
+    def test_query_counts_within_budget_at_any_size(self):
+        small = self.query_counts()
+        for name, queries in small.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(queries, benchmark.QUERY_BUDGETS[name])
+
+        BulkSeeder(seed=4, out=lambda *args: None).run(users=40, products=60, reviews=1200, votes=400)
+        self.assertEqual(self.query_counts(), small)
+
+
+class MetricsTests(TestCase):
+    """Request metrics: per-view samples, Prometheus output, access, slow-request log"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user("ops", is_staff=True)
+        cls.user = User.objects.create_user("shopper")
+        Product.objects.create(brand="B", name="Balm", category="lipstick", has_image=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def scrape(self, **headers):
+        return Client().get(reverse("metrics"), **headers)
+
+    def test_samples_are_tagged_with_the_url_name(self):
+        self.client.get(reverse("products"))
+        self.client.get(reverse("products"))  # from the page cache: no queries, no rendering
+        self.client.get("/no-such-page/")
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn('polls_requests_total{view="products",method="GET",status="2xx"} 2', body)
+        self.assertIn('polls_requests_total{view="unmatched",method="GET",status="4xx"} 1', body)
+        self.assertIn('polls_request_sql_queries_count{view="products"} 2', body)
+        self.assertIn('polls_request_sql_queries_bucket{view="products",le="0"} 1', body)
+        template_sum = next(line for line in body.splitlines()
+                            if line.startswith('polls_request_template_duration_seconds_sum{view="products"}'))
+        self.assertGreater(float(template_sum.split()[-1]), 0)
+        self.assertIn('polls_request_duration_seconds_window{view="products",quantile="0.95"}', body)
+
+    def test_staff_or_token_only(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with override_settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION="Bearer nope").status_code, 403)
+            response = self.scrape(HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs("polls.metrics", "WARNING") as logs:
+            self.client.get(reverse("trends"))
+        self.assertIn("(trends) 200", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(METRICS_WINDOW_SECONDS=100)
+    def test_window_quantiles(self):
+        histogram = metrics.Histogram((1, 2, 4))
+        for value in [0.5] * 50 + [3] * 50:
+            histogram.observe(value, now=1000)
+        counts = histogram.window_counts(now=1050)
+        self.assertEqual(histogram.quantile(0.5, counts), 1)
+        self.assertEqual(histogram.quantile(0.99, counts), 3.96)
+        self.assertIsNone(histogram.quantile(0.5, histogram.window_counts(now=1101)))  # aged out
+        self.assertEqual(sum(histogram.counts), 100)  # the cumulative counts stay
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadViewTests(TestCase):
+    """The async read views render what the sync ones do, with the same queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create(User(username=f"async{i}") for i in range(3))
+        products = [
+            Product.objects.create(brand="B", name=f"Velvet Tint {i}", category="lipstick", price=10 + i)
+            for i in range(15)
+        ]
+        Product.objects.update(has_image=True)  # save() clears it: the image files don't exist
+        cls.product = products[0]
+        for i, user in enumerate(cls.users):
+            Review.objects.create(user=user, product=cls.product, title=f"Tint {i}", body="b", rating=i + 3)
+        trending.rebuild_buckets()
+        trending.compute_scores()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def render(self, get, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return CSRF_TOKEN.sub("", response.content.decode()), len(queries)
+
+    def assertSamePages(self):
+        paths = ["/", "/products/", "/products/?page=2&sort=price_asc", "/products/?q=velvet",
+                 f"/products/{self.product.pk}/", "/trends/?days=7"]
+        for path in paths:
+            with self.subTest(path=path):
+                with override_settings(ROOT_URLCONF="mysite.urls"):
+                    expected = self.render(self.client.get, path)
+                self.assertEqual(self.render(async_to_sync(self.async_client.get), path), expected)
+
+    def test_anonymous(self):
+        self.assertSamePages()
+
+    def test_logged_in_author(self):
+        self.client.force_login(self.users[0])
+        async_to_sync(self.async_client.aforce_login)(self.users[0])
+        self.assertSamePages()
+
+    def test_invalid_page_is_404(self):
+        response = async_to_sync(self.async_client.get)("/products/?page=99")
+        self.assertEqual(response.status_code, 404)
+
+
+class LoadTestClientTests(SimpleTestCase):
+    """The loadtest client reads whole responses off a keep-alive connection"""
+
+    def read(self, raw):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return [await loadtest._read_response(reader), await reader.read()]
+        return async_to_sync(read)()
+
+    def test_content_length(self):
+        response, rest = self.read(b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhelloNEXT")
+        self.assertEqual(response, (200, 5, False))
+        self.assertEqual(rest, b"NEXT")
+
+    def test_chunked_and_close(self):
+        raw = (b"HTTP/1.1 404 Not Found\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+               b"3\r\nabc\r\n4;x=y\r\ndefg\r\n0\r\n\r\nNEXT")
+        response, rest = self.read(raw)
+        self.assertEqual(response, (404, 7, True))
+        self.assertEqual(rest, b"NEXT")
+
+
+class TemplateRenderingTests(TestCase):
+    """Precomputed star ratings, template preloading and the render profiler"""
+
+    def test_star_rating(self):
+        template = Template('{% load star_rating %}{% star_rating value %}|{% star_rating value "svg" %}')
+        for value, filled in [(None, 0), ("", 0), (0, 0), (3, 3), (4.6, 4), (5, 5), (9, 5), ("x", 0)]:
+            with self.subTest(value=value):
+                text, svg = template.render(Context({"value": value})).split("|")
+                self.assertEqual(text.count("star-rating filled"), filled)
+                self.assertEqual(text.count("star-rating empty"), 5 - filled)
+                self.assertEqual(svg.count('class="star filled"'), filled)
+                self.assertEqual(svg.count("<svg"), 5)
+
+    def test_preload_compiles_every_template(self):
+        self.assertGreaterEqual(templating.preload(), len(list((Path(__file__).parent / "templates").rglob("*.html"))))
+
+    def test_profile_attributes_templates_blocks_and_includes(self):
+        product = Product.objects.create(brand="B", name="Prof", category="blush")
+        user = get_user_model().objects.create(username="prof")
+        Review.objects.create(user=user, product=product, title="t", body="b", rating=4)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with templating.profile() as report:
+            self.assertEqual(self.client.get(reverse("product-detail", args=[product.pk])).status_code, 200)
+        entries = {(e.kind, e.name): e for e in report.rows()}
+        self.assertIn(("template", "polls/base.html"), entries)
+        self.assertIn(("block", "polls/base.html: content"), entries)
+        self.assertEqual(entries["include", 'polls/_review_feed.html: "polls/_review_card.html"'].calls, 1)
+        page = entries["template", "polls/product_detail.html"]
+        self.assertGreaterEqual(page.total, page.self_time)
+        # nothing is recorded outside the block
+        self.client.get(reverse("product-detail", args=[product.pk]))
+        self.assertEqual(page.calls, 1)
+
+
+class ImageAssetTests(TestCase):
+    """Shipped images under canonical names, whatever form their image_url takes"""
+
+    IMAGE = "/static/img/products/Huda Beauty — Power Bullet Matte Lipstick “Interview”.jpg"
+
+    def test_lookup_normalizes_the_url(self):
+        asset = assets.lookup(self.IMAGE)
+        self.assertRegex(asset.name, r"^assets/products/huda-beauty-power-bullet-matte-lipstick-interview"
+                                     r"\.[0-9a-f]{12}\.jpg$")
+        self.assertTrue(asset.name.isascii())
+        for url in [unicodedata.normalize("NFD", self.IMAGE), quote(self.IMAGE), f"/static/{asset.name}"]:
+            with self.subTest(url=url):
+                self.assertEqual(assets.lookup(url), asset)
+        self.assertIsNone(assets.lookup("/static/img/products/missing.jpg"))
+        self.assertIsNone(assets.lookup("https://example.com/x.jpg"))
+
+    def test_decomposed_seed_url_resolves(self):
+        # seeding.PRODUCTS spells L'Oréal decomposed, the file is named composed
+        url = next(p["image_url"] for p in PRODUCTS if "Lash Paradise" in p["image_url"])
+        self.assertFalse(unicodedata.is_normalized("NFC", url))
+        product = Product.objects.create(brand="L'Oréal", name="Lash Paradise", category="mascara", image_url=url)
+        self.assertTrue(product.has_image)
+        self.assertEqual(product.image_asset.source, unicodedata.normalize("NFC", url.removeprefix("/static/")))
+        self.assertEqual(product.image_src, f"/static/{product.image_asset.name}")
+
+    def test_finder_serves_canonical_names(self):
+        asset = assets.lookup(self.IMAGE)
+        self.assertEqual(finders.find(asset.name), str(asset.path))
+        self.assertIn(asset.name, [name for name, _ in assets.AssetFinder().list(None)])
+
+    def test_sync_links_products_and_checks(self):
+        Product.objects.bulk_create([
+            Product(brand="H", name="Interview", category="lipstick", image_url=self.IMAGE),
+            Product(brand="H", name="Gone", category="lipstick", image_url="/static/img/products/gone.jpg"),
+            Product(brand="H", name="None", category="lipstick"),
+        ])
+        with self.assertRaisesMessage(CommandError, "1 image_url(s)"):
+            call_command("sync_image_assets", "--check", stdout=io.StringIO())
+        linked = Product.objects.get(name="Interview")
+        self.assertTrue(linked.has_image)
+        self.assertEqual(linked.image_asset.sha256, assets.lookup(self.IMAGE).sha256)
+        self.assertEqual(ImageAsset.objects.count(), len(assets.registry().by_name))
+        self.assertFalse(Product.objects.filter(name__in=["Gone", "None"], has_image=True).exists())
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic with the production storage: hashed names, minified and precompressed CSS"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        production = override_settings(STATIC_ROOT=cls.static_root, STORAGES={
+            **settings.STORAGES,
+            "staticfiles": {"BACKEND": "polls.staticfiles.MinifiedCompressedManifestStorage"},
+        })
+        production.enable()
+        cls.addClassCleanup(production.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_product_images_with_non_ascii_names_resolve_to_hashed_files(self):
+        names = [p["image_url"] for p in PRODUCTS
+                 if any(ord(c) > 127 for c in p["image_url"]) and static_image_exists(p["image_url"])]
+        self.assertIn("/static/img/products/Glossier — Cloud Paint in Puff.jpg", names)
+        self.assertTrue(any("“" in name for name in names) and any("—" in name for name in names))
+        for image_url in names:
+            with self.subTest(image_url=image_url):
+                src = Product(image_url=image_url).image_src
+                self.assertNotEqual(src, image_url)
+                hashed = self.static_root / unquote(src).removeprefix(settings.STATIC_URL)
+                self.assertTrue(hashed.is_file(), src)
+                self.assertRegex(src, r"^/static/assets/products/[a-z0-9-]+\.[0-9a-f]{12}\.\w+$")
+
+    def test_css_is_minified_and_precompressed(self):
+        href = Template("{% load static %}{% static 'css/app.css' %}").render(Context())
+        css = self.static_root / href.removeprefix(settings.STATIC_URL)
+        self.assertRegex(css.name, r"^app\.[0-9a-f]{12}\.css$")
+        source = (Path(__file__).parent / "static" / "css" / "app.css").read_text()
+        minified = css.read_text()
+        self.assertLess(len(minified), len(source) * 0.9)
+        self.assertNotIn("\n", minified)
+        self.assertTrue(css.with_name(css.name + ".gz").is_file())
+
+    def test_minify_css(self):
+        self.assertEqual(
+            minify_css('a > b , c :hover { color: red ; /* note */ background: url("a b.png") ; }\n'
+                       "@media (max-width: 10px) { .x { width: calc(1px + 2px) } }"),
+            'a>b,c :hover{color:red;background:url("a b.png")}@media (max-width:10px){.x{width:calc(1px + 2px)}}',
+        )
+
+
+class CatalogImportTests(TestCase):
+    """Bulk catalog import: natural-key matching, field diffs, idempotent re-runs, dry runs"""
+
+    FEED = (
+        "brand,name,category,price,image_url\n"
+        "Glossier,Cloud Paint,Blush,18,\n"
+        "Huda Beauty,Power Bullet,lipstick,20.5,"
+        "/static/img/products/Huda Beauty — Power Bullet Matte Lipstick “Interview”.jpg\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def run_import(self, feed, *args):
+        path = Path(tempfile.mkdtemp()) / "feed.csv"
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_text(feed, encoding="utf-8")
+        out = io.StringIO()
+        call_command("import_catalog", str(path), *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_creates_then_rerun_is_a_noop(self):
+        out = self.run_import(self.FEED)
+        self.assertIn("2 created", out)
+        blush = Product.objects.get(name="Cloud Paint")
+        self.assertEqual((blush.category, blush.price, blush.has_image), ("blush", Decimal("18.00"), False))
+        lipstick = Product.objects.get(name="Power Bullet")
+        self.assertTrue(lipstick.has_image)
+        self.assertEqual(lipstick.image_asset.name, assets.lookup(lipstick.image_url).name)
+        self.assertEqual(search.search_products("power bullet"), [lipstick.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            out = self.run_import(self.FEED)
+        self.assertIn("0 created, 0 updated, 2 unchanged", out)
+        self.assertLessEqual(len(queries), 3)  # the prefetch, inside a savepoint
+
+    def test_partial_feed_updates_only_its_columns(self):
+        self.run_import(self.FEED)
+        out = self.run_import("brand,name,price\nGlossier, CLOUD  paint ,21\n")
+        self.assertIn("1 updated", out)
+        blush = Product.objects.get(brand="Glossier")
+        # the key matches case and whitespace insensitively; the feed's spelling wins
+        self.assertEqual((blush.name, blush.category, blush.price), ("CLOUD paint", "blush", Decimal("21.00")))
+
+    def test_image_change_keeps_other_rows_images(self):
+        self.run_import(self.FEED)
+        lipstick = Product.objects.get(name="Power Bullet")
+        kept = (lipstick.has_image, lipstick.image_asset_id)
+        # one batch: a price-only change next to an image change
+        out = self.run_import(
+            "brand,name,price,image_url\n"
+            f"Huda Beauty,Power Bullet,21,{lipstick.image_url}\n"
+            f"Glossier,Cloud Paint,18,{lipstick.image_url}\n"
+        )
+        self.assertIn("2 updated", out)
+        lipstick.refresh_from_db()
+        self.assertEqual((lipstick.price, lipstick.has_image, lipstick.image_asset_id), (Decimal("21.00"), *kept))
+        blush = Product.objects.get(name="Cloud Paint")
+        self.assertEqual((blush.has_image, blush.image_asset_id), kept)
+
+    def test_key_matches_decomposed_unicode(self):
+        Product.objects.create(brand="L'Oréal", name="Lash Paradise", category="mascara", price=12)
+        feed = unicodedata.normalize("NFD", "brand,name,price\nL'Oréal,Lash Paradise,14\n")
+        self.assertIn("1 updated", self.run_import(feed))
+        self.assertEqual(Product.objects.get().price, Decimal("14.00"))
+
+    def test_dry_run_shows_the_diff_and_writes_nothing(self):
+        Product.objects.create(brand="Glossier", name="Cloud Paint", category="blush", price=18)
+        out = self.run_import("brand,name,category,price\nGlossier,Cloud Paint,blush,20\nFenty,Gloss,lipstick,19\n",
+                              "--dry-run")
+        self.assertIn("~ Glossier — Cloud Paint: price 18.00 -> 20.00", out)
+        self.assertIn("+ Fenty — Gloss: category lipstick; price 19.00", out)
+        self.assertIn("Dry run, nothing written.", out)
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(Product.objects.get().price, Decimal("18.00"))
+
+    def test_bad_rows_are_skipped_and_reported(self):
+        out = self.run_import(
+            "brand,name,category,price\n"
+            ",No Brand,blush,1\n"
+            "A,Bad Price,blush,cheap\n"
+            "A,Bad Category,glitter,1\n"
+            "A,No Category,,1\n"
+            "A,Good,blush,1\n"
+            "a,good,blush,2\n"
+        )
+        for message in ["Row 1: Missing brand", "Row 2: Bad price", "Row 3: Unknown category",
+                        "Row 4: New product without a category", "Row 6: Duplicate of row 5"]:
+            self.assertIn(message, out)
+        self.assertIn("1 created, 0 updated, 0 unchanged, 5 skipped", out)
+        self.assertEqual(list(Product.objects.values_list("name", "price")), [("Good", Decimal("1.00"))])
+
+    def test_json_array_and_ndjson(self):
+        rows = [{"brand": "A", "name": f"P{i}", "category": "powder", "price": i} for i in range(5)]
+        array = json.dumps(rows, indent=1)
+        self.assertEqual(list(catalog.read_json(io.StringIO(array), chunk_size=7)), rows)
+        ndjson = "\n".join(json.dumps(row) for row in rows) + "\n"
+        self.assertEqual(list(catalog.read_json(io.StringIO(ndjson), chunk_size=7)), rows)
+        with self.assertRaises(ValueError):
+            list(catalog.read_json(io.StringIO(array[:-3])))
+
+        result = catalog.CatalogImporter(batch_size=2).run(catalog.read_json(io.StringIO(array)))
+        self.assertEqual((result.read, result.created), (5, 5))
+        rows[0]["price"] = 99
+        result = catalog.CatalogImporter(batch_size=2).run(rows)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 4))
+        self.assertEqual(Product.objects.get(name="P0").price, Decimal("99.00"))
+
+
+class ReviewExportTests(TestCase):
+    """Streaming review exports: CSV/NDJSON content, watermarks, staff-only endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create(User(username=f"exp{i}") for i in range(3))
+        cls.staff = User.objects.create_user("analyst", password="pw", is_staff=True)
+        cls.product = Product.objects.create(brand="B", name="Glow, \"Dewy\"", category="blush")
+        cls.reviews = [
+            Review.objects.create(user=u, product=cls.product, title=f"t{i}", body="line1\nline2 é",
+                                  rating=i + 3, skin_type="oily", age_range="25-34")
+            for i, u in enumerate(cls.users)
+        ]
+        ReviewMedia.objects.create(review=cls.reviews[0], file="x.jpg", status=ReviewMedia.READY)
+        ReviewMedia.objects.create(review=cls.reviews[0], file="y.jpg", status=ReviewMedia.PROCESSING)
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command("export_reviews", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    @override_settings(EXPORT_SETTLE_SECONDS=0)
+    def test_csv_round_trip(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("--chunk-size", "2"))))
+        self.assertEqual([int(row["review_id"]) for row in rows], [r.pk for r in self.reviews])
+        first = rows[0]
+        self.assertEqual(first["product_name"], 'Glow, "Dewy"')
+        self.assertEqual(first["body"], "line1\nline2 é")
+        self.assertEqual((first["username"], first["skin_type"], first["media_count"]), ("exp0", "oily", "1"))
+        self.assertEqual(rows[1]["media_count"], "0")
+
+    @override_settings(EXPORT_SETTLE_SECONDS=0)
+    def test_incremental_export_with_watermark(self):
+        watermark = os.path.join(tempfile.mkdtemp(), "reviews.watermark")
+        self.addCleanup(shutil.rmtree, os.path.dirname(watermark))
+        self.assertEqual(len(self.export("--format", "ndjson", "--watermark-file", watermark).splitlines()), 3)
+        self.assertEqual(self.export("--format", "ndjson", "--watermark-file", watermark), "")
+
+        votes.cast_vote(self.reviews[1].pk, self.staff.pk, True)  # touches updated_at
+        rows = [json.loads(line) for line in
+                self.export("--format", "ndjson", "--watermark-file", watermark).splitlines()]
+        self.assertEqual([(row["review_id"], row["helpful_votes"]) for row in rows], [(self.reviews[1].pk, 1)])
+
+    def test_settle_time_holds_back_recent_rows(self):
+        self.assertEqual(self.export("--format", "ndjson"), "")  # all created within the last minute
+
+    def test_parquet_needs_output_and_pyarrow(self):
+        with self.assertRaises(CommandError):
+            self.export("--format", "parquet")
+
+    @override_settings(EXPORT_SETTLE_SECONDS=0)
+    def test_endpoint_is_staff_only_and_streams(self):
+        url = reverse("review-export", args=["csv"])
+        self.assertEqual(self.client.get(url).status_code, 302)  # to login
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(body)))), 3)
+
+        since = response["X-Export-Until"]
+        response = self.client.get(reverse("review-export", args=["ndjson"]), {"since": since})
+        self.assertEqual(b"".join(response.streaming_content), b"")
+        self.assertEqual(self.client.get(url, {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("review-export", args=["xml"])).status_code, 404)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """mysite/settings.py's database configuration for sample environments"""
+
+    databases = {"default"}  # only to read the connection's PRAGMAs
+
+    def load(self, **env):
+        clean = {name: value for name, value in os.environ.items() if not name.startswith("DB_")}
+        with mock.patch.dict(os.environ, {**clean, **env}, clear=True):
+            return runpy.run_path(str(Path(settings.BASE_DIR) / "mysite" / "settings.py"))
+
+    def test_sqlite_defaults(self):
+        config = self.load()
+        default = config["DATABASES"]["default"]
+        self.assertEqual(default["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(default["OPTIONS"], {
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+            "timeout": 20,
+            "transaction_mode": "IMMEDIATE",
+        })
+        self.assertEqual((default["CONN_MAX_AGE"], default["CONN_HEALTH_CHECKS"]), (60, True))
+        self.assertEqual(config["DATABASE_REPLICAS"], [])
+        self.assertNotIn("DATABASE_ROUTERS", config)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_sqlite_connection_applies_the_options(self):
+        # the test database is in memory, where journal_mode stays "memory"
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES["default"]["OPTIONS"]["timeout"] * 1000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_sqlite_replicas(self):
+        config = self.load(DB_BUSY_TIMEOUT="5", DB_REPLICAS="/data/r1.sqlite3, /data/r2.sqlite3,")
+        self.assertEqual(config["DATABASE_REPLICAS"], ["replica1", "replica2"])
+        replica = config["DATABASES"]["replica2"]
+        self.assertEqual(replica["NAME"], "/data/r2.sqlite3")
+        self.assertEqual(replica["OPTIONS"]["timeout"], 5)
+        self.assertEqual(replica["TEST"], {"MIRROR": "default"})
+        self.assertIsNot(replica["OPTIONS"], config["DATABASES"]["default"]["OPTIONS"])
+        self.assertEqual(config["DATABASE_ROUTERS"], ["polls.routers.ReplicaRouter"])
+        middleware = config["MIDDLEWARE"]
+        self.assertEqual(middleware.index("polls.routers.ReplicaPinMiddleware") + 1,
+                         middleware.index("django.contrib.sessions.middleware.SessionMiddleware"))
+
+    def test_postgres_pool_and_replicas(self):
+        config = self.load(DB_ENGINE="postgres", DB_HOST="primary", DB_POOL="1", DB_POOL_MAX_SIZE="32",
+                           DB_REPLICAS="replica-a")
+        default = config["DATABASES"]["default"]
+        self.assertEqual((default["ENGINE"], default["HOST"]), ("django.db.backends.postgresql", "primary"))
+        self.assertEqual(default["OPTIONS"]["pool"], {"min_size": 2, "max_size": 32, "timeout": 10})
+        self.assertEqual(default["CONN_MAX_AGE"], 0)  # Django refuses persistent connections with a pool
+        self.assertNotIn("CONN_HEALTH_CHECKS", default)
+        replica = config["DATABASES"]["replica1"]
+        self.assertEqual((replica["HOST"], replica["OPTIONS"]["pool"]["max_size"]), ("replica-a", 32))
+
+    def test_postgres_without_pool(self):
+        default = self.load(DB_ENGINE="postgres", DB_CONN_MAX_AGE="300")["DATABASES"]["default"]
+        self.assertNotIn("pool", default["OPTIONS"])
+        self.assertEqual((default["CONN_MAX_AGE"], default["CONN_HEALTH_CHECKS"]), (300, True))
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Reads go to one replica per request, unless the request wrote or is pinned"""
+
+    router = routers.ReplicaRouter()
+
+    def respond(self, request, write=False):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Product))
+            if write:
+                self.router.db_for_write(Review)
+                seen.append(self.router.db_for_read(Product))
+            seen.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        response = routers.ReplicaPinMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_stick_to_one_replica(self):
+        seen, response = self.respond(RequestFactory().get("/"))
+        self.assertIn(seen[0], ("replica1", "replica2"))
+        self.assertEqual(seen[0], seen[1])
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.router.db_for_write(Review), "default")
+
+    def test_write_pins_rest_of_request_and_following_requests(self):
+        seen, response = self.respond(RequestFactory().get("/"), write=True)
+        self.assertEqual(seen[1:], ["default", "default"])
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]["max-age"], 10)
+
+        pinned = RequestFactory().get("/")
+        pinned.COOKIES[routers.PIN_COOKIE] = "1"
+        self.assertEqual(self.respond(pinned)[0], ["default", "default"])
+
+    def test_unsafe_methods_read_from_primary(self):
+        seen, response = self.respond(RequestFactory().post("/"))
+        self.assertEqual(seen, ["default", "default"])
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)  # nothing was written
+
+    def test_without_replicas_everything_uses_default(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Product), "default")
+        self.assertFalse(self.router.allow_migrate("replica1", "polls"))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "set DB_REPLICAS (e.g. a second SQLite file) to run")
+class ReplicaRoutingTests(TransactionTestCase):
+    """End to end against the configured replica aliases (mirrors of default under test)"""
+
+    databases = "__all__"
+
+    def queries_on(self, alias, url, method="get", **data):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return len(ctx.captured_queries)
+
+    def test_user_reads_own_vote_from_primary(self):
+        user = get_user_model().objects.create_user("pinned", password="x")
+        author = get_user_model().objects.create_user("author", password="x")
+        product = Product.objects.create(name="Lip Oil", brand="Glow")
+        review = Review.objects.create(product=product, user=author, rating=5, title="Shiny", body="Lovely.")
+        self.client.force_login(user)
+        replica = settings.DATABASE_REPLICAS[0]
+        with override_settings(DATABASE_REPLICAS=[replica]):
+            self.assertGreater(self.queries_on(replica, reverse("product-list")), 0)
+            self.queries_on("default", reverse("review-helpful", args=[review.pk]), "post", is_helpful="true")
+            self.assertIn(routers.PIN_COOKIE, self.client.cookies)
+            self.assertEqual(self.queries_on(replica, reverse("product-detail", args=[product.pk])), 0)
+
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="[^"]*"')
+
+# URLconf for AsyncReadViewTests: the site, with the async read views in front
+urlpatterns = [
+    path("", async_views.ProductList.as_view(), name="product-list"),
+    path("products/", async_views.ProductBrowse.as_view(), name="products"),
+    path("products/<int:pk>/", async_views.ProductDetail.as_view(), name="product-detail"),
+    path("trends/", async_views.TrendsView.as_view(), name="trends"),
+    path("", include("mysite.urls")),
+]
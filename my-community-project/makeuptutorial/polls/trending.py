@@ -0,0 +1,183 @@
+"""
+Trending engine.
+
+Reviews feed per-product daily buckets (ProductDailyStats) as they are
+written. `compute_scores` rolls the buckets up into the windows the trends
+page offers and stores a ranked top-N per (window, category) in
+TrendingScore, so /trends/ is a single indexed read. Run it periodically
+with `manage.py compute_trending`; until it has stored a window, that
+window is scored live from the buckets.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import caching
+from .models import Product, ProductDailyStats, Review, TrendingScore
+
+WINDOWS = [7, 14, 30, 60]
+DEFAULT_WINDOW = 30
+
+
+def top_n():
+    return getattr(settings, "TRENDING_TOP_N", 60)
+
+
+def snap_window(days):
+    """Closest precomputed window to an arbitrary ?days= value"""
+    return min(WINDOWS, key=lambda w: (abs(w - days), w))
+
+
+def trending_score(recent_reviews, recent_avg, lifetime_avg):
+    # 0.7 * recent review count  +  0.2 * recent average (scaled)  +  0.1 * positive rating delta (scaled)
+    rating_delta_pos = max(recent_avg - lifetime_avg, 0.0)
+    return 0.7 * recent_reviews + 0.2 * recent_avg * 5.0 + 0.1 * rating_delta_pos * 10.0
+
+
+def bump_bucket(product_id, day, count_delta=0, sum_delta=0):
+    """Add deltas to one daily bucket, creating it on first use"""
+    if not count_delta and not sum_delta:
+        return
+    updates = {
+        "review_count": F("review_count") + count_delta,
+        "rating_sum": F("rating_sum") + sum_delta,
+    }
+    buckets = ProductDailyStats.objects.filter(product_id=product_id, day=day)
+    if buckets.update(**updates) or count_delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            ProductDailyStats.objects.create(
+                product_id=product_id, day=day, review_count=count_delta, rating_sum=sum_delta,
+            )
+    except IntegrityError:
+        # a concurrent writer created the bucket first
+        buckets.update(**updates)
+
+
+def record_rating_change(product_id, created_at, old=None, new=None):
+    """Apply one review going from `old` to `new` stars (None = no review) to its bucket"""
+    bump_bucket(
+        product_id,
+        timezone.localdate(created_at),
+        count_delta=(new is not None) - (old is not None),
+        sum_delta=(new or 0) - (old or 0),
+    )
+
+
+def rebuild_buckets(batch_size=2000):
+    """Regenerate every daily bucket from the reviews table"""
+    rows = (
+        Review.objects.annotate(day=TruncDate("created_at"))
+        .values("product_id", "day")
+        .order_by()
+        .annotate(review_count=Count("id"), rating_sum=Sum("rating"))
+    )
+    with transaction.atomic():
+        ProductDailyStats.objects.all().delete()
+        ProductDailyStats.objects.bulk_create(
+            (ProductDailyStats(**row) for row in rows.iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
+    return ProductDailyStats.objects.count()
+
+
+def compute_window(days, now=None):
+    """Score every product with activity in the last `days` days; returns rows sorted best first"""
+    now = now or timezone.now()
+    since = timezone.localdate(now) - timedelta(days=days)
+    rows = (
+        ProductDailyStats.objects.filter(day__gt=since, product__has_image=True)
+        .values("product_id", "product__category", "product__rating_avg")
+        .order_by()
+        .annotate(recent_reviews=Sum("review_count"), recent_sum=Sum("rating_sum"))
+    )
+    scored = []
+    for row in rows.iterator():
+        if not row["recent_reviews"]:
+            continue
+        recent_avg = row["recent_sum"] / row["recent_reviews"]
+        scored.append({
+            "product_id": row["product_id"],
+            "category": row["product__category"],
+            "recent_reviews": row["recent_reviews"],
+            "recent_avg": recent_avg,
+            "score": trending_score(row["recent_reviews"], recent_avg, row["product__rating_avg"]),
+        })
+    scored.sort(key=lambda r: (-r["score"], -r["recent_reviews"], -r["product_id"]))
+    return scored
+
+
+def compute_scores(windows=WINDOWS, now=None):
+    """Recompute and store the ranked top-N lists; returns the number of rows written"""
+    now = now or timezone.now()
+    limit = top_n()
+    written = 0
+    for days in windows:
+        scored = compute_window(days, now)
+        ranked = {"": scored[:limit]}
+        for category, _ in Product.CATEGORY_CHOICES:
+            ranked[category] = [r for r in scored if r["category"] == category][:limit]
+
+        rows = [
+            TrendingScore(
+                window_days=days, category=category, rank=rank, product_id=r["product_id"],
+                score=r["score"], recent_reviews=r["recent_reviews"], recent_avg=r["recent_avg"],
+                computed_at=now,
+            )
+            for category, entries in ranked.items()
+            for rank, r in enumerate(entries, start=1)
+        ]
+        with transaction.atomic():
+            TrendingScore.objects.filter(window_days=days).delete()
+            TrendingScore.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    caching.bump("trending")
+    return written
+
+
+def live_ranking(days, category="", now=None):
+    """The top-N entries compute_scores would store for one window and category"""
+    scored = compute_window(days, now)
+    if category:
+        scored = [r for r in scored if r["category"] == category]
+    return scored[:top_n()]
+
+
+def _by_product(entries, key, output_field):
+    return Case(*[When(pk=r["product_id"], then=Value(key(rank, r))) for rank, r in enumerate(entries, start=1)],
+                output_field=output_field)
+
+
+def trending_products(days, category=""):
+    """
+    Products ranked for one window, annotated with rank and the template's
+    score attributes: from TrendingScore, or live while compute_trending
+    hasn't stored the window yet (e.g. right after deploy)
+    """
+    if not TrendingScore.objects.filter(window_days=days).exists():
+        entries = live_ranking(days, category)
+        return (
+            Product.objects.filter(pk__in=[r["product_id"] for r in entries])
+            .annotate(
+                rank=_by_product(entries, lambda rank, r: rank, IntegerField()),
+                trending_score=_by_product(entries, lambda rank, r: r["score"], FloatField()),
+                recent_reviews=_by_product(entries, lambda rank, r: r["recent_reviews"], IntegerField()),
+                recent_avg=_by_product(entries, lambda rank, r: r["recent_avg"], FloatField()),
+            )
+            .order_by("rank")
+        )
+    return (
+        Product.objects.filter(trending_scores__window_days=days, trending_scores__category=category)
+        .annotate(
+            rank=F("trending_scores__rank"),
+            trending_score=F("trending_scores__score"),
+            recent_reviews=F("trending_scores__recent_reviews"),
+            recent_avg=F("trending_scores__recent_avg"),
+        )
+        .order_by("rank")
+    )
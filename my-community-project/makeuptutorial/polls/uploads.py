@@ -0,0 +1,173 @@
+"""
+Post-upload processing for review photos, videos and receipts.
+
+The request only stores the raw upload and marks the ReviewMedia row
+"processing"; these jobs (run by `manage.py run_jobs`) then:
+
+- dedupe: an upload byte-identical to an earlier one reuses its stored files
+- photos: apply the EXIF orientation, strip metadata (GPS etc.), cap the
+  long edge at REVIEW_PHOTO_MAX_EDGE and write a small WebP thumbnail
+- videos: grab a poster frame with ffmpeg, when it is installed
+- receipts: strip metadata from image receipts (PDFs are left alone)
+"""
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import Review, ReviewMedia
+
+THUMBNAIL_EDGE = 480
+
+
+def photo_max_edge():
+    return getattr(settings, "REVIEW_PHOTO_MAX_EDGE", 2048)
+
+
+def file_checksum(field_file):
+    digest = hashlib.sha256()
+    with field_file.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stem(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def clean_image(data, max_edge=None):
+    """
+    Re-encode image bytes upright and without metadata, optionally capping
+    the long edge. Returns (bytes, extension).
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    if image.mode in ("RGBA", "LA", "P"):
+        image.save(buffer, format="PNG", optimize=True)  # keep transparency
+        return buffer.getvalue(), "png"
+    image.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buffer.getvalue(), "jpg"
+
+
+def thumbnail_bytes(image):
+    image = image.copy()
+    image.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=75)
+    return buffer.getvalue()
+
+
+def video_poster(path, at_seconds=1):
+    """JPEG bytes of one frame of the video at `path`, or None without ffmpeg"""
+    ffmpeg = shutil.which(getattr(settings, "FFMPEG_BINARY", "ffmpeg"))
+    if not ffmpeg:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "poster.jpg")
+        for seek in (at_seconds, 0):  # clips shorter than the seek point: take the first frame
+            subprocess.run(
+                [ffmpeg, "-loglevel", "error", "-y", "-ss", str(seek), "-i", path,
+                 "-frames:v", "1", "-vf", f"scale='min({THUMBNAIL_EDGE},iw)':-2", out],
+                check=False, timeout=60, capture_output=True,
+            )
+            if os.path.exists(out) and os.path.getsize(out):
+                with open(out, "rb") as fh:
+                    return fh.read()
+    return None
+
+
+def _reuse_duplicate(media):
+    """Point `media` at an earlier identical upload's files; True if one was found"""
+    original = (
+        ReviewMedia.objects.filter(checksum=media.checksum, kind=media.kind, status=ReviewMedia.READY)
+        .exclude(pk=media.pk).order_by("id").first()
+    )
+    if original is None:
+        return False
+    upload = media.file.name
+    media.file.name, media.thumbnail.name = original.file.name, original.thumbnail.name
+    if upload != original.file.name:
+        media.file.storage.delete(upload)
+    return True
+
+
+def _process_photo(media):
+    with media.file.open("rb") as fh:
+        data = fh.read()
+    cleaned, ext = clean_image(data, photo_max_edge())
+    upload = media.file.name
+    media.file.save(f"{_stem(upload)}.{ext}", ContentFile(cleaned), save=False)
+    media.file.storage.delete(upload)
+    thumb = thumbnail_bytes(Image.open(io.BytesIO(cleaned)))
+    media.thumbnail.save(f"{_stem(upload)}.webp", ContentFile(thumb), save=False)
+
+
+def _process_video(media):
+    poster = video_poster(media.file.path)
+    if poster:
+        media.thumbnail.save(f"{_stem(media.file.name)}.jpg", ContentFile(poster), save=False)
+
+
+@jobs.task("process_review_media")
+def process_review_media(media_id):
+    media = ReviewMedia.objects.filter(pk=media_id).first()
+    if media is None or media.status == ReviewMedia.READY:
+        return  # review deleted meanwhile, or already done
+    media.checksum = file_checksum(media.file)
+    if not _reuse_duplicate(media):
+        try:
+            if media.kind == ReviewMedia.PHOTO:
+                _process_photo(media)
+            else:
+                _process_video(media)
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            # not something we can decode: retrying won't help
+            media.status = ReviewMedia.FAILED
+            media.save(update_fields=["checksum", "status"])
+            _touch_review(media)
+            return
+    media.status = ReviewMedia.READY
+    media.save(update_fields=["file", "thumbnail", "checksum", "status"])
+    _touch_review(media)
+
+
+def _touch_review(media):
+    # the review's media count changed: let incremental exports see it
+    Review.objects.filter(pk=media.review_id).update(updated_at=timezone.now())
+
+
+@jobs.task("process_receipt")
+def process_receipt(review_id):
+    review = Review.objects.filter(pk=review_id).only("id", "receipt").first()
+    if review is None or not review.receipt:
+        return
+    with review.receipt.open("rb") as fh:
+        data = fh.read()
+    try:
+        cleaned, ext = clean_image(data)
+    except UnidentifiedImageError:
+        return  # PDF or other document: kept as uploaded
+    upload = review.receipt.name
+    review.receipt.save(f"{_stem(upload)}.{ext}", ContentFile(cleaned), save=False)
+    review.receipt.storage.delete(upload)
+    # a plain UPDATE: the review itself didn't change, so skip its save signals
+    Review.objects.filter(pk=review_id).update(receipt=review.receipt.name)
+
+
+def enqueue_media(media):
+    return jobs.enqueue("process_review_media", media_id=media.pk)
+
+
+def enqueue_receipt(review):
+    return jobs.enqueue("process_receipt", review_id=review.pk)
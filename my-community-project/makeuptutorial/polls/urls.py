@@ -3,13 +3,19 @@ from django.conf.urls.static import static
 
 
 from django.urls import path
-from . import views
+from . import api, async_views, metrics, views
+
+# the ASGI deployment serves the hot read pages with async views
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
-    path("", views.ProductList.as_view(), name="product-list"),
-    path("products/", views.ProductBrowse.as_view(), name="products"),
+    path("", read_views.ProductList.as_view(), name="product-list"),
+    path("products/", read_views.ProductBrowse.as_view(), name="products"),
     path("products/new/", views.ProductCreate.as_view(), name="product-create"),
-    path("products/<int:pk>/", views.ProductDetail.as_view(), name="product-detail"),
+    path("products/<int:pk>/", read_views.ProductDetail.as_view(), name="product-detail"),
+    path("products/<int:pk>/reviews/feed/", views.ProductReviewFeed.as_view(), name="product-review-feed"),
+    path("products/<int:pk>/image/<slug:preset>-<int:width>.<slug:fmt>", views.ProductImageVariant.as_view(),
+         name="product-image"),
     path("products/<int:pk>/edit/", views.ProductUpdate.as_view(), name="product-update"),
     path("products/<int:pk>/delete/", views.ProductDelete.as_view(), name="product-delete"),
 
@@ -23,7 +29,15 @@ urlpatterns = [
     path("missions/", views.MissionsView.as_view(), name="missions"),
     path("logout/", views.CustomLogoutView.as_view(), name="logout"),
     path("about/", views.AboutView.as_view(), name="about"),
-    path("trends/", views.TrendsView.as_view(), name="trends"),
+    path("trends/", read_views.TrendsView.as_view(), name="trends"),
+    path("exports/reviews.<slug:fmt>", views.ReviewExport.as_view(), name="review-export"),
+    path("metrics/", metrics.MetricsView.as_view(), name="metrics"),
+
+    # read-only JSON API (see polls/api.py)
+    path("api/v1/products/", api.ProductListApi.as_view(), name="api-products"),
+    path("api/v1/products/<int:pk>/", api.ProductDetailApi.as_view(), name="api-product"),
+    path("api/v1/products/<int:pk>/reviews/", api.ProductReviewsApi.as_view(), name="api-product-reviews"),
+    path("api/v1/trends/", api.TrendsApi.as_view(), name="api-trends"),
 ]
 
 
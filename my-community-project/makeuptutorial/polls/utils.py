@@ -0,0 +1,12 @@
+"""
+Small helpers shared by modules that have nothing else in common
+(the bulk seeder, fixtures and exports).
+"""
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Consecutive lists of up to `size` items (itertools.batched before Python 3.12, as lists)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
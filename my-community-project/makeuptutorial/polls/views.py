@@ -1,51 +1,56 @@
-from django.shortcuts import render
-import os
-
 # Create your views here.
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
+from django.utils.dateparse import parse_datetime
 from django.views import generic
-from .models import Product, Review, WearTest, ReviewHelpfulness
+from .models import Product, Review, WearTest
 from django.views.generic import TemplateView, ListView
-from django.contrib.auth import get_user_model
-from datetime import timedelta
-from django.utils import timezone
-from django.db.models import Avg, Count, Q, F, Value, FloatField, Case, When
-from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.db.models import Avg, Count
 from django.contrib import messages
-from .forms import ReviewForm, ReviewMediaFormSet, ReviewHelpfulnessForm
-from django.contrib.auth.forms import UserCreationForm
+from .forms import ReviewForm, ReviewMediaFormSet
 from django.contrib.auth import login, logout
 from django.views.generic import FormView
 from .forms import SignUpForm 
+from . import caching, exports, images, search, stats as site_stats, trending, votes
+from .caching import CachedPageMixin
+from .pagination import InvalidCursor, keyset_page
+
+def wants_json(request):
+    """AJAX callers (fetch/XHR or Accept: application/json) get JSON instead of a redirect"""
+    return (
+        request.headers.get("x-requested-with") == "XMLHttpRequest"
+        or "application/json" in request.headers.get("accept", "")
+    )
+
 
-class ProductList(generic.ListView):
+class ProductList(CachedPageMixin, generic.ListView):
     model = Product
     template_name = "polls/home.html"      # use a dedicated home template
-    paginate_by = 12
+    paginate_by = None  # the home page shows only the counters: don't count the catalog for nothing
+
+    def get_cache_scopes(self):
+        return caching.listing_scopes()
 
     def get_queryset(self):
-        qs = Product.objects.all().annotate(
-            avg_rating=Avg("reviews__rating"),
-            reviews_count=Count("reviews"),
-        )
-        return qs.order_by("-id")  # newest first
+        return Product.objects.order_by("-id")  # newest first
+
+    def get_kpis(self):
+        return site_stats.get_site_stats("products", "reviews", "users")
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         
         # Add KPI data for homepage
-        ctx["kpi_products"] = Product.objects.count()
-        ctx["kpi_reviews"] = Review.objects.count()
-        ctx["kpi_users"] = get_user_model().objects.count()
+        kpis = self.get_kpis()
+        ctx["kpi_products"] = kpis["products"]
+        ctx["kpi_reviews"] = kpis["reviews"]
+        ctx["kpi_users"] = kpis["users"]
         
         return ctx
 
-class ProductDetail(generic.DetailView):
-    model = Product
-    template_name = "polls/product_detail.html"
-
 class ProductCreate(LoginRequiredMixin, generic.CreateView):
     model = Product
     fields = ["brand","name","category","price"]
@@ -64,7 +69,13 @@ class ProductDelete(LoginRequiredMixin, generic.DeleteView):
     success_url = reverse_lazy("product-list")
 
 class AuthorRequiredMixin(UserPassesTestMixin):
-    def test_func(self): return self.get_object().user == self.request.user
+    def get_object(self, queryset=None):
+        # test_func and the view both ask for it: load it once
+        if not hasattr(self, "_object"):
+            self._object = super().get_object(queryset)
+        return self._object
+
+    def test_func(self): return self.get_object().user_id == self.request.user.pk
 
 
 class ReviewUpdate(LoginRequiredMixin, AuthorRequiredMixin, generic.UpdateView):
@@ -73,47 +84,60 @@ class ReviewUpdate(LoginRequiredMixin, AuthorRequiredMixin, generic.UpdateView):
     template_name = "polls/form.html"
     def get_success_url(self): return reverse("product-detail", args=[self.object.product_id])
 
+    @transaction.atomic  # review row + product rating summary
+    def form_valid(self, form): return super().form_valid(form)
+
 class ReviewDelete(LoginRequiredMixin, AuthorRequiredMixin, generic.DeleteView):
     model = Review
     template_name = "polls/confirm_delete.html"
     def get_success_url(self): return reverse("product-detail", args=[self.object.product_id])
 
+    @transaction.atomic  # review row + product rating summary
+    def form_valid(self, form): return super().form_valid(form)
+
 
 
 
 
 # About
-class AboutView(TemplateView):
+class AboutView(CachedPageMixin, TemplateView):
     template_name = "polls/about.html"
+    cache_params = ()  # static apart from the KPI counters, which may lag by PAGE_CACHE_TIMEOUT
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        User = get_user_model()
+        kpis = site_stats.get_site_stats("products", "reviews", "users")
         ctx.update({
-            "kpi_products": Product.objects.count(),
-            "kpi_reviews": Review.objects.count(),
-            "kpi_users": User.objects.count(),
+            "kpi_products": kpis["products"],
+            "kpi_reviews": kpis["reviews"],
+            "kpi_users": kpis["users"],
         })
         return ctx
     
 
 # Product page
-class ProductBrowse(ListView):
+class ProductBrowse(CachedPageMixin, ListView):
     model = Product
     template_name = "polls/products.html"
     paginate_by = 12
+    cache_params = ("q", "category", "min", "max", "sort", "page")
+    conditional_get = True
+
+    def get_cache_scopes(self):
+        # the hero's review counters move with reviews in any category
+        return [*caching.listing_scopes(self.request.GET.get("category") or ""), caching.category_scope("")]
+
+    def get_sort(self):
+        # best match first when searching, highest rated otherwise
+        default = "relevance" if self.request.GET.get("q") else "rating"
+        return self.request.GET.get("sort") or default
+
+    def get_kpis(self):
+        return site_stats.get_site_stats("reviews", "active_reviewers")
 
     def get_queryset(self):
-        qs = (
-            Product.objects.all()
-            .annotate(
-                avg_rating=Avg("reviews__rating"),
-                reviews_count=Count("reviews"),
-            )
-        )
-        q = self.request.GET.get("q")
-        if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(brand__icontains=q) | Q(category__icontains=q))
+        # Hide products whose image isn't a shipped asset (flag kept by Product.save / sync_image_assets)
+        qs = Product.objects.filter(has_image=True)
 
         cat = self.request.GET.get("category") or ""
         if cat:
@@ -127,28 +151,28 @@ class ProductBrowse(ListView):
         if pmax:
             qs = qs.filter(price__lte=pmax)
 
-        sort = self.request.GET.get("sort") or "rating"
+        q = self.request.GET.get("q")
+        matches = []
+        if q:
+            # ranked product ids from the full-text index (see polls/search.py),
+            # taken among the filtered products so the result limit doesn't drop any
+            matches = search.search_products(q, within=qs)
+            qs = qs.filter(pk__in=matches)
+
+        sort = self.get_sort()
+        if sort == "relevance" and matches:
+            return qs.order_by(search.relevance(matches))
+
         sort_map = {
             "newest": "-id",
-            "rating": "-avg_rating",
-            "reviewed": "-reviews_count",
+            "rating": "-rating_avg",
+            "reviewed": "-rating_count",
             "price_asc": "price",
             "price_desc": "-price",
             "name": "name",
         }
-        ordered = list(qs.order_by(sort_map.get(sort, "-id")))
-
-        # Filter out products whose image file does not exist
-        def has_image_file(prod: Product) -> bool:
-            url = (prod.image_url or "").strip()
-            if not url or not url.startswith("/static/"):
-                return False
-            # Map '/static/...' -> polls/static/...
-            static_rel = url.split("/static/", 1)[1]
-            abs_path = os.path.join(os.path.dirname(__file__), "static", static_rel)
-            return os.path.exists(abs_path)
-
-        return [p for p in ordered if has_image_file(p)]
+        # "-id" breaks ties so LIMIT/OFFSET pages don't overlap
+        return qs.order_by(*dict.fromkeys([sort_map.get(sort, "-id"), "-id"]))
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -163,89 +187,47 @@ class ProductBrowse(ListView):
         ctx["selected_category"] = self.request.GET.get("category", "")
         ctx["price_min"] = self.request.GET.get("min", "")
         ctx["price_max"] = self.request.GET.get("max", "")
-        ctx["sort"] = self.request.GET.get("sort", "rating")
+        ctx["sort"] = self.get_sort()
         
         # Add statistics for the hero section
-        ctx["total_reviews"] = Review.objects.count()
-        ctx["active_reviewers"] = get_user_model().objects.filter(reviews__isnull=False).distinct().count()
+        kpis = self.get_kpis()
+        ctx["total_reviews"] = kpis["reviews"]
+        ctx["active_reviewers"] = kpis["active_reviewers"]
         
         return ctx
     
 
 # Trend page
-class TrendsView(ListView):
+class TrendsView(CachedPageMixin, ListView):
     model = Product
     template_name = "polls/trends.html"
     paginate_by = 12
+    cache_params = ("days", "category", "page")
+    conditional_get = True
 
-    def get_queryset(self):
-        # window size (days) – defaults to 30, accepts 7/14/30/60 via ?days=
+    def get_cache_scopes(self):
+        return ["trending", *caching.listing_scopes(self.request.GET.get("category") or "")]
+
+    def get_days(self):
+        # window size (days) – defaults to 30, snapped to the precomputed 7/14/30/60 via ?days=
         try:
-            days = int(self.request.GET.get("days", 30))
+            days = int(self.request.GET.get("days", trending.DEFAULT_WINDOW))
         except ValueError:
-            days = 30
-        days = max(1, min(days, 90))
-        since = timezone.now() - timedelta(days=days)
+            days = trending.DEFAULT_WINDOW
+        return trending.snap_window(days)
 
+    def get_queryset(self):
+        # ranked lists are precomputed by `manage.py compute_trending` (scored live until its first run)
         cat = self.request.GET.get("category") or ""
-
-        qs = (
-            Product.objects.all()
-            .annotate(
-                reviews_count=Count("reviews"),
-                recent_reviews=Count("reviews", filter=Q(reviews__created_at__gte=since)),
-                avg_rating=Coalesce(Avg("reviews__rating"), Value(0.0)),
-                recent_avg=Coalesce(Avg("reviews__rating", filter=Q(reviews__created_at__gte=since)), Value(0.0)),
-            )
-        )
-
-        # positive rating delta (recent vs lifetime), negatives clamp to 0
-        qs = qs.annotate(
-            rating_delta_pos=Case(
-                When(recent_avg__gt=F("avg_rating"), then=F("recent_avg") - F("avg_rating")),
-                default=Value(0.0),
-                output_field=FloatField(),
-            )
-        )
-
-        # trending score (tweak weights if you like)
-        # 0.7 * recent review count  +  0.2 * recent average (scaled)  +  0.1 * positive rating delta (scaled)
-        qs = qs.annotate(
-            trending_score=(
-                0.7 * F("recent_reviews")
-                + 0.2 * F("recent_avg") * 5.0
-                + 0.1 * F("rating_delta_pos") * 10.0
-            )
-        )
-
-        if cat:
-            qs = qs.filter(category=cat)
-
-        ordered = list(qs.order_by("-trending_score", "-recent_reviews", "-id"))
-
-        def has_image_file(prod: Product) -> bool:
-            url = (prod.image_url or "").strip()
-            if not url or not url.startswith("/static/"):
-                return False
-            static_rel = url.split("/static/", 1)[1]
-            abs_path = os.path.join(os.path.dirname(__file__), "static", static_rel)
-            return os.path.exists(abs_path)
-
-        return [p for p in ordered if has_image_file(p)]
+        return trending.trending_products(self.get_days(), cat)
 
     
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        # parse days as an int for clean comparisons
-        try:
-            selected_days = int(self.request.GET.get("days", 30))
-        except ValueError:
-            selected_days = 30
-
         ctx.update({
-            "days": selected_days,                                  # int
-            "day_options": [7, 14, 30, 60],                         # <-- pass list to template
+            "days": self.get_days(),                                # int
+            "day_options": trending.WINDOWS,                        # <-- pass list to template
             "categories": dict(Product._meta.get_field("category").choices),
             "selected_category": self.request.GET.get("category", ""),
         })
@@ -272,17 +254,21 @@ class ReviewCreate(LoginRequiredMixin, generic.View):
         form = ReviewForm(request.POST, request.FILES)
         formset = ReviewMediaFormSet(request.POST, request.FILES)
         if form.is_valid() and formset.is_valid():
-            review = form.save(commit=False)
-            review.user = request.user
-            review.product = product
-            review.save()
-            # save media
-            formset.instance = review
-            formset.save()
-            # optional wear test
-            if form.cleaned_data.get("start_wear_test"):
-                WearTest.objects.create(review=review)
-            messages.success(request, "Thanks! Your review has been posted.")
+            with transaction.atomic():  # review row + product rating summary
+                review = form.save(commit=False)
+                review.user = request.user
+                review.product = product
+                review.save()
+                # save media (resizing/thumbnails happen in a background job, see polls.uploads)
+                formset.instance = review
+                formset.save()
+                # optional wear test
+                if form.cleaned_data.get("start_wear_test"):
+                    WearTest.objects.create(review=review)
+            if formset.new_objects:
+                messages.success(request, "Thanks! Your review has been posted. Your photos and videos will appear once they're processed.")
+            else:
+                messages.success(request, "Thanks! Your review has been posted.")
             return redirect("product-detail", pk=product.pk)
         return render(request, self.template_name, {"product": product, "form": form, "formset": formset})
     
@@ -294,65 +280,141 @@ class ReviewHelpfulnessView(LoginRequiredMixin, generic.View):
     """Handle helpful/not helpful votes on reviews"""
     
     def post(self, request, review_id):
-        review = get_object_or_404(Review, pk=review_id)
+        review = get_object_or_404(Review.objects.only("id", "product_id"), pk=review_id)
         is_helpful = request.POST.get('is_helpful') == 'true'
-        
-        # Get or create the helpfulness vote
-        vote, created = ReviewHelpfulness.objects.get_or_create(
-            review=review,
-            user=request.user,
-            defaults={'is_helpful': is_helpful}
-        )
-        
-        if not created:
-            # Update existing vote
-            vote.is_helpful = is_helpful
-            vote.save()
-        
-        # Update review helpful votes count
-        helpful_count = review.helpfulness_votes.filter(is_helpful=True).count()
-        not_helpful_count = review.helpfulness_votes.filter(is_helpful=False).count()
-        
-        review.helpful_votes = helpful_count
-        review.save()
-        
-        return redirect('product-detail', pk=review.product.pk)
+        votes.cast_vote(review.pk, request.user.pk, is_helpful)
+
+        if wants_json(request):
+            return JsonResponse(votes.vote_totals(review.pk))
+        return redirect('product-detail', pk=review.product_id)
 
 
 # Wear Test Controls
 
 # Enhanced Product Detail with Review Statistics
-class ProductDetail(generic.DetailView):
+REVIEW_FEED_ORDERING = ["-created_at", "-id"]
+
+def review_feed_page(product, cursor=None, size=10):
+    """One keyset page of a product's reviews, with authors and media loaded up front"""
+    reviews = product.reviews.select_related("user").prefetch_related("media")
+    return keyset_page(reviews, REVIEW_FEED_ORDERING, cursor, size)
+
+
+class ProductDetail(CachedPageMixin, generic.DetailView):
     model = Product
     template_name = "polls/product_detail.html"
+    review_page_size = 10
+    cache_params = ("after",)
+    conditional_get = True
+
+    def get_cache_scopes(self):
+        return [caching.product_scope(self.kwargs["pk"])]
     
+    def get_review_page(self):
+        try:
+            return review_feed_page(self.object, self.request.GET.get("after"), self.review_page_size)
+        except InvalidCursor:
+            return review_feed_page(self.object, None, self.review_page_size)
+
+    def get_user_review(self):
+        """The viewer's own review of this product, if any"""
+        return self.object.reviews.filter(user=self.request.user).only("pk").first()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
-        
-        # Get review statistics
-        reviews = product.reviews.all()
+        product = self.object
+        reviews, next_cursor = self.get_review_page()
+
+        # Header statistics come from the product row's stored rating summary
         context.update({
             'reviews': reviews,
-            'review_count': reviews.count(),
+            'next_cursor': next_cursor,
+            'review_count': product.review_count,
             'average_rating': product.average_rating,
             'rating_distribution': product.rating_distribution,
-            'verified_reviews': reviews.filter(is_verified_purchase=True),
-            'recent_reviews': reviews[:5],  # Last 5 reviews
         })
         
         # Check if user has already reviewed this product
         if self.request.user.is_authenticated:
-            context['user_has_reviewed'] = reviews.filter(user=self.request.user).exists()
-            context['user_review'] = reviews.filter(user=self.request.user).first()
+            user_review = self.get_user_review()
+            context['user_has_reviewed'] = user_review is not None
+            context['user_review'] = user_review
         
         return context
 
+
+class ProductReviewFeed(generic.View):
+    """Next page of a product's reviews as an HTML fragment ("load more")"""
+    template_name = "polls/_review_feed.html"
+
+    def get(self, request, pk):
+        product = get_object_or_404(Product, pk=pk)
+        try:
+            reviews, next_cursor = review_feed_page(product, request.GET.get("after"), ProductDetail.review_page_size)
+        except InvalidCursor:
+            return HttpResponseBadRequest("Invalid cursor")
+        return render(request, self.template_name, {
+            "object": product, "reviews": reviews, "next_cursor": next_cursor, "is_continuation": True,
+        })
+
+
+class ProductImageVariant(generic.View):
+    """
+    Lazy image variants: build the product's set on first request, then
+    redirect to the requested size/format (the original if it can't be made).
+    Without IMAGE_VARIANTS_LAZY nothing is encoded here, only existing
+    variants are served.
+    """
+
+    def get(self, request, pk, preset, width, fmt):
+        if preset not in images.PRESETS or fmt not in images.FORMATS:
+            raise Http404("Unknown image variant")
+        product = get_object_or_404(Product.objects.only("id", "image_url", "image_variants"), pk=pk)
+        variants = images.current_variants(product)
+        if variants is None and images.lazy_enabled():
+            variants = images.refresh_product(product)
+        url = images.variant_url(variants or {}, preset, fmt, width) or product.image_src
+        if not url:
+            raise Http404("Product has no image")
+        return redirect(url)
+
+
+class ReviewExport(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+    """
+    Staff-only streaming export of reviews (see polls/exports.py).
+    ?since=<the X-Export-Until of the previous download> for an incremental one.
+    """
+    streamed = {"csv": exports.csv_chunks, "ndjson": exports.ndjson_chunks}
+
+    def test_func(self): return self.request.user.is_staff
+
+    def get(self, request, fmt):
+        if fmt not in self.streamed:
+            raise Http404("Unknown export format")
+        since = None
+        if request.GET.get("since"):
+            since = parse_datetime(request.GET["since"])
+            if since is None or since.tzinfo is None:
+                return HttpResponseBadRequest("since must be an ISO 8601 datetime with a time zone")
+        since, until = exports.export_window(since)
+        response = StreamingHttpResponse(
+            self.streamed[fmt](exports.review_rows(since, until)),
+            content_type=f"{exports.FORMATS[fmt]}; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="reviews-{until:%Y%m%dT%H%M%SZ}.{fmt}"'
+        response["X-Export-Until"] = until.isoformat()
+        return response
+
 # Review List with Filtering
-class ReviewListView(generic.ListView):
+class ReviewListView(CachedPageMixin, generic.ListView):
     model = Review
     template_name = "polls/review_list.html"
     paginate_by = 10
+    cache_params = ("rating", "verified", "skin_type", "sort", "page")
+    conditional_get = True
+
+    def get_cache_scopes(self):
+        return [caching.product_scope(self.kwargs.get("product_id"))]
     
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
@@ -360,6 +422,7 @@ class ReviewListView(generic.ListView):
             qs = Review.objects.filter(product_id=product_id)
         else:
             qs = Review.objects.all()
+        qs = qs.select_related('user').prefetch_related('media')
         
         # Filter by rating
         rating = self.request.GET.get('rating')
@@ -390,7 +453,11 @@ class ReviewListView(generic.ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('page', None)
         context.update({
+            'product': get_object_or_404(Product.objects.only('id', 'brand', 'name'), pk=self.kwargs.get('product_id')),
+            'qs': params.urlencode(),
             'product_id': self.kwargs.get('product_id'),
             'rating_choices': [(i, f'{i} star{"s" if i != 1 else ""}') for i in range(1, 6)],
             'skin_type_choices': [
@@ -421,16 +488,16 @@ class UserProfileView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Review.objects.filter(user=self.request.user).select_related('product').order_by('-created_at')
+        return (Review.objects.filter(user=self.request.user).select_related('product')
+                .prefetch_related('media').order_by('-created_at'))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         context['user'] = user
-        context['total_reviews'] = Review.objects.filter(user=user).count()
-        context['average_rating'] = Review.objects.filter(user=user).aggregate(
-            avg_rating=Avg('rating')
-        )['avg_rating'] or 0
+        totals = Review.objects.filter(user=user).aggregate(count=Count('id'), avg_rating=Avg('rating'))
+        context['total_reviews'] = totals['count']
+        context['average_rating'] = totals['avg_rating'] or 0
         return context
 
 # Custom Logout View
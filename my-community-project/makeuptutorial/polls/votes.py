@@ -0,0 +1,65 @@
+"""
+Helpful / not helpful votes on reviews.
+
+Review.helpful_votes and Review.not_helpful_votes are running totals kept
+next to the ReviewHelpfulness rows: each vote writes its own row and moves
+the totals with one UPDATE ... SET col = col + n, instead of recounting
+every vote on the review.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caching
+from .models import Review, ReviewHelpfulness
+
+
+def cast_vote(review_id, user_id, is_helpful):
+    """
+    Record a user's vote on a review. Returns the (helpful, not_helpful)
+    deltas applied: (0, 0) when the user had already voted the same way.
+    """
+    with transaction.atomic():
+        # changing sides flips the existing row in place
+        flipped = ReviewHelpfulness.objects.filter(
+            review_id=review_id, user_id=user_id, is_helpful=not is_helpful,
+        ).update(is_helpful=is_helpful)
+        if flipped:
+            deltas = (1, -1) if is_helpful else (-1, 1)
+            # no post_save for an UPDATE, so invalidate here (new votes go through the signal)
+            transaction.on_commit(lambda: caching.review_changed(review_id))
+        else:
+            try:
+                with transaction.atomic():
+                    ReviewHelpfulness.objects.create(review_id=review_id, user_id=user_id, is_helpful=is_helpful)
+            except IntegrityError:
+                return 0, 0  # same vote already recorded (or a concurrent duplicate)
+            deltas = (1, 0) if is_helpful else (0, 1)
+
+        Review.objects.filter(pk=review_id).update(
+            helpful_votes=F("helpful_votes") + deltas[0],
+            not_helpful_votes=F("not_helpful_votes") + deltas[1],
+            updated_at=timezone.now(),  # .update() skips auto_now; exports pick changes up by it
+        )
+    return deltas
+
+
+def vote_totals(review_id):
+    """Current totals for a review, as returned to AJAX callers"""
+    totals = Review.objects.filter(pk=review_id).values("helpful_votes", "not_helpful_votes").get()
+    votes = totals["helpful_votes"] + totals["not_helpful_votes"]
+    totals["helpful_percentage"] = round(100 * totals["helpful_votes"] / votes, 1) if votes else 0
+    return totals
+
+
+def rebuild_vote_totals():
+    """Recount every review's totals from the vote rows; returns the reviews updated"""
+    def count(is_helpful):
+        votes = ReviewHelpfulness.objects.filter(review=OuterRef("pk"), is_helpful=is_helpful)
+        return Coalesce(Subquery(votes.values("review").annotate(n=Count("id")).values("n")), 0)
+
+    voted = Exists(ReviewHelpfulness.objects.filter(review=OuterRef("pk")))
+    return Review.objects.filter(voted | Q(helpful_votes__gt=0) | Q(not_helpful_votes__gt=0)).update(
+        helpful_votes=count(True), not_helpful_votes=count(False),
+    )
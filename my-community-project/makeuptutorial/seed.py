@@ -6,8 +6,12 @@ Idempotent seeder for The Makeup Community (Django).
 - Creates random reviews per product (one per user)
 
 Run:  python seed.py
+
+Load-test datasets (see polls/seeding.py), e.g.
+      python seed.py --bulk --users 100000 --products 2000 --reviews 5000000 --votes 1000000 --media 20000
 """
 
+import argparse
 import os
 import random
 from datetime import timedelta
@@ -19,375 +23,15 @@ import django  # noqa: E402
 django.setup()
 
 from django.contrib.auth import get_user_model  # noqa: E402
+from polls import search  # noqa: E402
+from polls.catalog import CatalogImporter  # noqa: E402
 from polls.models import Product, Review  # noqa: E402
+from polls.seeding import (  # noqa: E402
+    DEMO_PASSWORD, PRODUCTS, TITLES_BY_RATING, USERS, BulkSeeder, pick_snippet_for_rating,
+)
 
 User = get_user_model()
 
-DEMO_PASSWORD = "demo12345"  # login password for all demo users
-
-USERS = [
-    {"username": "aria", "email": "aria@example.com"},
-    {"username": "ben", "email": "ben@example.com"},
-    {"username": "cami", "email": "cami@example.com"},
-    {"username": "diego", "email": "diego@example.com"},
-    {"username": "fatima", "email": "fatima@example.com"},
-    {"username": "sophia", "email": "sophia@example.com"},
-    {"username": "maya", "email": "maya@example.com"},
-    {"username": "zoe", "email": "zoe@example.com"},
-    {"username": "luna", "email": "luna@example.com"},
-    {"username": "chloe", "email": "chloe@example.com"},
-    {"username": "emma", "email": "emma@example.com"},
-    {"username": "olivia", "email": "olivia@example.com"},
-    {"username": "ava", "email": "ava@example.com"},
-    {"username": "isabella", "email": "isabella@example.com"},
-    {"username": "mia", "email": "mia@example.com"},
-    {"username": "charlotte", "email": "charlotte@example.com"},
-    {"username": "amelia", "email": "amelia@example.com"},
-    {"username": "harper", "email": "harper@example.com"},
-    {"username": "evelyn", "email": "evelyn@example.com"},
-    {"username": "abigail", "email": "abigail@example.com"},
-]
-
-PRODUCTS = [
-    # Trending Lip Products
-    {
-        "brand": "Fenty Beauty",
-        "name": "Stunna Lip Paint in Uncensored",
-        "category": "lipstick",
-        "price": 25,
-        "image_url": "/static/img/products/Fenty Beauty — Stunna Lip Paint in Uncensored.jpg",
-    },
-    {
-        "brand": "Rare Beauty",
-        "name": "Liquid Lipstick in Brave",
-        "category": "lipstick",
-        "price": 22,
-        "image_url": "/static/img/products/Rare Beauty — Liquid Lipstick in Brave.webp",
-    },
-    {
-        "brand": "Glossier",
-        "name": "Generation G Matte Lipstick in Cake",
-        "category": "lipstick",
-        "price": 18,
-        "image_url": "/static/img/products/Glossier — Generation G Matte Lipstick in Cake.png",
-    },
-    {
-        "brand": "Charlotte Tilbury",
-        "name": "Pillow Talk Lipstick",
-        "category": "lipstick",
-        "price": 35,
-        "image_url": "/static/img/products/Charlotte Tilbury — Pillow Talk Lipstick.webp",
-    },
-    
-    # Trending Foundation & Base
-    {
-        "brand": "Fenty Beauty",
-        "name": "Pro Filt'r Soft Matte Foundation",
-        "category": "foundation",
-        "price": 38,
-        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Soft Matte Foundation.webp",
-    },
-    {
-        "brand": "Rare Beauty",
-        "name": "Liquid Touch Weightless Foundation",
-        "category": "foundation",
-        "price": 29,
-        "image_url": "/static/img/products/Rare Beauty — Liquid Touch Weightless Foundation.webp",
-    },
-    {
-        "brand": "NARS",
-        "name": "Light Reflecting Foundation",
-        "category": "foundation",
-        "price": 50,
-        "image_url": "/static/img/products/NARS — Light Reflecting Foundation.avif",
-    },
-    {
-        "brand": "Glossier",
-        "name": "Perfecting Skin Tint",
-        "category": "foundation",
-        "price": 26,
-        "image_url": "/static/img/products/Glossier — Perfecting Skin Tint.jpeg",
-    },
-    
-    # Trending Eyeshadow Palettes
-    {
-        "brand": "Anastasia Beverly Hills",
-        "name": "Modern Renaissance Palette",
-        "category": "eyeshadow",
-        "price": 45,
-        "image_url": "/static/img/products/Anastasia Beverly Hills — Modern Renaissance Palette.jpg",
-    },
-    {
-        "brand": "Urban Decay",
-        "name": "Naked Heat Eyeshadow Palette",
-        "category": "eyeshadow",
-        "price": 54,
-        "image_url": "/static/img/products/Urban Decay — Naked Heat Eyeshadow Palette.jpg",
-    },
-    {
-        "brand": "Huda Beauty",
-        "name": "Desert Dusk Eyeshadow Palette",
-        "category": "eyeshadow",
-        "price": 65,
-        "image_url": "/static/img/products/Huda Beauty — Desert Dusk Eyeshadow Palette.avif",
-    },
-    {
-        "brand": "Morphe",
-        "name": "35O2 Second Nature Eyeshadow Palette",
-        "category": "eyeshadow",
-        "price": 25,
-        "image_url": "/static/img/products/Morphe — 35O2 Second Nature Eyeshadow Palette.webp",
-    },
-    
-    # Trending Mascara & Lashes
-    {
-        "brand": "Too Faced",
-        "name": "Better Than Sex Mascara",
-        "category": "mascara",
-        "price": 26,
-        "image_url": "/static/img/products/Too Faced — Better Than Sex Mascara.avif",
-    },
-    {
-        "brand": "Benefit Cosmetics",
-        "name": "They're Real! Mascara",
-        "category": "mascara",
-        "price": 25,
-        "image_url": "/static/img/products/Benefit Cosmetics — They're Real! Mascara.avif",
-    },
-    {
-        "brand": "L'Oréal",
-        "name": "Lash Paradise Mascara",
-        "category": "mascara",
-        "price": 12,
-        "image_url": "/static/img/products/L'Oréal — Lash Paradise Mascara.jpg",
-    },
-    {
-        "brand": "Maybelline",
-        "name": "Sky High Mascara",
-        "category": "mascara",
-        "price": 9,
-        "image_url": "/static/img/products/Maybelline — Sky High Mascara.webp",
-    },
-    
-    # Trending Concealer & Corrector
-    {
-        "brand": "Tarte",
-        "name": "Shape Tape Concealer",
-        "category": "concealer",
-        "price": 27,
-        "image_url": "/static/img/products/Tarte — Shape Tape Concealer.jpg",
-    },
-    {
-        "brand": "NARS",
-        "name": "Radiant Creamy Concealer",
-        "category": "concealer",
-        "price": 32,
-        "image_url": "/static/img/products/NARS — Radiant Creamy Concealer.avif",
-    },
-    {
-        "brand": "Fenty Beauty",
-        "name": "Pro Filt'r Instant Retouch Concealer",
-        "category": "concealer",
-        "price": 25,
-        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Instant Retouch Concealer.avif",
-    },
-    
-    # Trending Blush & Highlighter
-    {
-        "brand": "Rare Beauty",
-        "name": "Soft Pinch Liquid Blush",
-        "category": "blush",
-        "price": 20,
-        "image_url": "/static/img/products/Rare Beauty — Soft Pinch Liquid Blush.webp",
-    },
-    {
-        "brand": "Fenty Beauty",
-        "name": "Cheeks Out Freestyle Cream Blush",
-        "category": "blush",
-        "price": 22,
-        "image_url": "/static/img/products/Fenty Beauty — Cheeks Out Freestyle Cream Blush.jpg",
-    },
-    {
-        "brand": "Glossier",
-        "name": "Cloud Paint in Puff",
-        "category": "blush",
-        "price": 18,
-        "image_url": "/static/img/products/Glossier — Cloud Paint in Puff.jpg",
-    },
-    {
-        "brand": "Fenty Beauty",
-        "name": "Killawatt Freestyle Highlighter",
-        "category": "highlighter",
-        "price": 38,
-        "image_url": "/static/img/products/Fenty Beauty — Killawatt Freestyle Highlighter.webp",
-    },
-    
-    # Trending Skincare-Makeup Hybrids
-    {
-        "brand": "Glossier",
-        "name": "Futuredew Oil-Serum Hybrid",
-        "category": "skincare",
-        "price": 24,
-        "image_url": "/static/img/products/Glossier — Futuredew Oil-Serum Hybrid.png",
-    },
-    {
-        "brand": "Rare Beauty",
-        "name": "Always an Optimist 4-in-1 Prime & Set Mist",
-        "category": "skincare",
-        "price": 22,
-        "image_url": "/static/img/products/Rare Beauty — Always an Optimist 4-in-1 Prime & Set Mist.webp",
-    },
-    {
-        "brand": "Fenty Beauty",
-        "name": "Pro Filt'r Instant Retouch Setting Powder",
-        "category": "powder",
-        "price": 32,
-        "image_url": "/static/img/products/Fenty Beauty — Pro Filt'r Instant Retouch Setting Powder.jpg",
-    },
-    
-    # --- New additions ---
-    {
-        "brand": "Kylie Cosmetics",
-        "name": "Matte Liquid Lipstick “Candy K”",
-        "category": "lipstick",
-        "price": 18,
-        "image_url": "/static/img/products/Kylie Cosmetics — Matte Liquid Lipstick “Candy K”.jpg",
-    },
-    {
-        "brand": "Kylie Cosmetics",
-        "name": "Velvet Lip Kit “Bare”",
-        "category": "lipstick",
-        "price": 29,
-        "image_url": "/static/img/products/Kylie Cosmetics — Velvet Lip Kit “Bare”.jpg",
-    },
-    {
-        "brand": "Kylie Cosmetics",
-        "name": "Kylash Volume Mascara",
-        "category": "mascara",
-        "price": 24,
-        "image_url": "/static/img/products/Kylie Cosmetics — Kylash Volume Mascara.webp",
-    },
-    {
-        "brand": "Kylie Cosmetics",
-        "name": "Pressed Blush Powder “Baddie on the Block”",
-        "category": "blush",
-        "price": 20,
-        "image_url": "/static/img/products/Kylie Cosmetics — Pressed Blush Powder “Baddie on the Block”.avif",
-    },
-    {
-        "brand": "Huda Beauty",
-        "name": "Power Bullet Matte Lipstick “Interview”",
-        "category": "lipstick",
-        "price": 27,
-        "image_url": "/static/img/products/Huda Beauty — Power Bullet Matte Lipstick “Interview”.jpg",
-    },
-    {
-        "brand": "Huda Beauty",
-        "name": "FauxFilter Luminous Matte Foundation",
-        "category": "foundation",
-        "price": 42,
-        "image_url": "/static/img/products/Huda Beauty — FauxFilter Luminous Matte Foundation.jpg",
-    },
-    {
-        "brand": "Huda Beauty",
-        "name": "Easy Bake Loose Baking & Setting Powder",
-        "category": "powder",
-        "price": 35,
-        "image_url": "/static/img/products/Huda Beauty — Easy Bake Loose Baking & Setting Powder.jpg",
-    },
-    {
-        "brand": "Huda Beauty",
-        "name": "Legit Lashes Double-Ended Mascara",
-        "category": "mascara",
-        "price": 27,
-        "image_url": "/static/img/products/Huda Beauty — Legit Lashes Double-Ended Mascara.webp",
-    },
-    {
-        "brand": "Summer Fridays",
-        "name": "Lip Butter Balm “Vanilla”",
-        "category": "skincare",
-        "price": 24,
-        "image_url": "/static/img/products/Summer Fridays — Lip Butter Balm “Vanilla”.webp",
-    },
-    {
-        "brand": "Summer Fridays",
-        "name": "Jet Lag Mask",
-        "category": "skincare",
-        "price": 49,
-        "image_url": "/static/img/products/Summer Fridays — Jet Lag Mask.jpg",
-    },
-    {
-        "brand": "NARS",
-        "name": "Buttermelt Blush",
-        "category": "blush",
-        "price": 34,
-        "image_url": "/static/img/products/Nars - Buttermelt Blush.jpg",
-    },
-]
-
-POSITIVE_SNIPPETS = [
-    "Absolutely love this! The formula is incredible and lasts all day.",
-    "This is my holy grail product. Perfect for my skin type.",
-    "Amazing pigmentation and blendability. Worth every penny!",
-    "I've been using this for months and it's still my go-to.",
-    "The color payoff is stunning and it doesn't budge all day.",
-    "Perfect for my oily skin - no creasing or fading.",
-    "The texture is so smooth and applies like a dream.",
-    "Love how buildable this is - can go from subtle to dramatic.",
-    "The finish is flawless and looks expensive.",
-    "I've tried so many similar products and this is the best.",
-]
-
-MIXED_SNIPPETS = [
-    "Good product overall, but the price is a bit steep.",
-    "Nice formula, but the shade range could be better.",
-    "Works well, though it takes some practice to apply correctly.",
-    "I like it, but it's not quite what I expected from the reviews.",
-    "Nice color, but the staying power could be better.",
-    "Good product, but the packaging could be more travel-friendly.",
-]
-
-CRITICAL_SNIPPETS = [
-    "Not worth the hype. Doesn't work well with my skin type.",
-    "The formula is too thick and hard to blend.",
-    "Color doesn't match what I expected from the swatches.",
-    "This product doesn't last as long as advertised.",
-    "Too expensive for what you get. Disappointed.",
-    "The packaging broke after just a few uses.",
-]
-
-TITLES_BY_RATING = {
-    5: [
-        "Absolutely perfect!", "Holy grail product!", "Worth every penny!",
-        "Life-changing!", "My new favorite!", "Incredible quality!",
-    ],
-    4: [
-        "Really great product", "Solid choice", "Would recommend", "Good quality",
-    ],
-    3: [
-        "It's okay", "Decent product", "Average quality", "Mixed feelings",
-    ],
-    2: [
-        "Disappointed", "Not what I expected", "Below average", "Not great",
-    ],
-    1: [
-        "Terrible", "Waste of money", "Awful quality", "Regret purchase",
-    ],
-}
-
-def pick_snippet_for_rating(r: int) -> str:
-    if r >= 5:
-        pool = POSITIVE_SNIPPETS
-    elif r == 4:
-        pool = POSITIVE_SNIPPETS + MIXED_SNIPPETS
-    elif r == 3:
-        pool = MIXED_SNIPPETS
-    elif r == 2:
-        pool = MIXED_SNIPPETS + CRITICAL_SNIPPETS
-    else:
-        pool = CRITICAL_SNIPPETS
-    return random.choice(pool)
-
 def create_users():
     print("→ Seeding users…")
     created_any = False
@@ -409,26 +53,8 @@ def create_users():
 
 def create_products():
     print("→ Seeding products…")
-    for p in PRODUCTS:
-        obj, created = Product.objects.get_or_create(
-            name=p["name"],
-            defaults=p
-        )
-        if created:
-            print(f"  ✅ Created: {obj}")
-        else:
-            # Ensure existing records get the latest brand/category/price/image_url
-            updated = False
-            for field in ["brand", "category", "price", "image_url"]:
-                new_val = p[field]
-                if getattr(obj, field) != new_val:
-                    setattr(obj, field, new_val)
-                    updated = True
-            if updated:
-                obj.save(update_fields=["brand", "category", "price", "image_url"])
-                print(f"  🔄 Updated: {obj}")
-            else:
-                print(f"  ⚠️  Exists (no changes): {obj}")
+    result = CatalogImporter(diff=lambda line: print(f"  {line}")).run(PRODUCTS)
+    print(f"  ✅ {result.created} created, 🔄 {result.updated} updated, ⚠️  {result.unchanged} unchanged")
 
 def create_reviews():
     print("→ Seeding reviews…")
@@ -437,10 +63,11 @@ def create_reviews():
         print("  No users found, skipping reviews.")
         return
     products = list(Product.objects.all())
+    # each user writes at most one review per product
+    existing = set(Review.objects.filter(user__in=users).values_list("user_id", "product_id"))
     for prod in products:
-        # each user writes at most one review per product
         for user in users:
-            if Review.objects.filter(user=user, product=prod).exists():
+            if (user.pk, prod.pk) in existing:
                 continue
             # Bias ratings around 3–4 to look more realistic overall
             rating = random.choices([1,2,3,4,5], weights=[8,14,28,32,18], k=1)[0]
@@ -455,10 +82,11 @@ def create_reviews():
             print(f"  ✍️  {user.username} → {prod.name} ({rating}/5)")
     print("  done.")
 
-def fix_existing_reviews():
+def fix_existing_reviews(batch_size=1000):
     print("→ Normalizing existing reviews…")
     count = 0
-    for r in Review.objects.all().only("id", "rating", "title", "body"):
+    changed = []
+    for r in Review.objects.all().only("id", "rating", "title", "body").iterator(chunk_size=batch_size):
         # Keep the stored star rating, refresh title/body to match tone
         rating = int(max(1, min(5, r.rating or 3)))
         new_title = random.choice(TITLES_BY_RATING.get(rating, TITLES_BY_RATING[3]))
@@ -466,8 +94,15 @@ def fix_existing_reviews():
         if r.title != new_title or r.body != new_body:
             r.title = new_title
             r.body = new_body
-            r.save(update_fields=["title", "body"])
-            count += 1
+            changed.append(r)
+        if len(changed) >= batch_size:
+            count += Review.objects.bulk_update(changed, ["title", "body"])
+            changed = []
+    if changed:
+        count += Review.objects.bulk_update(changed, ["title", "body"])
+    # bulk_update skips the signals that keep the search index current
+    if count:
+        search.rebuild()
     print(f"  🔄 Updated {count} existing reviews")
 
 def run():
@@ -477,6 +112,33 @@ def run():
     fix_existing_reviews()
     print("\n✅ Seeding complete.")
 
-if __name__ == "__main__":
-    run()
+def run_bulk(args):
+    print(f"→ Bulk seeding (seed={args.seed}, batch size={args.batch_size})…")
+    BulkSeeder(seed=args.seed, batch_size=args.batch_size, days=args.days).run(
+        users=args.users, products=args.products, reviews=args.reviews, votes=args.votes, media=args.media,
+        refresh=not args.no_refresh, with_search=not args.skip_search,
+    )
+    print("\n✅ Bulk seeding complete.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed demo data, or load-test data with --bulk.")
+    parser.add_argument("--bulk", action="store_true", help="Grow tables to the target sizes below with bulk inserts")
+    parser.add_argument("--users", type=int, default=0, help="Target total users")
+    parser.add_argument("--products", type=int, default=0, help="Target total products")
+    parser.add_argument("--reviews", type=int, default=0, help="Target total reviews")
+    parser.add_argument("--votes", type=int, default=0, help="Target total helpfulness votes")
+    parser.add_argument("--media", type=int, default=0, help="Target total review photos")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed, same data)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365, help="Spread review dates over this many days")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="Skip rebuilding ratings/trending/search/stats afterwards")
+    parser.add_argument("--skip-search", action="store_true", help="Skip only the search index rebuild")
+    return parser.parse_args()
 
+if __name__ == "__main__":
+    args = parse_args()
+    if args.bulk:
+        run_bulk(args)
+    else:
+        run()